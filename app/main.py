@@ -1,19 +1,139 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, Form
+from fastapi.responses import JSONResponse
 from app.routes import router
+from app.services.concurrency import run_in_io_pool, shutdown_pools
+from app.services.ingest_queue import INGEST_WORKERS, get_ingest_queue
+from app.services.llm_backend import close_http_clients
+from app.services.metrics import MetricsMiddleware, setup_tracing
+from app.services.rag_service import (
+    CHROMA_SERVER_URL,
+    TEMP_KB_TTL_SECONDS,
+    VECTOR_STORE,
+    open_chroma_client,
+    rag_service,
+)
+from app.services.rule_engine import get_rule_registry
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
-import chromadb
+
+try:
+    import fcntl
+except ImportError:  # Windows: every worker collects
+    fcntl = None
 
 load_dotenv()
 
-# Create ChromaDB persistent client for permanent KB
-PERSISTENT_KB_PATH = "./kb_store"
-os.makedirs(PERSISTENT_KB_PATH, exist_ok=True)
-chroma_client = chromadb.PersistentClient(path=PERSISTENT_KB_PATH)
+# Level of the app's own log lines; libraries log warnings and above
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("app").setLevel(LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+PERSISTENT_KB_PATH = os.getenv("KB_STORE_PATH", "./kb_store")
+# Set to 0 to skip the embeddings round trip at startup (offline runs)
+WARMUP_EMBEDDINGS = os.getenv("WARMUP_EMBEDDINGS", "1") != "0"
+# Periodically expire anything left in the shared temp_kb collection
+TEMP_GC_INTERVAL_SECONDS = int(os.getenv("TEMP_GC_INTERVAL_SECONDS", "600"))
+# With several workers only the one holding this lock collects temp_kb; the
+# lock passes to another worker if that one exits
+TEMP_GC_LOCK_PATH = os.getenv("TEMP_GC_LOCK_PATH", os.path.join(PERSISTENT_KB_PATH, "temp_gc.lock"))
+
+
+def _hold_gc_lock(handle) -> bool:
+    """Take the temp_kb GC lock without waiting; True if this process holds it"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+async def _temp_gc_loop():
+    os.makedirs(os.path.dirname(TEMP_GC_LOCK_PATH) or ".", exist_ok=True)
+    with open(TEMP_GC_LOCK_PATH, "a") as lock:
+        while True:
+            if _hold_gc_lock(lock):
+                await _collect_temp()
+            await asyncio.sleep(TEMP_GC_INTERVAL_SECONDS)
+
+
+async def _collect_temp():
+    try:
+        removed = await run_in_io_pool(rag_service.collect_expired_temp, TEMP_KB_TTL_SECONDS)
+        if removed:
+            logger.info("Expired %d temp_kb chunks", removed)
+    except Exception as e:
+        logger.exception("Error collecting temp_kb: %s", e)
+
 
-# Make collections available to routes
-app = FastAPI()
-app.state.permanent_kb = chroma_client.get_or_create_collection("permanent_kb")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One ChromaDB client for the permanent KB, shared with the RAG service:
+    # the store files, or the shared server when workers run side by side
+    os.makedirs(PERSISTENT_KB_PATH, exist_ok=True)
+    chroma_client = open_chroma_client(PERSISTENT_KB_PATH)
+    if CHROMA_SERVER_URL:
+        logger.info("Using the Chroma server at %s (worker pid %d)", CHROMA_SERVER_URL, os.getpid())
+    rag_service.attach_client(chroma_client)
+
+    # Make collections available to routes
+    if VECTOR_STORE == "faiss":
+        app.state.permanent_kb = (await run_in_io_pool(rag_service.get_permanent_store))._collection
+        logger.info("Permanent KB in the FAISS store at %s", rag_service.faiss_db_path)
+    else:
+        app.state.permanent_kb = chroma_client.get_or_create_collection("permanent_kb")
+
+    # Draft-type rules and style samples are parsed once, not per request
+    rules = await run_in_io_pool(get_rule_registry)
+    logger.info("Loaded rules for %d draft types", len(rules.types))
+    for error in rules.errors:
+        logger.warning("Invalid rule file: %s", error)
+
+    # Load both collections and their indexes before serving traffic, so the
+    # first /generate after a restart is neither cold nor missing KB context
+    app.state.warmup = await run_in_io_pool(rag_service.warm_up, WARMUP_EMBEDDINGS)
+    app.state.ready = not app.state.warmup["errors"]
+    # No embeddings step with WARMUP_EMBEDDINGS=0
+    embeddings_ms = app.state.warmup.get("embeddings_ms")
+    logger.info(
+        "Cold start finished in %s ms (embeddings %s, permanent_kb %s ms / %s chunks, temp_kb %s ms)",
+        app.state.warmup["total_ms"], "skipped" if embeddings_ms is None else f"{embeddings_ms} ms",
+        app.state.warmup["permanent_kb_ms"], app.state.warmup["permanent_kb_chunks"], app.state.warmup["temp_kb_ms"],
+    )
+    for name, error in app.state.warmup["errors"].items():
+        logger.error("Warm-up of %s failed: %s", name, error)
+
+    temp_gc_task = asyncio.create_task(_temp_gc_loop())
+    # Background ingestion workers; jobs left over from a previous run resume
+    ingest_queue = get_ingest_queue()
+    await ingest_queue.start(INGEST_WORKERS)
+    yield
+    await ingest_queue.stop()
+    temp_gc_task.cancel()
+    await close_http_clients()
+    shutdown_pools()
+
+
+app = FastAPI(lifespan=lifespan)
+app.state.ready = False
+# Per-route latency histograms for /metrics; stage spans when OTEL_TRACING=1
+app.add_middleware(MetricsMiddleware)
+setup_tracing(app)
 
 # Include routes
 app.include_router(router)
+
+
+@app.get("/healthz")
+async def healthz():
+    """Readiness: 200 once stores and embeddings are warm, 503 otherwise"""
+    body = {
+        "status": "ready" if app.state.ready else "degraded",
+        "warmup": getattr(app.state, "warmup", None),
+    }
+    return JSONResponse(body, status_code=200 if app.state.ready else 503)
@@ -1,38 +1,28 @@
+import base64
+import json
+import logging
 from typing import List, Optional
-from fastapi import APIRouter, File, UploadFile, Form
-from fastapi.responses import FileResponse, JSONResponse
-from utils.document_loader import load_file_async
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, Form
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from utils.doc_exporter import DOCX_MEDIA_TYPE
+from utils.document_loader import DocumentTooLarge, load_file_async
 from utils.rag import RAGIndex
-from app.services.draft_generator import generate_petition
-from app.services.rag_service import ingest_documents, get_permanent_vector_store, load_permanent_kb
+from app.services.batch_drafts import BATCH_MAX_ITEMS, ZIP_MEDIA_TYPE, BatchJob, batch_jobs
+from app.services.concurrency import run_in_io_pool
+from app.services.embedding_cache import get_embedding_cache
+from app.services.ingest_queue import get_ingest_queue
+from app.services.metrics import METRICS_ENABLED, PROMETHEUS_CONTENT_TYPE, render_metrics, stage
+from app.services.response_cache import get_response_cache
+from app.services.text_cache import get_text_cache
+from app.services.draft_generator import generate_petition_async, normalize_payload, stream_petition
+from app.services.rag_service import abuild_scratch_index, aingest_documents, get_permanent_vector_store, load_permanent_kb
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
 
-@router.post("/ingest")
-async def ingest(files: List[UploadFile] = File(...)):
-    """
-    Permanently ingest uploaded documents into the KB
-    """
-    docs = []
-    for f in files:
-        try:
-            text = await load_file_async(f)
-            docs.append({"source": f.filename, "text": text})
-        except Exception as e:
-            # Skip unreadable files
-            continue
-    if not docs:
-        return JSONResponse({"message": "No valid files to ingest"}, status_code=400)
-
-    ingest_documents(
-        docs, permanent=True
-    )  # Make sure ingest_documents stores permanently
-    return JSONResponse({"message": f"{len(docs)} documents ingested successfully"})
 
-
-@router.post("/generate")
-async def generate(
+def draft_payload(
     draft_type: str = Form(...),
     petitioner: str = Form(...),
     respondent: str = Form(...),
@@ -45,47 +35,241 @@ async def generate(
     rules_to_follow: str = Form(""),
     case_summary: str = Form(""),
     instructions: str = Form(""),
-    files: Optional[List[UploadFile]] = File(None),
-    download: bool = Form(True),
-):
+) -> dict:
+    """Build the generator payload from the drafting form fields"""
+    try:
+        return normalize_payload(locals())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def _read_uploads(files: Optional[List[UploadFile]]) -> List[dict]:
+    docs = []
+    for f in files or []:
+        try:
+            with stage("read_upload"):
+                text = await load_file_async(f)
+            docs.append({"source": f.filename, "text": text})
+        except DocumentTooLarge as e:
+            raise HTTPException(status_code=413, detail=f"{f.filename}: {e}")
+        except Exception as e:
+            # An unreadable file is skipped, not fatal; it is logged and counted
+            # in legalas_stage_errors_total{stage="read_upload"}
+            logger.warning("Skipping unreadable upload %s: %s: %s", f.filename, type(e).__name__, e)
+    return docs
+
+
+async def _prepare_generation(files: Optional[List[UploadFile]]):
+    """Return a per-request scratch index over the uploads (None without uploads)"""
     # 1) Load permanent KB docs into the RAG index
     permanent_docs = (
         load_permanent_kb()
     )  # This function should return list of {source, text}
     if permanent_docs:
-        ingest_documents(permanent_docs)
+        await aingest_documents(permanent_docs)
 
-    # 2) Ingest uploaded reference documents into the RAG index
-    docs = []
-    if files:
-        for f in files:
-            try:
-                text = await load_file_async(f)
-                docs.append({"source": f.filename, "text": text})
-            except Exception:
-                # skip unreadable files
-                continue
+    # 2) Index uploaded reference documents for this request only; the index
+    # is dropped with the request instead of accumulating in temp_kb
+    docs = await _read_uploads(files)
     if docs:
-        ingest_documents(docs)
-
-    # 3) Build payload for generator
-    payload = {
-        "draft_type": draft_type,
-        "petitioner": petitioner,
-        "respondent": respondent,
-        "court_name": court_name,
-        "jurisdiction": jurisdiction,
-        "case_type": case_type,
-        "key_dates": [d.strip() for d in key_dates.split(",") if d.strip()],
-        "relief_sought": relief_sought,
-        "legal_articles": [a.strip() for a in legal_articles.split(",") if a.strip()],
-        "rules_to_follow": [r.strip() for r in rules_to_follow.split(",") if r.strip()],
-        "case_summary": case_summary,
-        "instructions": instructions,
+        with stage("scratch_index"):
+            return await abuild_scratch_index(docs)
+    return None
+
+
+@router.post("/ingest")
+async def ingest(files: List[UploadFile] = File(...)):
+    """
+    Queue uploaded documents for permanent ingestion into the KB.
+
+    Files are spooled to disk and the job ID is returned at once; parsing,
+    embedding and storing run in the background ingestion workers. Poll
+    /ingest/{job_id} for progress.
+    """
+    files = [f for f in files or [] if f.filename]
+    if not files:
+        return JSONResponse({"message": "No valid files to ingest"}, status_code=400)
+
+    try:
+        job_id = await get_ingest_queue().submit(files)
+    except DocumentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return JSONResponse({
+        "message": f"{len(files)} documents queued for ingestion",
+        "job_id": job_id,
+        "status_url": f"/ingest/{job_id}",
+    }, status_code=202)
+
+
+@router.get("/ingest/{job_id}")
+async def ingest_status(job_id: str):
+    """Progress of an ingestion job: documents parsed, chunks embedded, per-file errors"""
+    status = await run_in_io_pool(get_ingest_queue().status, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="unknown or expired ingestion job")
+    return status
+
+
+@router.post("/generate")
+async def generate(
+    payload: dict = Depends(draft_payload),
+    files: Optional[List[UploadFile]] = File(None),
+    download: bool = Form(True),
+):
+    scratch = await _prepare_generation(files)
+
+    # Generate draft and return DOCX or JSON
+    result = await generate_petition_async(payload, scratch=scratch)
+    validation = result.get("validation") or {}
+    headers = {
+        "X-Draft-Cache": result.get("cache", "miss"),
+        "X-Draft-Missing-Sections": ", ".join(validation.get("missing_sections", [])),
     }
+    if download and result.get("docx"):
+        headers["Content-Disposition"] = 'attachment; filename="petition.docx"'
+        return Response(content=result["docx"], media_type=DOCX_MEDIA_TYPE, headers=headers)
+    return JSONResponse({"petition": result.get("petition", ""), "validation": validation}, headers=headers)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/generate/stream")
+async def generate_stream(
+    payload: dict = Depends(draft_payload),
+    files: Optional[List[UploadFile]] = File(None),
+):
+    """
+    Stream the draft as Server-Sent Events.
+
+    Emits one "token" event per cleaned text delta and a final "done" event
+    carrying the base64-encoded DOCX (or an "error" event on failure).
+    """
+    scratch = await _prepare_generation(files)
+
+    async def events():
+        try:
+            async for event, data in stream_petition(payload, scratch=scratch):
+                if event == "token":
+                    yield _sse("token", {"text": data})
+                else:
+                    yield _sse("done", {
+                        "filename": "petition.docx",
+                        "docx_base64": base64.b64encode(data["docx"]).decode("ascii"),
+                        "validation": data.get("validation"),
+                    })
+        except Exception as e:
+            yield _sse("error", {"message": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _parse_json_form(name: str, value: str, kind: type):
+    try:
+        parsed = json.loads(value)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"{name} is not valid JSON: {e}")
+    if not isinstance(parsed, kind):
+        raise HTTPException(status_code=400, detail=f"{name} must be a JSON {kind.__name__}")
+    return parsed
+
+
+async def _batch_zip_response(job: BatchJob) -> Response:
+    content = await run_in_io_pool(job.zip_bytes)
+    summary = job.summary()
+    return Response(content=content, media_type=ZIP_MEDIA_TYPE, headers={
+        "Content-Disposition": f'attachment; filename="petitions-{job.id}.zip"',
+        "X-Batch-Job": job.id,
+        "X-Batch-Succeeded": str(summary["succeeded"]),
+        "X-Batch-Failed": str(summary["failed"]),
+    })
+
+
+@router.post("/generate/batch")
+async def generate_batch(
+    items: str = Form(...),
+    common: str = Form("{}"),
+    files: Optional[List[UploadFile]] = File(None),
+    wait: bool = Form(False),
+):
+    """
+    Draft many petitions in one job.
+
+    ``items`` is a JSON list of payloads with the /generate fields; ``common``
+    holds fields shared by every item (an item's own fields win). Uploaded
+    files are indexed once and used by all items. With ``wait`` the response
+    is a ZIP of DOCX files plus report.json; otherwise a job ID is returned
+    at once and the job is polled at /generate/batch/{job_id}. Jobs are kept
+    by the worker process that accepted them; with several workers, poll
+    through sticky sessions or use ``wait``.
+    """
+    items = _parse_json_form("items", items, list)
+    common = _parse_json_form("common", common, dict)
+    if not items:
+        raise HTTPException(status_code=400, detail="items is empty")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"at most {BATCH_MAX_ITEMS} items per batch")
+
+    scratch = await _prepare_generation(files)
+    job = BatchJob(items, common)
+    if wait:
+        await batch_jobs.run(job, scratch)
+        return await _batch_zip_response(job)
+    batch_jobs.start(job, scratch)
+    return JSONResponse({
+        "job_id": job.id,
+        "status_url": f"/generate/batch/{job.id}",
+        "download_url": f"/generate/batch/{job.id}/download",
+    }, status_code=202)
+
+
+def _get_batch_job(job_id: str) -> BatchJob:
+    job = batch_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404, detail="unknown or expired batch job (jobs are kept by the worker that accepted them)"
+        )
+    return job
+
+
+@router.get("/generate/batch/{job_id}")
+async def batch_status(job_id: str):
+    """Progress, per-item results and throughput of a batch job"""
+    return _get_batch_job(job_id).summary()
+
+
+@router.get("/generate/batch/{job_id}/download")
+async def batch_download(job_id: str):
+    """ZIP of a finished batch job's drafts"""
+    job = _get_batch_job(job_id)
+    if not job.done:
+        raise HTTPException(status_code=409, detail=f"batch job is {job.status}")
+    return await _batch_zip_response(job)
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters and sizes of the on-disk caches"""
+    stats = {"embeddings": get_embedding_cache().stats()}
+    responses = get_response_cache()
+    if responses is not None:
+        stats["responses"] = responses.stats()
+    extracted = get_text_cache()
+    if extracted is not None:
+        stats["extracted_text"] = extracted.stats()
+    return stats
+
 
-    # 4) Generate draft and return DOCX or JSON
-    result = generate_petition(payload)
-    if download and result.get("file_path"):
-        return FileResponse(path=result["file_path"], filename="petition.docx")
-    return JSONResponse({"petition": result.get("petition", "")})
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, tokens, embedding calls, cache lookups, queue depths"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="metrics are disabled (METRICS_ENABLED=0)")
+    # Collectors read SQLite (ingest queue depth), so render off the event loop
+    body = await run_in_io_pool(render_metrics)
+    return PlainTextResponse(body, media_type=PROMETHEUS_CONTENT_TYPE)
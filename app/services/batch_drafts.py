@@ -0,0 +1,208 @@
+# Batch drafting: many payloads per job, shared retrieval, bounded fan-out
+import asyncio
+import io
+import json
+import os
+import re
+import time
+import uuid
+import zipfile
+from typing import Any, Dict, List, Optional
+
+from app.services.draft_generator import (
+    PROMPT_CONTEXT_CANDIDATES,
+    generate_petition_async,
+    normalize_payload,
+    retrieval_request,
+)
+from app.services.metrics import QUEUE_DEPTH
+from app.services.rag_service import aretrieve_many
+
+# Most payloads accepted in one batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+# Drafts of one batch generated at the same time (LLM_CONCURRENCY still
+# bounds completions across all requests)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+# Finished jobs, and their DOCX files, are kept this long for polling
+BATCH_JOB_TTL_SECONDS = int(os.getenv("BATCH_JOB_TTL_SECONDS", "3600"))
+# Jobs kept in memory; the oldest finished ones are dropped first
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "50"))
+
+ZIP_MEDIA_TYPE = "application/zip"
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", value).strip("_")[:40] or "draft"
+
+
+class BatchJob:
+    """State, per-item results and DOCX files of one batch.
+
+    Items are reported in input order with status "pending", "ok" or
+    "error"; an invalid or failed item never stops the rest of the batch.
+    """
+
+    def __init__(self, items: List[dict], common: dict = None):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.retrievals = 0
+        self.payloads: List[Optional[dict]] = []
+        self.results: List[Dict[str, Any]] = []
+        self._docx: Dict[int, bytes] = {}
+        for index, item in enumerate(items):
+            result = {"index": index, "status": "pending"}
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError("item must be an object")
+                payload = normalize_payload(dict(common or {}, **item))
+                result["filename"] = f"{index + 1:03d}_{_slug(payload['petitioner'])}.docx"
+            except (TypeError, ValueError) as e:
+                payload = None
+                result.update(status="error", error=str(e))
+            self.payloads.append(payload)
+            self.results.append(result)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def succeed(self, index: int, result: dict, seconds: float):
+        self._docx[index] = result["docx"]
+        self.results[index].update(
+            status="ok",
+            cache=result.get("cache", "miss"),
+            missing_sections=(result.get("validation") or {}).get("missing_sections", []),
+            seconds=round(seconds, 3),
+        )
+
+    def fail(self, index: int, error: str, seconds: float = 0.0):
+        self.results[index].update(status="error", error=error, seconds=round(seconds, 3))
+
+    def summary(self) -> dict:
+        counts = {"ok": 0, "error": 0, "pending": 0}
+        for result in self.results:
+            counts[result["status"]] += 1
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        finished = counts["ok"] + counts["error"]
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": len(self.results),
+            "succeeded": counts["ok"],
+            "failed": counts["error"],
+            "pending": counts["pending"],
+            "retrievals": self.retrievals,
+            "elapsed_seconds": round(elapsed, 3),
+            "drafts_per_minute": round(finished / elapsed * 60, 2) if elapsed else 0.0,
+            "items": self.results,
+        }
+
+    def zip_bytes(self) -> bytes:
+        """ZIP of the finished DOCX files plus report.json with the summary"""
+        buffer = io.BytesIO()
+        # DOCX files are already deflated; storing them avoids compressing twice
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+            for index, docx in sorted(self._docx.items()):
+                archive.writestr(self.results[index]["filename"], docx)
+            archive.writestr("report.json", json.dumps(self.summary(), indent=2))
+        return buffer.getvalue()
+
+
+async def _generate_item(job: BatchJob, index: int, retrieved: list, scratch, limit: asyncio.Semaphore):
+    async with limit:
+        start = time.perf_counter()
+        try:
+            result = await generate_petition_async(job.payloads[index], scratch=scratch, retrieved=retrieved)
+        except Exception as e:
+            job.fail(index, str(e) or type(e).__name__, time.perf_counter() - start)
+            return
+        job.succeed(index, result, time.perf_counter() - start)
+
+
+async def run_batch(job: BatchJob, scratch=None, concurrency: int = None):
+    """Retrieve once per distinct (query, draft_type, jurisdiction), then draft every valid item.
+
+    Payloads differing only in parties share their retrieval, so a batch of
+    near-identical petitions costs one embedding and search per distinct
+    case summary rather than one per petition.
+    """
+    job.status = "running"
+    job.started_at = time.time()
+    valid = [i for i, payload in enumerate(job.payloads) if payload is not None]
+    try:
+        requests = [retrieval_request(job.payloads[i]) for i in valid]
+        job.retrievals = len(set(r for r in requests if r[0]))
+        try:
+            contexts = await aretrieve_many(requests, top_k=PROMPT_CONTEXT_CANDIDATES, scratch=scratch)
+        except Exception as e:
+            for i in valid:
+                job.fail(i, f"retrieval failed: {e}")
+            job.status = "failed"
+            return
+        limit = asyncio.Semaphore(max(1, concurrency or BATCH_CONCURRENCY))
+        await asyncio.gather(*(
+            _generate_item(job, i, retrieved, scratch, limit) for i, retrieved in zip(valid, contexts)
+        ))
+        job.status = "done"
+    finally:
+        job.finished_at = time.time()
+
+
+class BatchJobs:
+    """In-memory registry of batch jobs with TTL and size bounds"""
+
+    def __init__(self, ttl_seconds: int = BATCH_JOB_TTL_SECONDS, max_jobs: int = BATCH_MAX_JOBS):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, BatchJob] = {}
+        # Strong references so running jobs are not garbage collected
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.done and job.finished_at < cutoff:
+                del self._jobs[job_id]
+        finished = sorted((j for j in self._jobs.values() if j.done), key=lambda j: j.finished_at)
+        while len(self._jobs) >= self.max_jobs and finished:
+            del self._jobs[finished.pop(0).id]
+
+    def start(self, job: BatchJob, scratch=None) -> BatchJob:
+        """Register job and run it in the background"""
+        self._evict()
+        self._jobs[job.id] = job
+        task = asyncio.create_task(run_batch(job, scratch))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    async def run(self, job: BatchJob, scratch=None) -> BatchJob:
+        """Register job and wait for it to finish"""
+        self._evict()
+        self._jobs[job.id] = job
+        await run_batch(job, scratch)
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        self._evict()
+        return self._jobs.get(job_id)
+
+
+batch_jobs = BatchJobs()
+
+
+def _queue_depths() -> Dict[tuple, float]:
+    depths = {}
+    for job in list(batch_jobs._jobs.values()):
+        if not job.done:
+            depths[("batch_jobs", job.status)] = depths.get(("batch_jobs", job.status), 0) + 1
+            pending = sum(r["status"] == "pending" for r in job.results)
+            depths[("batch_items", "pending")] = depths.get(("batch_items", "pending"), 0) + pending
+    return depths
+
+
+QUEUE_DEPTH.add_collector(_queue_depths)
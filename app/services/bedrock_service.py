@@ -1 +1,106 @@
+# Amazon Bedrock implementation of the LLM backend interface
+import json
+import os
+from urllib.parse import quote
 
+import httpx
+
+from app.services.concurrency import run_in_io_pool
+from app.services.llm_backend import (
+    RETRYABLE_STATUS,
+    LLMBackend,
+    LLMError,
+    get_async_http_client,
+    get_http_client,
+)
+
+BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "amazon.titan-text-premier-v1:0")
+BEDROCK_REGION = os.getenv("BEDROCK_REGION") or os.getenv("AWS_REGION", "us-east-1")
+BEDROCK_ENDPOINT_URL = os.getenv("BEDROCK_ENDPOINT_URL") or f"https://bedrock-runtime.{BEDROCK_REGION}.amazonaws.com"
+
+
+class BedrockBackend(LLMBackend):
+    """Amazon Bedrock Converse API, SigV4-signed with botocore and sent over the shared HTTP pool"""
+
+    name = "bedrock"
+
+    def __init__(self, model: str = BEDROCK_MODEL_ID, region: str = BEDROCK_REGION, endpoint_url: str = BEDROCK_ENDPOINT_URL):
+        super().__init__(model)
+        import botocore.session
+
+        self.region = region
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.session = botocore.session.get_session()
+        # Resolved once: the provider chain may read files or query instance metadata
+        self.credentials = self.session.get_credentials()
+
+    def _request(self, action: str, prompt: str, max_tokens: int, temperature: float):
+        from botocore.auth import SigV4Auth
+        from botocore.awsrequest import AWSRequest
+
+        # Model IDs contain ":" and inference-profile ARNs "/"; SigV4 signs the encoded path
+        url = f"{self.endpoint_url}/model/{quote(self.model, safe='')}/{action}"
+        body = json.dumps({
+            "messages": [{"role": "user", "content": [{"text": prompt}]}],
+            "inferenceConfig": {"maxTokens": max_tokens, "temperature": temperature},
+        })
+        request = AWSRequest(method="POST", url=url, data=body, headers={"Content-Type": "application/json"})
+        if self.credentials is None:
+            raise LLMError("no AWS credentials configured for Bedrock")
+        # Refreshes temporary credentials when they are about to expire (blocking)
+        SigV4Auth(self.credentials.get_frozen_credentials(), "bedrock", self.region).add_auth(request)
+        return url, dict(request.headers), body
+
+    @staticmethod
+    def _check(response: httpx.Response):
+        if response.status_code >= 400:
+            raise LLMError(
+                f"Bedrock returned {response.status_code}: {response.text[:200]}",
+                retryable=response.status_code in RETRYABLE_STATUS,
+            )
+
+    @staticmethod
+    def _text(payload: dict) -> str:
+        content = payload.get("output", {}).get("message", {}).get("content", [])
+        return "".join(part.get("text", "") for part in content)
+
+    def _complete_once(self, prompt, max_tokens, temperature):
+        url, headers, body = self._request("converse", prompt, max_tokens, temperature)
+        try:
+            response = get_http_client().post(url, content=body, headers=headers)
+        except httpx.HTTPError as e:
+            raise LLMError(str(e), retryable=True) from e
+        self._check(response)
+        return self._text(response.json())
+
+    async def _acomplete_once(self, prompt, max_tokens, temperature):
+        url, headers, body = await run_in_io_pool(self._request, "converse", prompt, max_tokens, temperature)
+        try:
+            response = await get_async_http_client().post(url, content=body, headers=headers)
+        except httpx.HTTPError as e:
+            raise LLMError(str(e), retryable=True) from e
+        self._check(response)
+        return self._text(response.json())
+
+    async def _astream_once(self, prompt, max_tokens, temperature):
+        from botocore.eventstream import EventStreamBuffer
+
+        url, headers, body = await run_in_io_pool(self._request, "converse-stream", prompt, max_tokens, temperature)
+        try:
+            async with get_async_http_client().stream("POST", url, content=body, headers=headers) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    self._check(response)
+                buffer = EventStreamBuffer()
+                async for data in response.aiter_bytes():
+                    buffer.add_data(data)
+                    for message in buffer:
+                        event_type = message.headers.get(":event-type")
+                        if message.headers.get(":message-type") == "exception":
+                            raise LLMError(f"Bedrock stream error: {message.payload[:200]!r}")
+                        if event_type == "contentBlockDelta":
+                            text = json.loads(message.payload).get("delta", {}).get("text")
+                            if text:
+                                yield text
+        except httpx.HTTPError as e:
+            raise LLMError(str(e), retryable=True) from e
@@ -0,0 +1,227 @@
+# Resumable, parallel ingestion of large document corpora
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from app.services.rag_service import rag_service
+from app.services.rule_engine import normalize_draft_type
+from utils.document_loader import parse_bytes
+
+DEFAULT_EXTENSIONS = ("pdf", "docx", "txt")
+
+
+class IngestManifest:
+    """SQLite record of files already ingested, keyed by path.
+
+    A file whose size and mtime match its record is skipped without being
+    read; one whose content hash matches is skipped without being embedded.
+    Rows are written only after a batch is stored, so an interrupted run
+    resumes from the last completed batch.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER NOT NULL,
+                mtime REAL NOT NULL, ingested_at REAL NOT NULL
+            )
+            """
+        )
+
+    def is_current(self, path: str, size: int, mtime: float) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM files WHERE path = ? AND size = ? AND mtime = ?", (path, size, mtime)
+            ).fetchone()
+        return row is not None
+
+    def sha256(self, path: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT sha256 FROM files WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def record(self, rows: Iterable[Dict[str, Any]]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                [(r["path"], r["sha256"], r["size"], r["mtime"], now) for r in rows],
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+
+def iter_files(roots: List[str], extensions: Iterable[str] = DEFAULT_EXTENSIONS) -> Iterator[str]:
+    """Files under the given files/directories with a matching extension, listed lazily.
+
+    Directories are walked in sorted order, so the order is stable between
+    runs. A root inside another directory root is not listed twice.
+    """
+    extensions = {e.lower().lstrip(".") for e in extensions}
+    dirs = [os.path.abspath(r) for r in roots if os.path.isdir(r)]
+    seen = set()
+    for root in roots:
+        path = os.path.abspath(root)
+        if path in seen or any(path.startswith(d + os.sep) for d in dirs):
+            continue
+        seen.add(path)
+        if os.path.isfile(root):
+            yield root
+            continue
+        for dirpath, dirnames, names in os.walk(root):
+            dirnames.sort()
+            for name in sorted(names):
+                if name.rsplit(".", 1)[-1].lower() in extensions:
+                    yield os.path.join(dirpath, name)
+
+
+def draft_type_for(path: str, root: str) -> Optional[str]:
+    """Draft type from the first folder under root, as in sample_petitions/, normalized like rule IDs"""
+    rel = os.path.relpath(path, root)
+    parts = rel.split(os.sep)
+    if len(parts) < 2:
+        return None
+    return normalize_draft_type(parts[0]) or None
+
+
+def parse_path(path: str) -> Dict[str, Any]:
+    """Read, hash and parse one file (module-level so it can run in a process pool)"""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        ext = path.rsplit(".", 1)[-1].lower()
+        return {
+            "path": path,
+            "sha256": hashlib.sha256(raw).hexdigest(),
+            "text": parse_bytes(ext, raw),
+        }
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+
+
+def _root_of(path: str, roots: List[str]) -> str:
+    for root in roots:
+        if os.path.isdir(root) and os.path.abspath(path).startswith(os.path.abspath(root) + os.sep):
+            return root
+    return os.path.dirname(path)
+
+
+async def ingest_corpus(
+    roots: List[str],
+    manifest: IngestManifest,
+    batch_docs: int = 64,
+    workers: int = 4,
+    draft_type: str = None,
+    jurisdiction: str = None,
+    extensions: Iterable[str] = DEFAULT_EXTENSIONS,
+    force: bool = False,
+    on_progress: Callable[[int, int], None] = None,
+    on_error: Callable[[str, str], None] = None,
+) -> Dict[str, Any]:
+    """Ingest every file under roots into the permanent KB.
+
+    The tree is listed as the run goes and files are parsed in a process
+    pool one batch ahead of the batch being embedded and stored, so parsing
+    overlaps embedding and memory does not grow with the corpus. Each batch is stored
+    and checkpointed independently; a failing file or batch is reported via
+    on_error and the run continues. on_progress(files, chunks) is called
+    after every batch. Returns counts and throughput.
+    """
+    start = time.perf_counter()
+    report = {"files": 0, "skipped": 0, "unchanged": 0, "ingested": 0, "failed": 0, "chunks": 0}
+
+    def fail(path, message):
+        report["failed"] += 1
+        if on_error:
+            on_error(path, message)
+
+    def windows():
+        """Files still to ingest, batch_docs at a time, listed as the run goes"""
+        window, skipped = [], 0
+        for path in iter_files(roots, extensions):
+            report["files"] += 1
+            stat = os.stat(path)
+            if not force and manifest.is_current(path, stat.st_size, stat.st_mtime):
+                report["skipped"] += 1
+                skipped += 1
+                continue
+            window.append({"path": path, "size": stat.st_size, "mtime": stat.st_mtime})
+            if len(window) >= max(1, batch_docs):
+                yield skipped, window
+                window, skipped = [], 0
+        if window or skipped:
+            yield skipped, window
+
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+
+        def parse(window):
+            return asyncio.gather(*(loop.run_in_executor(pool, parse_path, f["path"]) for f in window))
+
+        # Only the batch being stored and the one being parsed are held, not the whole listing
+        listing = windows()
+        current = next(listing, None)
+        next_parse = asyncio.ensure_future(parse(current[1])) if current else None
+        while current:
+            skipped, window = current
+            if on_progress and skipped:
+                on_progress(skipped, 0)
+            parsed = await next_parse
+            current = next(listing, None)
+            if current:
+                next_parse = asyncio.ensure_future(parse(current[1]))
+
+            docs, done = [], []
+            for entry, result in zip(window, parsed):
+                if "error" in result:
+                    fail(entry["path"], result["error"])
+                    continue
+                entry = dict(entry, sha256=result["sha256"])
+                if not force and manifest.sha256(entry["path"]) == entry["sha256"]:
+                    # Touched but not changed: refresh size/mtime only
+                    report["unchanged"] += 1
+                    manifest.record([entry])
+                    continue
+                root = _root_of(entry["path"], roots)
+                docs.append({
+                    "source": os.path.relpath(entry["path"], root),
+                    "text": result["text"],
+                    "draft_type": draft_type or draft_type_for(entry["path"], root),
+                    "jurisdiction": jurisdiction,
+                })
+                done.append(entry)
+
+            chunks = 0
+            if docs:
+                try:
+                    chunks = await rag_service.aingest_documents(docs, permanent=True)
+                except Exception as e:
+                    for entry in done:
+                        fail(entry["path"], f"batch failed: {type(e).__name__}: {e}")
+                    done = []
+                    chunks = 0
+            if done:
+                manifest.record(done)
+                report["ingested"] += len(done)
+                report["chunks"] += chunks
+            if on_progress and window:
+                on_progress(len(window), chunks)
+
+    elapsed = time.perf_counter() - start
+    report["seconds"] = round(elapsed, 3)
+    report["docs_per_second"] = round(report["ingested"] / elapsed, 2) if elapsed else 0.0
+    report["chunks_per_second"] = round(report["chunks"] / elapsed, 2) if elapsed else 0.0
+    return report
@@ -0,0 +1,115 @@
+# Shared execution pools and concurrency limits for blocking work
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from app.services.metrics import QUEUE_DEPTH
+
+# Process pool for CPU-bound parsing (pdfminer, python-docx)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Thread pool for blocking I/O (Chroma reads/writes, DOCX export)
+IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))
+# Threads for fanning a single query out to several vector stores
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "8"))
+# Maximum number of in-flight LLM completions per worker process
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "16"))
+# Maximum number of in-flight embedding requests per worker process
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "8"))
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_io_pool: Optional[ThreadPoolExecutor] = None
+_search_pool: Optional[ThreadPoolExecutor] = None
+_semaphores = {}
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Get the process pool used for document parsing - lazy initialization"""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=max(1, PARSE_WORKERS))
+    return _parse_pool
+
+
+def get_io_pool() -> ThreadPoolExecutor:
+    """Get the thread pool used for blocking I/O - lazy initialization"""
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(
+            max_workers=max(1, IO_WORKERS), thread_name_prefix="legalas-io"
+        )
+    return _io_pool
+
+
+def get_search_pool() -> ThreadPoolExecutor:
+    """Get the thread pool used for per-store searches - lazy initialization.
+
+    Kept separate from the I/O pool so a search running inside the I/O pool
+    can fan out without waiting on its own pool.
+    """
+    global _search_pool
+    if _search_pool is None:
+        _search_pool = ThreadPoolExecutor(
+            max_workers=max(1, SEARCH_WORKERS), thread_name_prefix="legalas-search"
+        )
+    return _search_pool
+
+
+async def run_in_parse_pool(func: Callable, *args: Any) -> Any:
+    """Run a picklable CPU-bound function in the parsing process pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_parse_pool(), func, *args)
+
+
+async def run_in_io_pool(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking function in the I/O thread pool, in the caller's context (like asyncio.to_thread)"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_io_pool(), partial(context.run, func, *args, **kwargs))
+
+
+def _semaphore(name: str, limit: int) -> asyncio.Semaphore:
+    if name not in _semaphores:
+        _semaphores[name] = asyncio.Semaphore(max(1, limit))
+    return _semaphores[name]
+
+
+def llm_slot() -> asyncio.Semaphore:
+    """Semaphore bounding concurrent LLM completions"""
+    return _semaphore("llm", LLM_CONCURRENCY)
+
+
+def embedding_slot() -> asyncio.Semaphore:
+    """Semaphore bounding concurrent embedding requests"""
+    return _semaphore("embedding", EMBEDDING_CONCURRENCY)
+
+
+def _queue_depths() -> Dict[tuple, float]:
+    depths = {}
+    for name, pool in (("io_pool", _io_pool), ("search_pool", _search_pool)):
+        if pool is not None:
+            depths[(name, "queued")] = pool._work_queue.qsize()
+    for name, semaphore in list(_semaphores.items()):
+        limit = LLM_CONCURRENCY if name == "llm" else EMBEDDING_CONCURRENCY
+        depths[(f"{name}_slots", "running")] = max(1, limit) - semaphore._value
+        depths[(f"{name}_slots", "waiting")] = len(semaphore._waiters or ())
+    return depths
+
+
+QUEUE_DEPTH.add_collector(_queue_depths)
+
+
+def shutdown_pools():
+    """Shut down the shared pools (used on application shutdown)"""
+    global _parse_pool, _io_pool, _search_pool
+    if _search_pool is not None:
+        _search_pool.shutdown(wait=False, cancel_futures=True)
+        _search_pool = None
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+    if _io_pool is not None:
+        _io_pool.shutdown(wait=False, cancel_futures=True)
+        _io_pool = None
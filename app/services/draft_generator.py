@@ -1,79 +1,115 @@
+import logging
 import os
 import re
-from openai import OpenAI
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-from app.services.rag_service import retrieve_context
-from utils.doc_exporter import export_to_docx
+from app.services.concurrency import embedding_slot, llm_slot, run_in_io_pool
+from app.services.llm_backend import get_llm_backend
+from app.services.metrics import LLM_TOKENS, observe_stage, stage, waited
+from app.services.prompt_budget import (
+    PROMPT_BUDGET_CONTEXT,
+    PROMPT_BUDGET_FACTS,
+    PROMPT_BUDGET_INSTRUCTIONS,
+    PROMPT_BUDGET_STYLE,
+    PROMPT_MAX_TOKENS,
+    format_chunk,
+    get_token_counter,
+    pack_chunks,
+)
+from app.services.rag_service import aretrieve_context, rag_service, retrieve_context
+from app.services.rule_engine import get_rule_registry
+from app.services.response_cache import (
+    get_response_cache,
+    payload_guard,
+    payload_signature,
+    prompt_key,
+)
+from utils.doc_exporter import DocxStreamBuilder, render_docx
 
 
+logger = logging.getLogger(__name__)
+
 with open("prompts/base_prompt.txt") as f:
     BASE_PROMPT = f.read()
 
+# Chunks retrieved per draft; prompt packing keeps as many as fit the budget
+PROMPT_CONTEXT_CANDIDATES = int(os.getenv("PROMPT_CONTEXT_CANDIDATES", "10"))
+
 
 def build_context_text(retrieved: list) -> str:
     if not retrieved:
         return ""
     parts = []
     for r in retrieved:
-        parts.append(f"Source: {r['source']}\n{r['text']}")
+        parts.append(format_chunk(r['source'], r['text']))
     return "\n\n".join(parts)
 
 
 def _load_style_reference(draft_type: str) -> str:
     """Return a short excerpt from the matching sample to guide structure."""
-    if not draft_type:
-        return ""
-    mapping = {
-        "writ_petition": "writ_petition_sample.txt",
-        "review_petition": "review_petition_sample.txt",
-        "curative_petition": "curative_petition_sample.txt",
-        "civil_suit": "civil_suit_sample.txt",
-    }
-    # normalize
-    normalized = draft_type.strip().lower().replace(" ", "_")
-    filename = mapping.get(normalized)
-    if not filename:
-        # fallback heuristics
-        if "writ" in normalized:
-            filename = mapping["writ_petition"]
-        elif "review" in normalized:
-            filename = mapping["review_petition"]
-        elif "curative" in normalized:
-            filename = mapping["curative_petition"]
-        elif "suit" in normalized or "civil" in normalized:
-            filename = mapping["civil_suit"]
-        else:
-            return ""
-    path = os.path.join("sample_petitions", filename)
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            text = f.read().strip()
-            # Use only the first ~2500 chars as style reference to avoid copying content
-            return text[:2500]
-    except Exception:
-        return ""
+    return get_rule_registry().style_excerpt(draft_type)
 
 
-def generate_petition(data: dict):
-    # data is dict from route
-    query_for_retrieval = data.get("case_summary") or " ".join(
-        data.get("key_dates", [])
-    )
-    
-    # Get draft_type for context filtering
+def validate_draft(data: dict, petition: str) -> dict:
+    """Required sections of the payload's draft type missing from the draft"""
+    return get_rule_registry().validate(data.get("draft_type", ""), petition)
+
+
+def _retrieval_query(data: dict) -> str:
+    return data.get("case_summary") or " ".join(data.get("key_dates", []))
+
+
+def retrieval_request(data: dict) -> tuple:
+    """(query, draft_type, jurisdiction) a payload retrieves with; equal triples retrieve the same context"""
+    return _retrieval_query(data), data.get("draft_type", ""), data.get("jurisdiction", "")
+
+
+REQUIRED_FIELDS = ("draft_type", "petitioner", "respondent", "court_name", "jurisdiction", "case_type")
+LIST_FIELDS = ("key_dates", "legal_articles", "rules_to_follow")
+TEXT_FIELDS = ("relief_sought", "case_summary", "instructions")
+
+
+def normalize_payload(fields: dict) -> dict:
+    """Generator payload from raw drafting fields.
+
+    List fields may be lists or comma-separated strings. Raises ValueError
+    naming any missing required field.
+    """
+    missing = [name for name in REQUIRED_FIELDS if not str(fields.get(name) or "").strip()]
+    if missing:
+        raise ValueError(f"missing required field(s): {', '.join(missing)}")
+    payload = {name: str(fields[name]) for name in REQUIRED_FIELDS}
+    for name in LIST_FIELDS:
+        value = fields.get(name) or []
+        if isinstance(value, str):
+            value = value.split(",")
+        payload[name] = [str(v).strip() for v in value if str(v).strip()]
+    for name in TEXT_FIELDS:
+        payload[name] = str(fields.get(name) or "")
+    return payload
+
+
+def build_prompt(data: dict, retrieved: list) -> str:
+    """Fill BASE_PROMPT from the request payload and retrieved context.
+
+    Free-text sections are truncated to their token budgets, and retrieved
+    chunks are packed best-first into whatever the context budget and
+    PROMPT_MAX_TOKENS leave, so the prompt size is bounded per request.
+    """
+    with stage("build_prompt"):
+        return _build_prompt(data, retrieved)
+
+
+def _build_prompt(data: dict, retrieved: list) -> str:
     draft_type = data.get("draft_type", "")
-    
-    # Retrieve context with draft_type filtering to get relevant sample petitions
-    retrieved = retrieve_context(query_for_retrieval, top_k=6, draft_type=draft_type)
-    context_text = build_context_text(retrieved)
+    counter = get_token_counter(get_llm_backend().model)
 
-    style_reference = _load_style_reference(draft_type)
+    style_reference = counter.truncate(_load_style_reference(draft_type), PROMPT_BUDGET_STYLE)
 
-    filled_prompt = BASE_PROMPT.format(
+    fields = dict(
         draft_type=data.get("draft_type"),
         petitioner=data.get("petitioner"),
         respondent=data.get("respondent"),
@@ -86,21 +122,43 @@ def generate_petition(data: dict):
         legal_articles=", ".join(data.get("legal_articles", [])),
         rules_to_follow=", ".join(data.get("rules_to_follow", [])),
         precedents=", ".join(data.get("legal_articles", [])),
-        case_summary=data.get("case_summary", ""),
-        instructions=data.get("instructions", ""),
-        notice_text=context_text,
+        case_summary=counter.truncate(data.get("case_summary", ""), PROMPT_BUDGET_FACTS),
+        instructions=counter.truncate(data.get("instructions", ""), PROMPT_BUDGET_INSTRUCTIONS),
+        notice_text="",
         style_reference=style_reference,
     )
+    base_tokens = counter.count(BASE_PROMPT.format(**fields))
+    context_budget = min(PROMPT_BUDGET_CONTEXT, PROMPT_MAX_TOKENS - base_tokens)
+    packed = pack_chunks(retrieved, context_budget, counter)
+    fields["notice_text"] = build_context_text(packed)
+    prompt = BASE_PROMPT.format(**fields)
 
-    response = client.chat.completions.create(
-        model=os.getenv("OPENAI_DRAFT_MODEL", "gpt-4o-mini"),
-        messages=[{"role": "user", "content": filled_prompt}],
-        max_tokens=2500,
-        temperature=0.2,
+    logger.info(
+        "prompt: %d tokens%s (%d of %d retrieved chunks, context budget %d)",
+        counter.count(prompt), "" if counter.exact else " (estimated)",
+        len(packed), len(retrieved), context_budget,
     )
+    return prompt
+
+
+def record_draft_tokens(prompt: str, completion: str):
+    """Count the prompt sent and the completion received in legalas_llm_tokens_total"""
+    counter = get_token_counter(get_llm_backend().model)
+    LLM_TOKENS.inc(counter.count(prompt), kind="prompt")
+    LLM_TOKENS.inc(counter.count(completion), kind="completion")
+
+
+DRAFT_MAX_TOKENS = 2500
+DRAFT_TEMPERATURE = 0.2
+
+
+def _draft_model() -> str:
+    """Backend and model generating drafts, e.g. openai:gpt-4o-mini"""
+    return get_llm_backend().model_id
 
-    raw_text = response.choices[0].message.content
 
+def clean_draft_text(raw_text: str) -> str:
+    """Normalize escaped newlines and strip Markdown markers from a completion"""
     # Post-process: replace literal \n sequences
     raw_text = raw_text.replace("\\n", "\n")
 
@@ -111,7 +169,214 @@ def generate_petition(data: dict):
     raw_text = raw_text.replace("*", "")
     # 3) Remove backticks
     raw_text = raw_text.replace("`", "")
+    return raw_text
+
+
+class StreamCleaner:
+    """Apply clean_draft_text incrementally to streamed completion deltas.
+
+    A trailing backslash is held back so an escaped newline split across two
+    deltas is still normalized; asterisks and backticks are removed one
+    character at a time, so split "**" markers need no special handling.
+    """
+
+    def __init__(self):
+        self._carry = ""
+
+    def feed(self, delta: str) -> str:
+        text = self._carry + delta
+        self._carry = ""
+        if text.endswith("\\"):
+            self._carry = "\\"
+            text = text[:-1]
+        return clean_draft_text(text)
+
+    def flush(self) -> str:
+        text, self._carry = self._carry, ""
+        return clean_draft_text(text)
+
+
+def _cache_lookup_near(data: dict, scratch=None):
+    """Near-duplicate lookup before retrieval.
+
+    Returns (hit, guard, payload_vector); guard and vector are kept so the
+    fresh draft can be stored under them on a miss.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return None, None, None
+    with stage("cache_near"):
+        guard = payload_guard(data, _draft_model(), scratch.fingerprint if scratch else "")
+        vector = None
+        if cache.similarity < 1:
+            vector = rag_service.get_embeddings().embed_query(payload_signature(data))
+        return cache.get_near(guard, vector), guard, vector
+
+
+async def _acache_lookup_near(data: dict, scratch=None):
+    cache = get_response_cache()
+    if cache is None:
+        return None, None, None
+    with stage("cache_near"):
+        guard = payload_guard(data, _draft_model(), scratch.fingerprint if scratch else "")
+        vector = None
+        if cache.similarity < 1:
+            async with waited(embedding_slot(), "embedding_wait"):
+                vector = await rag_service.get_embeddings().aembed_query(payload_signature(data))
+        hit = await run_in_io_pool(cache.get_near, guard, vector)
+    return hit, guard, vector
+
+
+def _cached_result(hit: dict, validation: dict) -> dict:
+    return {"petition": hit["petition"], "docx": hit["docx"], "cache": hit["cache"], "validation": validation}
+
+
+def generate_petition(data: dict, scratch=None):
+    # data is dict from route
+    hit, guard, vector = _cache_lookup_near(data, scratch)
+    if hit:
+        return _cached_result(hit, validate_draft(data, hit["petition"]))
+
+    query_for_retrieval = _retrieval_query(data)
+    
+    # Get draft_type for context filtering
+    draft_type = data.get("draft_type", "")
+    
+    # Retrieve context from the draft type's (and jurisdiction's) KB shards to get relevant sample petitions
+    retrieved = retrieve_context(
+        query_for_retrieval, top_k=PROMPT_CONTEXT_CANDIDATES, draft_type=draft_type, scratch=scratch,
+        jurisdiction=data.get("jurisdiction"),
+    )
+    filled_prompt = build_prompt(data, retrieved)
+
+    cache = get_response_cache()
+    key = prompt_key(_draft_model(), filled_prompt)
+    if cache is not None:
+        with stage("cache_exact"):
+            hit = cache.get_exact(key)
+        if hit:
+            return _cached_result(hit, validate_draft(data, hit["petition"]))
+
+    with stage("llm"):
+        completion = get_llm_backend().complete(filled_prompt, DRAFT_MAX_TOKENS, DRAFT_TEMPERATURE)
+    record_draft_tokens(filled_prompt, completion)
+
+    raw_text = clean_draft_text(completion)
 
     # Export to docx
-    file_path = export_to_docx(raw_text)
-    return {"petition": raw_text, "file_path": file_path}
+    docx_bytes = render_docx(raw_text)
+    if cache is not None:
+        cache.put(key, guard, vector, raw_text, docx_bytes)
+    return {"petition": raw_text, "docx": docx_bytes, "validation": validate_draft(data, raw_text)}
+
+
+async def generate_petition_async(data: dict, scratch=None, retrieved: list = None):
+    """Async variant of generate_petition for use inside request handlers.
+
+    The completion goes through the configured LLM backend under the shared LLM
+    concurrency limit; retrieval and DOCX rendering run off the event loop.
+    The DOCX is returned as bytes, never written to disk.
+    ``scratch`` is the request's own ScratchIndex of uploaded documents.
+    ``retrieved`` skips retrieval with hits fetched by the caller (batches
+    share them between payloads with the same retrieval_request).
+    Cached drafts are returned without retrieval or a completion when
+    possible (see app.services.response_cache).
+    """
+    hit, guard, vector = await _acache_lookup_near(data, scratch)
+    if hit:
+        return _cached_result(hit, await run_in_io_pool(validate_draft, data, hit["petition"]))
+
+    if retrieved is None:
+        draft_type = data.get("draft_type", "")
+        retrieved = await aretrieve_context(
+            _retrieval_query(data), top_k=PROMPT_CONTEXT_CANDIDATES, draft_type=draft_type, scratch=scratch,
+            jurisdiction=data.get("jurisdiction"),
+        )
+    filled_prompt = await run_in_io_pool(build_prompt, data, retrieved)
+
+    cache = get_response_cache()
+    key = prompt_key(_draft_model(), filled_prompt)
+    if cache is not None:
+        with stage("cache_exact"):
+            hit = await run_in_io_pool(cache.get_exact, key)
+        if hit:
+            return _cached_result(hit, await run_in_io_pool(validate_draft, data, hit["petition"]))
+
+    async with waited(llm_slot(), "llm_wait"):
+        with stage("llm"):
+            completion = await get_llm_backend().acomplete(
+                filled_prompt, DRAFT_MAX_TOKENS, DRAFT_TEMPERATURE
+            )
+    await run_in_io_pool(record_draft_tokens, filled_prompt, completion)
+
+    raw_text = clean_draft_text(completion)
+
+    docx_bytes = await run_in_io_pool(render_docx, raw_text)
+    if cache is not None:
+        await run_in_io_pool(cache.put, key, guard, vector, raw_text, docx_bytes)
+    validation = await run_in_io_pool(validate_draft, data, raw_text)
+    return {"petition": raw_text, "docx": docx_bytes, "validation": validation}
+
+
+async def stream_petition(data: dict, scratch=None):
+    """Stream a draft as ("token", text) events, then ("done", result).
+
+    Tokens are cleaned as they arrive and fed into a DocxStreamBuilder, so the
+    DOCX bytes in the final result are ready as soon as the last token lands.
+    A cached draft is sent as a single token event.
+    """
+    hit, guard, vector = await _acache_lookup_near(data, scratch)
+    if hit:
+        yield "token", hit["petition"]
+        yield "done", _cached_result(hit, await run_in_io_pool(validate_draft, data, hit["petition"]))
+        return
+
+    draft_type = data.get("draft_type", "")
+    retrieved = await aretrieve_context(
+        _retrieval_query(data), top_k=PROMPT_CONTEXT_CANDIDATES, draft_type=draft_type, scratch=scratch,
+        jurisdiction=data.get("jurisdiction"),
+    )
+    filled_prompt = await run_in_io_pool(build_prompt, data, retrieved)
+
+    cache = get_response_cache()
+    key = prompt_key(_draft_model(), filled_prompt)
+    if cache is not None:
+        with stage("cache_exact"):
+            hit = await run_in_io_pool(cache.get_exact, key)
+        if hit:
+            yield "token", hit["petition"]
+            yield "done", _cached_result(hit, await run_in_io_pool(validate_draft, data, hit["petition"]))
+            return
+
+    cleaner = StreamCleaner()
+    builder = DocxStreamBuilder()
+    parts = []
+    deltas = []
+
+    async with waited(llm_slot(), "llm_wait"):
+        with stage("llm"):
+            start = time.perf_counter()
+            stream = get_llm_backend().astream(filled_prompt, DRAFT_MAX_TOKENS, DRAFT_TEMPERATURE)
+            async for delta in stream:
+                if not deltas:
+                    observe_stage("llm_first_token", time.perf_counter() - start)
+                deltas.append(delta)
+                text = cleaner.feed(delta)
+                if text:
+                    parts.append(text)
+                    builder.feed(text)
+                    yield "token", text
+    await run_in_io_pool(record_draft_tokens, filled_prompt, "".join(deltas))
+
+    tail = cleaner.flush()
+    if tail:
+        parts.append(tail)
+        builder.feed(tail)
+        yield "token", tail
+
+    petition = "".join(parts)
+    docx_bytes = await run_in_io_pool(builder.to_bytes)
+    if cache is not None:
+        await run_in_io_pool(cache.put, key, guard, vector, petition, docx_bytes)
+    validation = await run_in_io_pool(validate_draft, data, petition)
+    yield "done", {"petition": petition, "docx": docx_bytes, "validation": validation}
@@ -0,0 +1,308 @@
+# Embedding backends (OpenAI, local ONNX / sentence-transformers), selectable per collection
+import asyncio
+import os
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# "backend[:model]" used for collections without their own setting, e.g.
+# "openai", "openai:text-embedding-3-small", "onnx", "onnx:/models/bge-small",
+# "sentence-transformers:BAAI/bge-small-en-v1.5"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai").strip()
+# Per-collection overrides (uploads in /generate follow TEMP_KB_EMBEDDING)
+PERMANENT_KB_EMBEDDING = os.getenv("PERMANENT_KB_EMBEDDING", "").strip()
+TEMP_KB_EMBEDDING = os.getenv("TEMP_KB_EMBEDDING", "").strip()
+# Texts per forward pass of a local model; concurrent calls are coalesced up to this
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+# How long the first call of a batch waits for others to join it
+LOCAL_EMBEDDING_MAX_WAIT_MS = float(os.getenv("LOCAL_EMBEDDING_MAX_WAIT_MS", "5"))
+# Intra-op threads of the local model; 0 uses every core
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))
+# "int8" runs the local model with dynamically quantized weights (about 2x faster on CPU)
+LOCAL_EMBEDDING_QUANTIZE = os.getenv("LOCAL_EMBEDDING_QUANTIZE", "").strip().lower()
+LOCAL_EMBEDDING_MAX_TOKENS = int(os.getenv("LOCAL_EMBEDDING_MAX_TOKENS", "256"))
+LOCAL_EMBEDDING_DEVICE = os.getenv("LOCAL_EMBEDDING_DEVICE", "cpu")
+
+BACKENDS = ("openai", "onnx", "sentence-transformers")
+# Collections written before backends were configurable hold OpenAIEmbeddings' default model
+LEGACY_EMBEDDING_SPEC = "openai"
+# The model chromadb downloads for its own default embedding function
+DEFAULT_ONNX_MODEL = os.path.join(
+    os.path.expanduser("~"), ".cache", "chroma", "onnx_models", "all-MiniLM-L6-v2", "onnx"
+)
+DEFAULT_SENTENCE_TRANSFORMER = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def parse_spec(spec: str) -> Tuple[str, Optional[str]]:
+    """("backend", model or None) of an embedding spec; raises ValueError when unknown"""
+    backend, _, model = (spec or LEGACY_EMBEDDING_SPEC).strip().partition(":")
+    backend = backend.strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown embedding backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    return backend, model.strip() or None
+
+
+def configured_spec(collection: str) -> str:
+    """The spec a collection uses when it is created (the permanent KB's shards share its spec)"""
+    permanent = collection == "permanent_kb" or collection.startswith("permanent_kb__")
+    override = PERMANENT_KB_EMBEDDING if permanent else TEMP_KB_EMBEDDING
+    return override or EMBEDDING_BACKEND
+
+
+class MicroBatcher:
+    """Coalesces concurrent embedding calls into model-sized batches on one thread.
+
+    The first call waits up to max_wait_ms for others, so many small calls
+    (queries of concurrent requests) share a forward pass while a single
+    large call (an ingest) starts at once. Calls are answered in order.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], batch_size: int, max_wait_ms: float):
+        self.encode = encode
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue[Optional[Tuple[List[str], Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def _collect(self, first) -> list:
+        pending, count = [first], len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while count < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            pending.append(item)
+            count += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            pending = self._collect(first)
+            try:
+                vectors = self.encode([t for texts, _ in pending for t in texts])
+            except BaseException as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for texts, future in pending:
+                future.set_result(vectors[offset:offset + len(texts)])
+                offset += len(texts)
+
+    def close(self):
+        self._queue.put(None)
+
+
+class LocalModel(ABC):
+    """A local encoder; texts are sorted by length so each batch pads little"""
+
+    dimensions: Optional[int] = None
+
+    def __init__(self, batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE):
+        self.batch_size = max(1, batch_size)
+
+    @abstractmethod
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Vectors of one batch of texts, any norm"""
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Unit-length float32 vectors in input order"""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = None
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            vectors = np.asarray(self._encode_batch([texts[i] for i in batch]), dtype=np.float32)
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[batch] = vectors
+        if out is None:
+            return np.empty((0, self.dimensions or 0), dtype=np.float32)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+
+def _threads() -> int:
+    return LOCAL_EMBEDDING_THREADS or os.cpu_count() or 1
+
+
+def _quantized_onnx(path: str) -> str:
+    """Path of an int8 copy of an ONNX model, created next to it on first use"""
+    target = path[:-len(".onnx")] + ".int8.onnx"
+    if not os.path.exists(target):
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError as e:
+            raise RuntimeError("int8 quantization of ONNX models needs the onnx package: pip install onnx") from e
+        partial_path = target[:-len(".onnx")] + ".partial.onnx"
+        quantize_dynamic(path, partial_path, weight_type=QuantType.QInt8)
+        os.replace(partial_path, target)
+    return target
+
+
+class OnnxModel(LocalModel):
+    """A transformer exported to ONNX (model.onnx + tokenizer.json), mean-pooled.
+
+    Runs on onnxruntime, which chromadb already depends on. Without a model
+    directory, chromadb's all-MiniLM-L6-v2 download is used (fetched once).
+    """
+
+    def __init__(self, path: str = None, threads: int = None, quantize: str = LOCAL_EMBEDDING_QUANTIZE,
+                 max_tokens: int = LOCAL_EMBEDDING_MAX_TOKENS, batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE):
+        super().__init__(batch_size)
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = path or DEFAULT_ONNX_MODEL
+        if path == DEFAULT_ONNX_MODEL and not os.path.exists(os.path.join(path, "model.onnx")):
+            from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+            ONNXMiniLM_L6_V2()(["download"])
+        model_path = os.path.join(path, "model.onnx")
+        if quantize == "int8":
+            model_path = _quantized_onnx(model_path)
+        elif quantize:
+            raise ValueError(f"unsupported LOCAL_EMBEDDING_QUANTIZE {quantize!r} for ONNX models; expected 'int8'")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or _threads()
+        options.inter_op_num_threads = 1
+        options.log_severity_level = 3
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_tokens)
+        # Pad to the longest text of each batch, not to max_tokens
+        padding = self.tokenizer.padding or {"pad_id": 0, "pad_token": "[PAD]"}
+        self.tokenizer.enable_padding(pad_id=padding["pad_id"], pad_token=padding["pad_token"])
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.inputs:
+            feed["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feed)[0]
+        weights = mask[..., None].astype(np.float32)
+        return (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+
+
+class SentenceTransformerModel(LocalModel):
+    """Any sentence-transformers model (optional dependency, needs torch)"""
+
+    def __init__(self, model: str = None, threads: int = None, quantize: str = LOCAL_EMBEDDING_QUANTIZE,
+                 device: str = LOCAL_EMBEDDING_DEVICE, batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE):
+        super().__init__(batch_size)
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "the sentence-transformers embedding backend needs: pip install sentence-transformers"
+            ) from e
+        torch.set_num_threads(threads or _threads())
+        self.model = SentenceTransformer(model or DEFAULT_SENTENCE_TRANSFORMER, device=device)
+        if quantize == "int8":
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif quantize == "float16":
+            self.model = self.model.half()
+        elif quantize:
+            raise ValueError(f"unsupported LOCAL_EMBEDDING_QUANTIZE {quantize!r}; expected 'int8' or 'float16'")
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True, show_progress_bar=False)
+
+
+class LocalEmbeddings(Embeddings):
+    """LangChain embeddings over a local model, loaded on first use.
+
+    Calls from any thread or coroutine go through one MicroBatcher, so the
+    model sees full batches and never runs two forward passes at once;
+    parallelism comes from the model's intra-op threads.
+    """
+
+    def __init__(self, factory: Callable[[], LocalModel], model: str,
+                 batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE, max_wait_ms: float = LOCAL_EMBEDDING_MAX_WAIT_MS):
+        self.model = model
+        self._factory = factory
+        self._batch_size = batch_size
+        self._max_wait_ms = max_wait_ms
+        self._batcher: Optional[MicroBatcher] = None
+        self._lock = threading.Lock()
+
+    def _get_batcher(self) -> MicroBatcher:
+        with self._lock:
+            if self._batcher is None:
+                local = self._factory()
+                self._batcher = MicroBatcher(local.encode, self._batch_size, self._max_wait_ms)
+            return self._batcher
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._get_batcher().submit(texts).result().tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Loading the model blocks, so the first call does it off the event loop
+        batcher = self._batcher or await asyncio.to_thread(self._get_batcher)
+        return (await asyncio.wrap_future(batcher.submit(texts))).tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def close(self):
+        with self._lock:
+            if self._batcher is not None:
+                self._batcher.close()
+                self._batcher = None
+
+
+def create_embeddings(spec: str, http_client=None, http_async_client=None) -> Embeddings:
+    """Uncached embeddings for a spec (see EMBEDDING_BACKEND)"""
+    backend, model = parse_spec(spec)
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        # Token-length checking needs tiktoken's BPE files; allow turning it
+        # off for offline runs (benchmarks, air-gapped deployments)
+        check_ctx = os.getenv("OPENAI_EMBEDDING_CHECK_CTX_LENGTH", "1") != "0"
+        kwargs = {"model": model} if model else {}
+        return OpenAIEmbeddings(
+            check_embedding_ctx_length=check_ctx,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            **kwargs,
+        )
+    # Quantized weights give slightly different vectors, so they are cached apart
+    suffix = f"+{LOCAL_EMBEDDING_QUANTIZE}" if LOCAL_EMBEDDING_QUANTIZE else ""
+    if backend == "onnx":
+        return LocalEmbeddings(lambda: OnnxModel(model), f"onnx:{model or 'all-MiniLM-L6-v2'}{suffix}")
+    return LocalEmbeddings(
+        lambda: SentenceTransformerModel(model), f"sentence-transformers:{model or DEFAULT_SENTENCE_TRANSFORMER}{suffix}"
+    )
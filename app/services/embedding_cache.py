@@ -0,0 +1,139 @@
+# Content-addressed embedding cache shared by every embeddings caller
+import hashlib
+import os
+import struct
+from array import array
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from langchain_core.embeddings import Embeddings
+
+from app.services.concurrency import run_in_io_pool
+from app.services.metrics import CACHE_LOOKUPS, EMBEDDING_REQUESTS, EMBEDDING_TEXTS, stage
+from utils.sqlite_cache import SQLiteLRUCache
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+# Precision vectors are stored (and returned) in: float32, float16 (half the
+# size) or int8 (a quarter, with one float32 scale per vector)
+EMBEDDING_PRECISION = os.getenv("EMBEDDING_PRECISION", "float32").strip().lower()
+PRECISIONS = ("float32", "float16", "int8")
+
+_cache: Optional[SQLiteLRUCache] = None
+
+
+def get_embedding_cache() -> SQLiteLRUCache:
+    """Get the process-wide embedding cache - lazy initialization"""
+    global _cache
+    if _cache is None:
+        _cache = SQLiteLRUCache(
+            EMBEDDING_CACHE_PATH,
+            max_bytes=int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024),
+            table="embeddings",
+        )
+    return _cache
+
+
+def _lookups() -> Dict[tuple, float]:
+    if _cache is None:
+        return {}
+    return {("embeddings", "hit"): _cache.hits, ("embeddings", "miss"): _cache.misses}
+
+
+CACHE_LOOKUPS.add_collector(_lookups)
+
+
+def _pack(vector: List[float], precision: str = "float32") -> bytes:
+    if precision == "float16":
+        return np.asarray(vector, dtype=np.float16).tobytes()
+    if precision == "int8":
+        values = np.asarray(vector, dtype=np.float32)
+        scale = float(np.abs(values).max()) / 127 or 1.0
+        return struct.pack("<f", scale) + np.round(values / scale).astype(np.int8).tobytes()
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes, precision: str = "float32") -> List[float]:
+    if precision == "float16":
+        return np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+    if precision == "int8":
+        scale = struct.unpack_from("<f", blob)[0]
+        return (np.frombuffer(blob, dtype=np.int8, offset=4).astype(np.float32) * scale).tolist()
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+def embedding_model_name(embeddings: Embeddings) -> str:
+    """Identify an embeddings backend for cache keys (model plus output size)"""
+    name = getattr(embeddings, "model", None) or type(embeddings).__name__
+    dimensions = getattr(embeddings, "dimensions", None)
+    return f"{name}:{dimensions}" if dimensions else name
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends texts it has never seen to the backend.
+
+    Vectors are stored as float32 blobs keyed by sha256(model, text), so the
+    same chunk is embedded once no matter how often it is ingested or queried.
+    Fresh vectors are rounded through the storage precision as well, so
+    cached and uncached calls return identical values.
+    """
+
+    def __init__(self, inner: Embeddings, cache: SQLiteLRUCache, model_name: str = None,
+                 precision: str = EMBEDDING_PRECISION):
+        if precision not in PRECISIONS:
+            raise ValueError(f"unknown EMBEDDING_PRECISION {precision!r}; expected one of {', '.join(PRECISIONS)}")
+        self.inner = inner
+        self.cache = cache
+        self.precision = precision
+        self.model_name = model_name or embedding_model_name(inner)
+        # float32 keeps the key format of caches written before precisions existed
+        self._key_prefix = self.model_name if precision == "float32" else f"{self.model_name}@{precision}"
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self._key_prefix}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, texts: List[str]):
+        keys = [self._key(t) for t in texts]
+        found = self.cache.get_many(keys)
+        missing: Dict[str, str] = {}
+        for text, key in zip(texts, keys):
+            if key not in found and key not in missing:
+                missing[key] = text
+        EMBEDDING_TEXTS.inc(len(texts) - len(missing), model=self.model_name, source="cache")
+        return keys, found, missing
+
+    def _record_request(self, missing: Dict[str, str]):
+        EMBEDDING_REQUESTS.inc(model=self.model_name)
+        EMBEDDING_TEXTS.inc(len(missing), model=self.model_name, source="backend")
+
+    def _store(self, found: Dict[str, bytes], missing: Dict[str, str], vectors: List[List[float]]):
+        fresh = {key: _pack(vector, self.precision) for key, vector in zip(missing, vectors)}
+        self.cache.set_many(fresh)
+        found.update(fresh)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._lookup(texts)
+        if missing:
+            self._record_request(missing)
+            with stage("embedding_request"):
+                vectors = self.inner.embed_documents(list(missing.values()))
+            self._store(found, missing, vectors)
+        return [_unpack(found[k], self.precision) for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = await run_in_io_pool(self._lookup, texts)
+        if missing:
+            self._record_request(missing)
+            with stage("embedding_request"):
+                vectors = await self.inner.aembed_documents(list(missing.values()))
+            await run_in_io_pool(self._store, found, missing, vectors)
+        return [_unpack(found[k], self.precision) for k in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
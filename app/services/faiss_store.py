@@ -0,0 +1,498 @@
+# On-disk FAISS vector store for the permanent KB (VECTOR_STORE=faiss)
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single writing process is assumed
+    fcntl = None
+
+# Index of sealed vectors, as a faiss.index_factory string. IVF indexes are
+# memory-mapped whole: "IVF1024,SQ8" (one byte per dimension) by default, or
+# "IVF1024,PQ32" (32 bytes per vector, lower recall; the PQ size must divide
+# the dimension). "HNSW32,SQ8" is mapped too, but its graph is read into memory.
+FAISS_INDEX = os.getenv("FAISS_INDEX", "IVF1024,SQ8")
+# Vectors kept exact and in memory before they are quantized into the
+# memory-mapped index; the first seal also trains the index on them
+FAISS_SEGMENT_SIZE = int(os.getenv("FAISS_SEGMENT_SIZE", "20000"))
+# Sealed vectors per index file; seals add to the last file until it is full
+FAISS_MAX_SEGMENT = int(os.getenv("FAISS_MAX_SEGMENT", "500000"))
+# Search breadth: IVF lists probed, HNSW candidate list size
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "32"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "128"))
+# Candidates fetched per wanted hit, to make up for deleted and filtered-out chunks
+FAISS_OVERFETCH = int(os.getenv("FAISS_OVERFETCH", "4"))
+
+_KEY_RE = re.compile(r"^[A-Za-z0-9_]+$")
+_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+# Metadata keys looked up by ingest and retrieval, indexed in SQLite
+_INDEXED_KEYS = ("doc_id", "source", "draft_type")
+_COLUMNS = "id, label, text_offset, text_length, metadata"
+
+
+def _where_sql(where: Optional[dict]) -> Tuple[str, list]:
+    """Translate a Chroma metadata filter ({"k": v}, $eq/$ne/$gt.../$in, $and/$or) to SQL"""
+    if not where:
+        return "1", []
+    parts, params = [], []
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            subs = [_where_sql(w) for w in value]
+            parts.append("(" + f" {key[1:].upper()} ".join(s for s, _ in subs) + ")")
+            params.extend(p for _, ps in subs for p in ps)
+            continue
+        if not _KEY_RE.match(key):
+            raise ValueError(f"unsupported metadata key {key!r}")
+        column = f"json_extract(metadata, '$.{key}')"
+        op, operand = next(iter(value.items())) if isinstance(value, dict) else ("$eq", value)
+        if op in ("$in", "$nin"):
+            marks = ",".join("?" * len(operand)) or "NULL"
+            parts.append(f"{column} {'IN' if op == '$in' else 'NOT IN'} ({marks})")
+            params.extend(operand)
+        elif op in _OPERATORS:
+            parts.append(f"{column} {_OPERATORS[op]} ?")
+            params.append(operand)
+        else:
+            raise ValueError(f"unsupported filter operator {op!r}")
+    return " AND ".join(parts), params
+
+
+def _search_params(index, fetch: int):
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=FAISS_NPROBE)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=max(FAISS_EF_SEARCH, fetch))
+    return None
+
+
+class _LiveSegment:
+    """Newest vectors, exact and in memory; appended to a raw float32 file.
+
+    Readers take the current count and buffer without a lock: appends write
+    past the count before raising it, and growing the buffer replaces it.
+    """
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.count = 0
+        self._buffer = np.zeros((1024, dim), dtype=np.float32)
+        self.load_tail()
+
+    def load_tail(self):
+        """Pick up vectors appended to the file (by this or another process)"""
+        if not os.path.exists(self.path):
+            return
+        rows = os.path.getsize(self.path) // (4 * self.dim)
+        if rows <= self.count:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.count * 4 * self.dim)
+            tail = np.frombuffer(f.read((rows - self.count) * 4 * self.dim), dtype=np.float32)
+        self._append(tail.reshape(-1, self.dim))
+
+    def _append(self, vectors: np.ndarray):
+        needed = self.count + len(vectors)
+        if needed > len(self._buffer):
+            grown = np.zeros((max(needed, 2 * len(self._buffer)), self.dim), dtype=np.float32)
+            grown[:self.count] = self._buffer[:self.count]
+            self._buffer = grown
+        self._buffer[self.count:needed] = vectors
+        self.count = needed
+
+    def add(self, vectors: np.ndarray) -> int:
+        """Append vectors (file first, then memory); returns the position of the first"""
+        first = self.count
+        with open(self.path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._append(vectors)
+        return first
+
+    def vectors(self) -> np.ndarray:
+        return self._buffer[:self.count]
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        count, buffer = self.count, self._buffer
+        if not count or k <= 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        scores = buffer[:count] @ query
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return scores[top], top
+
+
+class FaissCollection:
+    """A KB collection stored as a memory-mapped FAISS index plus flat files.
+
+    Vectors are L2-normalized and compared by inner product (cosine); each
+    gets the next integer label. New vectors go to an exact in-memory live
+    segment; once it holds FAISS_SEGMENT_SIZE vectors they are quantized
+    into the sealed index files, opened with mmap so the OS page cache,
+    shared by all processes, holds them instead of each worker's heap. A
+    seal adds to a copy of the last file and swaps it in until that file
+    holds FAISS_MAX_SEGMENT vectors, so a query searches few files and
+    existing ones are never rebuilt. Chunk texts are appended to texts.bin
+    and read back by offset; IDs, labels, offsets and metadata live in
+    SQLite. A deleted or replaced chunk leaves its vector in place,
+    unreferenced.
+
+    The API is the subset of a Chroma collection RAGService uses (get,
+    upsert, update, delete, query, count, peek, metadata, modify), with the
+    same result shapes and distances reported as 1 - cosine similarity.
+    One process writes at a time (a file lock); other processes reload when
+    the store's generation changes.
+    """
+
+    def __init__(self, path: str, name: str = "permanent_kb", metadata: dict = None,
+                 index_factory: str = None, segment_size: int = None, max_segment: int = None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.name = name
+        self.index_factory = index_factory or FAISS_INDEX
+        self.segment_size = segment_size or FAISS_SEGMENT_SIZE
+        self.max_segment = max_segment or FAISS_MAX_SEGMENT
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._conn = sqlite3.connect(
+            os.path.join(path, "chunks.sqlite3"), check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY, label INTEGER NOT NULL UNIQUE,
+                text_offset INTEGER NOT NULL, text_length INTEGER NOT NULL, metadata TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """
+        )
+        for key in _INDEXED_KEYS:
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_chunks_{key} ON chunks(json_extract(metadata, '$.{key}'))"
+            )
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "INSERT OR IGNORE INTO meta VALUES ('generation', '0'), ('live_start', '0'), ('sealed', '[]')"
+            )
+            if metadata:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO meta VALUES ('collection_metadata', ?)", (json.dumps(metadata),)
+                )
+        self._texts_path = os.path.join(path, "texts.bin")
+        open(self._texts_path, "ab").close()
+        self._texts_fd = os.open(self._texts_path, os.O_RDONLY)
+        self._writer_lock = open(os.path.join(path, "write.lock"), "a")
+        self._generation = None
+        # ({file, first label, label past the last}, mmapped index) per sealed file
+        self._sealed: List[Tuple[dict, Any]] = []
+        self._live: Optional[_LiveSegment] = None
+        self._live_start = 0
+        self.dim: Optional[int] = None
+        self._refresh()
+
+    # Files and persistent state
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self._file("chunks.sqlite3"), isolation_level=None, timeout=30)
+        return conn
+
+    def _meta(self, conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _refresh(self):
+        """Reopen the index if another process sealed vectors, and load live vectors it appended"""
+        conn = self._reader()
+        if self._meta(conn, "generation") == self._generation:
+            if self._live is not None:
+                self._live.load_tail()
+            return
+        with self._lock:
+            while True:
+                with conn:
+                    # One snapshot of the state, then the files it names
+                    conn.execute("BEGIN")
+                    generation = self._meta(conn, "generation")
+                    dim = self._meta(conn, "dimension")
+                    live_start = int(self._meta(conn, "live_start"))
+                    sealed = json.loads(self._meta(conn, "sealed"))
+                if generation == self._generation:
+                    return
+                opened = {entry["file"]: index for entry, index in self._sealed}
+                try:
+                    self._sealed = [
+                        (entry, opened.get(entry["file"]) or faiss.read_index(self._file(entry["file"]), faiss.IO_FLAG_MMAP))
+                        for entry in sealed
+                    ]
+                except RuntimeError:
+                    if all(os.path.exists(self._file(entry["file"])) for entry in sealed):
+                        raise
+                    # Replaced by a seal in another process since the snapshot
+                    continue
+                self.dim = int(dim) if dim else None
+                self._live_start = live_start
+                self._live = _LiveSegment(self._file(f"live-{live_start:012d}.f32"), self.dim) if self.dim else None
+                self._generation = generation
+                return
+
+    def _bump_generation(self):
+        self._conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'")
+
+    def _write_lock(self):
+        """Exclusive across processes; released by _write_unlock"""
+        self._lock.acquire()
+        if fcntl is not None:
+            fcntl.flock(self._writer_lock, fcntl.LOCK_EX)
+
+    def _write_unlock(self):
+        if fcntl is not None:
+            fcntl.flock(self._writer_lock, fcntl.LOCK_UN)
+        self._lock.release()
+
+    # Collection API
+
+    @property
+    def metadata(self) -> dict:
+        stored = self._meta(self._reader(), "collection_metadata")
+        # Distances are 1 - inner product of unit vectors, as in Chroma's "ip" space
+        return dict(json.loads(stored) if stored else {}, **{"hnsw:space": "ip"})
+
+    def modify(self, metadata: dict = None, name: str = None):
+        if metadata is not None:
+            metadata = {k: v for k, v in metadata.items() if not k.startswith("hnsw:")}
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('collection_metadata', ?)", (json.dumps(metadata),)
+                )
+
+    def count(self) -> int:
+        # Counting rows scans an index; kept per thread until another connection writes
+        conn = self._reader()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        cached = getattr(self._local, "count", None)
+        if cached is None or cached[0] != version:
+            cached = self._local.count = (version, conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0])
+        return cached[1]
+
+    def _texts(self, rows) -> List[str]:
+        return [os.pread(self._texts_fd, length, offset).decode("utf-8") for _, _, offset, length, _ in rows]
+
+    def _vector(self, label: int) -> Optional[np.ndarray]:
+        live, live_start = self._live, self._live_start
+        if live is not None and live_start <= label < live_start + live.count:
+            return live.vectors()[label - live_start].copy()
+        for entry, index in self._sealed:
+            if entry["start"] <= label < entry["stop"]:
+                return index.reconstruct(label - entry["start"])
+        return None
+
+    def get(self, ids: Sequence[str] = None, where: dict = None, limit: int = None, offset: int = None,
+            include: Sequence[str] = ("documents", "metadatas")) -> Dict[str, Any]:
+        self._refresh()
+        sql, params = _where_sql(where)
+        if ids is not None:
+            ids = list(ids)
+            sql += f" AND id IN ({','.join('?' * len(ids)) or 'NULL'})"
+            params += ids
+        query = f"SELECT {_COLUMNS} FROM chunks WHERE {sql} ORDER BY rowid"
+        if limit is not None or offset:
+            query += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset or 0]
+        return self._result(self._reader().execute(query, params).fetchall(), include)
+
+    def _result(self, rows, include, distances=None) -> Dict[str, Any]:
+        result = {"ids": [r[0] for r in rows], "documents": None, "metadatas": None, "embeddings": None,
+                  "included": list(include)}
+        if "documents" in include:
+            result["documents"] = self._texts(rows)
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(r[4]) for r in rows]
+        if "embeddings" in include:
+            result["embeddings"] = [self._vector(r[1]) for r in rows]
+        if distances is not None:
+            result["distances"] = distances
+        return result
+
+    def peek(self, limit: int = 10) -> Dict[str, Any]:
+        return self.get(limit=limit, include=("documents", "metadatas", "embeddings"))
+
+    def upsert(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]], documents: Sequence[str] = None,
+               metadatas: Sequence[dict] = None):
+        """Add chunks, replacing any stored under the same IDs"""
+        if not ids:
+            return
+        vectors = np.array(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        faiss.normalize_L2(vectors)
+        documents = documents or [""] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        self._write_lock()
+        try:
+            self._refresh()
+            if self.dim is None:
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('dimension', ?)", (str(vectors.shape[1]),))
+                    self._bump_generation()
+                self._refresh()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"embedding dimension {vectors.shape[1]} does not match the store's {self.dim}")
+
+            encoded = [(d or "").encode("utf-8") for d in documents]
+            with open(self._texts_path, "ab") as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(b"".join(encoded))
+            label = self._live_start + self._live.add(vectors)
+            rows = []
+            for chunk, text, meta in zip(ids, encoded, metadatas):
+                rows.append((chunk, label, offset, len(text), json.dumps(meta or {})))
+                label += 1
+                offset += len(text)
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(f"INSERT OR REPLACE INTO chunks ({_COLUMNS}) VALUES (?, ?, ?, ?, ?)", rows)
+            if self._live.count >= self.segment_size:
+                self._seal()
+        finally:
+            self._write_unlock()
+
+    def _seal(self):
+        """Quantize the live segment into the sealed index (write lock held)"""
+        vectors = self._live.vectors()
+        start, stop = self._live_start, self._live_start + len(vectors)
+        trained = self._file("trained.faiss")
+        if os.path.exists(trained):
+            template = faiss.read_index(trained)
+        else:
+            template = faiss.index_factory(self.dim, self.index_factory, faiss.METRIC_INNER_PRODUCT)
+            template.train(vectors)
+            faiss.write_index(template, trained + ".tmp")
+            os.replace(trained + ".tmp", trained)
+
+        sealed = [entry for entry, _ in self._sealed]
+        replaced = []
+        if sealed and sealed[-1]["stop"] - sealed[-1]["start"] < self.max_segment:
+            # Grow the last file: loaded into memory, as an mmapped index is read-only,
+            # and written under a new name. Positions continue from its last label.
+            index = faiss.read_index(self._file(sealed[-1]["file"]))
+            start = sealed[-1]["start"]
+            replaced.append(sealed.pop()["file"])
+        else:
+            index = template
+            if faiss.try_extract_index_ivf(index) is not None:
+                # Lets hits be reconstructed (for MMR) from the mmapped file
+                faiss.extract_index_ivf(index).make_direct_map()
+        index.add(vectors)
+        sealed.append({"file": f"segment-{start:012d}-{stop:012d}.faiss", "start": start, "stop": stop})
+        path = self._file(sealed[-1]["file"])
+        faiss.write_index(index, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("UPDATE meta SET value = ? WHERE key = 'sealed'", (json.dumps(sealed),))
+            self._conn.execute("UPDATE meta SET value = ? WHERE key = 'live_start'", (str(stop),))
+            self._bump_generation()
+        # Processes still mapping the old files keep them until they reload
+        for name in replaced + [os.path.basename(self._live.path)]:
+            os.remove(self._file(name))
+        self._refresh()
+
+    def update(self, ids: Sequence[str], metadatas: Sequence[dict]):
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "UPDATE chunks SET metadata = ? WHERE id = ?",
+                [(json.dumps(m or {}), i) for i, m in zip(ids, metadatas)],
+            )
+
+    def delete(self, ids: Sequence[str] = None, where: dict = None):
+        sql, params = _where_sql(where)
+        if ids is not None:
+            ids = list(ids)
+            sql += f" AND id IN ({','.join('?' * len(ids)) or 'NULL'})"
+            params += ids
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(f"DELETE FROM chunks WHERE {sql}", params)
+
+    def _search_vectors(self, query: np.ndarray, fetch: int) -> List[Tuple[float, int]]:
+        """(score, label) of the best fetch vectors of every sealed index and the live segment"""
+        candidates = []
+        for entry, index in self._sealed:
+            scores, labels = index.search(query.reshape(1, -1), min(fetch, index.ntotal),
+                                          params=_search_params(index, fetch))
+            candidates.extend((float(s), int(l) + entry["start"]) for s, l in zip(scores[0], labels[0]) if l >= 0)
+        if self._live is not None:
+            scores, positions = self._live.search(query, fetch)
+            candidates.extend((float(s), self._live_start + int(p)) for s, p in zip(scores, positions))
+        candidates.sort(reverse=True)
+        return candidates
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10, where: dict = None,
+              include: Sequence[str] = ("documents", "metadatas", "distances")) -> Dict[str, Any]:
+        """Top hits per query vector, dropping deleted chunks and those not matching where"""
+        self._refresh()
+        out = {key: [] for key in ("ids", "documents", "metadatas", "embeddings", "distances")}
+        sql, params = _where_sql(where)
+        for vector in query_embeddings:
+            query = np.array(vector, dtype=np.float32).reshape(1, -1)
+            faiss.normalize_L2(query)
+            query = query[0]
+            fetch = n_results * max(FAISS_OVERFETCH, 1)
+            while True:
+                candidates = self._search_vectors(query, fetch)
+                found = self._resolve(candidates, sql, params)
+                # Deletes and filters can leave too few; widen the search until every vector is a candidate
+                if len(found) >= n_results or len(candidates) < fetch:
+                    break
+                fetch *= 4
+            found = found[:n_results]
+            result = self._result([row for _, row in found], include, distances=[1.0 - s for s, _ in found])
+            for key in out:
+                out[key].append(result.get(key))
+        return out
+
+    def _resolve(self, candidates, sql: str, params: list) -> List[Tuple[float, tuple]]:
+        """(score, chunk row) for candidates still stored and matching the filter, best first"""
+        rows = {}
+        conn = self._reader()
+        for i in range(0, len(candidates), 500):
+            labels = [label for _, label in candidates[i:i + 500]]
+            for row in conn.execute(
+                f"SELECT {_COLUMNS} FROM chunks WHERE label IN ({','.join('?' * len(labels))}) AND {sql}",
+                labels + params,
+            ):
+                rows[row[1]] = row
+        return [(score, rows[label]) for score, label in candidates if label in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """Vectors in the sealed index files and the live segment, and bytes on disk"""
+        self._refresh()
+        return {
+            "chunks": self.count(),
+            "sealed": {entry["file"]: index.ntotal for entry, index in self._sealed},
+            "live_vectors": self._live.count if self._live is not None else 0,
+            "disk_bytes": sum(e.stat().st_size for e in os.scandir(self.path) if e.is_file()),
+        }
+
+
+class FaissVectorStore:
+    """Holder matching the attributes RAGService reads from a LangChain Chroma store"""
+
+    def __init__(self, collection_name: str, persist_directory: str, embedding_function=None,
+                 collection_metadata: dict = None):
+        self._collection = FaissCollection(persist_directory, collection_name, metadata=collection_metadata)
+        self._embedding_function = embedding_function
@@ -0,0 +1,342 @@
+# Durable background queue for /ingest, backed by SQLite
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import UploadFile
+
+from app.services.concurrency import run_in_io_pool
+from app.services.metrics import QUEUE_DEPTH
+from app.services.rag_service import aingest_pages
+from utils.document_loader import aiter_path_pages, spool_upload
+
+INGEST_QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "./cache/ingest_jobs.sqlite3")
+# Uploads wait here until their job has run
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "./cache/ingest_uploads")
+# Jobs processed at the same time per app process
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Idle workers look for new or abandoned jobs this often
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "2"))
+# A running job whose heartbeat is older than this is considered abandoned
+# (its process stopped) and is picked up again
+INGEST_STALE_SECONDS = float(os.getenv("INGEST_STALE_SECONDS", "30"))
+# A job claimed this many times without finishing (its worker crashed or
+# raised each time) is marked failed instead of being retried again
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+# Finished jobs are reported for this long, then forgotten
+INGEST_JOB_RETENTION_SECONDS = int(os.getenv("INGEST_JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+_queue = None
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueue:
+    """Ingestion jobs and their files in SQLite, worked off by asyncio tasks.
+
+    A job is claimed in a transaction, so several workers (or app processes
+    sharing the database) never run the same job. Progress is written per
+    file and running jobs heartbeat; after a restart, files not yet stored
+    are picked up again once the heartbeat goes stale. Re-ingesting a file
+    is an upsert, so a file interrupted half-way is safe to redo.
+    """
+
+    def __init__(self, path: str = INGEST_QUEUE_PATH, spool_dir: str = INGEST_SPOOL_DIR):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.spool_dir = spool_dir
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, status TEXT NOT NULL, created_at REAL NOT NULL,
+                started_at REAL, finished_at REAL, heartbeat_at REAL, attempts INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+            CREATE TABLE IF NOT EXISTS job_files (
+                job_id TEXT NOT NULL, position INTEGER NOT NULL, filename TEXT NOT NULL,
+                path TEXT NOT NULL, sha256 TEXT NOT NULL, status TEXT NOT NULL,
+                chunks INTEGER NOT NULL DEFAULT 0, error TEXT,
+                PRIMARY KEY (job_id, position)
+            );
+            """
+        )
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self._running = set()
+
+    # SQLite access (blocking; called through the I/O pool)
+
+    def enqueue(self, job_id: str, files: List[Dict[str, str]]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("INSERT INTO jobs (id, status, created_at) VALUES (?, 'queued', ?)", (job_id, now))
+            self._conn.executemany(
+                "INSERT INTO job_files (job_id, position, filename, path, sha256, status) VALUES (?, ?, ?, ?, ?, 'queued')",
+                [(job_id, i, f["filename"], f["path"], f["sha256"]) for i, f in enumerate(files)],
+            )
+
+    def claim(self) -> Optional[str]:
+        """Mark the oldest queued (or abandoned) job running and return its ID.
+
+        A job already claimed INGEST_MAX_ATTEMPTS times is marked failed,
+        with its unfinished files, and the next one is tried.
+        """
+        now = time.time()
+        job_id, given_up = None, []
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            while job_id is None:
+                row = self._conn.execute(
+                    """
+                    SELECT id, attempts FROM jobs
+                    WHERE status = 'queued' OR (status = 'running' AND heartbeat_at < ?)
+                    ORDER BY created_at LIMIT 1
+                    """,
+                    (now - INGEST_STALE_SECONDS,),
+                ).fetchone()
+                if row is None:
+                    break
+                if row[1] >= INGEST_MAX_ATTEMPTS:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'failed', finished_at = ? WHERE id = ?", (now, row[0])
+                    )
+                    self._conn.execute(
+                        """
+                        UPDATE job_files SET status = 'failed', error = ?
+                        WHERE job_id = ? AND status NOT IN ('done', 'failed')
+                        """,
+                        (f"gave up after {row[1]} attempts", row[0]),
+                    )
+                    given_up.append(row[0])
+                    continue
+                job_id = row[0]
+                self._conn.execute(
+                    """
+                    UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?),
+                        heartbeat_at = ?, attempts = attempts + 1
+                    WHERE id = ?
+                    """,
+                    (now, now, job_id),
+                )
+        for failed in given_up:
+            logger.error("Ingest job %s failed after %d attempts", failed, INGEST_MAX_ATTEMPTS)
+            shutil.rmtree(os.path.join(self.spool_dir, failed), True)
+        return job_id
+
+    def requeue(self, job_ids: List[str]):
+        """Hand running jobs back to the queue (used on a clean shutdown).
+
+        The interrupted attempt is not counted against INGEST_MAX_ATTEMPTS.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                """
+                UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0)
+                WHERE id = ? AND status = 'running'
+                """,
+                [(i,) for i in job_ids],
+            )
+
+    def heartbeat(self, job_id: str):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def unfinished_files(self, job_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT position, filename, path, sha256 FROM job_files
+                WHERE job_id = ? AND status NOT IN ('done', 'failed') ORDER BY position
+                """,
+                (job_id,),
+            ).fetchall()
+        return [dict(zip(("position", "filename", "path", "sha256"), r)) for r in rows]
+
+    def mark_file(self, job_id: str, position: int, status: str, chunks: int = 0, error: str = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE job_files SET status = ?, chunks = ?, error = ? WHERE job_id = ? AND position = ?",
+                (status, chunks, error, job_id, position),
+            )
+            self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def finish(self, job_id: str):
+        """Mark a job done, or failed when none of its files could be ingested"""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            ok = self._conn.execute(
+                "SELECT COUNT(*) FROM job_files WHERE job_id = ? AND status = 'done'", (job_id,)
+            ).fetchone()[0]
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?",
+                ("done" if ok else "failed", time.time(), job_id),
+            )
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._conn.execute(
+                "SELECT status, created_at, started_at, finished_at, attempts FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if job is None:
+                return None
+            files = self._conn.execute(
+                "SELECT filename, status, chunks, error FROM job_files WHERE job_id = ? ORDER BY position",
+                (job_id,),
+            ).fetchall()
+        status, created_at, started_at, finished_at, attempts = job
+        items = [dict(zip(("filename", "status", "chunks", "error"), f)) for f in files]
+        chunks = sum(i["chunks"] for i in items)
+        elapsed = ((finished_at or time.time()) - started_at) if started_at else 0.0
+        return {
+            "job_id": job_id,
+            "status": status,
+            "attempts": attempts,
+            "documents": len(items),
+            "documents_parsed": sum(1 for i in items if i["status"] in ("parsed", "done")),
+            "documents_ingested": sum(1 for i in items if i["status"] == "done"),
+            "documents_failed": sum(1 for i in items if i["status"] == "failed"),
+            "chunks_embedded": chunks,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "elapsed_seconds": round(elapsed, 3),
+            "chunks_per_second": round(chunks / elapsed, 2) if elapsed else 0.0,
+            "files": items,
+        }
+
+    def depth(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def purge(self, older_than: float) -> int:
+        """Forget finished jobs that ended before older_than"""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            ids = [r[0] for r in self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (older_than,)
+            )]
+            self._conn.executemany("DELETE FROM job_files WHERE job_id = ?", [(i,) for i in ids])
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in ids])
+        return len(ids)
+
+    # Submission and workers
+
+    async def submit(self, files: List[UploadFile]) -> str:
+        """Spool uploads to the job's directory and queue the job; returns its ID"""
+        job_id = uuid.uuid4().hex
+        directory = os.path.join(self.spool_dir, job_id)
+        await run_in_io_pool(os.makedirs, directory, exist_ok=True)
+        spooled = []
+        try:
+            for f in files:
+                path, digest = await spool_upload(f, directory)
+                spooled.append({"filename": f.filename, "path": path, "sha256": digest})
+            await run_in_io_pool(self.enqueue, job_id, spooled)
+        except BaseException:
+            await run_in_io_pool(shutil.rmtree, directory, True)
+            raise
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def _ingest_file(self, job_id: str, f: Dict[str, Any]):
+        ext = f["filename"].split(".")[-1].lower()
+
+        async def pages():
+            async for page in aiter_path_pages(f["path"], ext, f["sha256"]):
+                yield page
+            await run_in_io_pool(self.mark_file, job_id, f["position"], "parsed")
+
+        # Pages are chunked, embedded and stored as they are parsed
+        try:
+            chunks = await aingest_pages({"source": f["filename"]}, pages(), permanent=True)
+        except Exception as e:
+            await run_in_io_pool(self.mark_file, job_id, f["position"], "failed", 0, f"{type(e).__name__}: {e}")
+            return
+        await run_in_io_pool(self.mark_file, job_id, f["position"], "done", chunks)
+
+    async def _heartbeat(self, job_id: str):
+        # Not in the I/O pool: a pool busy with this job's writes must not make
+        # the job look abandoned to other workers
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(INGEST_STALE_SECONDS / 3)
+            await loop.run_in_executor(None, self.heartbeat, job_id)
+
+    async def run_job(self, job_id: str):
+        """Ingest a claimed job's remaining files, then remove its spooled uploads"""
+        beat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            for f in await run_in_io_pool(self.unfinished_files, job_id):
+                await self._ingest_file(job_id, f)
+            await run_in_io_pool(self.finish, job_id)
+        finally:
+            beat.cancel()
+        await run_in_io_pool(shutil.rmtree, os.path.join(self.spool_dir, job_id), True)
+
+    async def _worker(self):
+        while True:
+            job_id = await run_in_io_pool(self.claim)
+            if job_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), INGEST_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._running.add(job_id)
+            try:
+                await self.run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Left running; another worker retries it once the heartbeat is stale
+                logger.exception("Error running ingest job %s: %s", job_id, e)
+            finally:
+                self._running.discard(job_id)
+
+    async def start(self, workers: int = INGEST_WORKERS):
+        """Start the worker tasks (on application startup)"""
+        await run_in_io_pool(self.purge, time.time() - INGEST_JOB_RETENTION_SECONDS)
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(max(1, workers))]
+
+    async def stop(self):
+        """Cancel the worker tasks; interrupted jobs resume on the next start"""
+        for task in self._workers:
+            task.cancel()
+        interrupted = list(self._running)
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if interrupted:
+            await run_in_io_pool(self.requeue, interrupted)
+
+
+def _queue_depths() -> Dict[tuple, float]:
+    if _queue is None:
+        return {}
+    depth = _queue.depth()
+    return {("ingest_jobs", status): depth.get(status, 0) for status in ("queued", "running")}
+
+
+QUEUE_DEPTH.add_collector(_queue_depths)
+
+
+def get_ingest_queue() -> IngestQueue:
+    """Get the process-wide ingestion queue - lazy initialization"""
+    global _queue
+    if _queue is None:
+        _queue = IngestQueue()
+    return _queue
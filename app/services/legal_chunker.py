@@ -0,0 +1,250 @@
+# Structure-aware chunking of petitions, plaints and judgments
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Upper bound of a chunk; sections are packed paragraph by paragraph up to it
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "1100"))
+# A sub-section shorter than this is merged with the next one instead of standing alone
+CHUNK_MIN_CHARS = int(os.getenv("CHUNK_MIN_CHARS", "300"))
+# Repeated across a cut only when one sentence is longer than CHUNK_MAX_CHARS
+CHUNK_OVERLAP_CHARS = int(os.getenv("CHUNK_OVERLAP_CHARS", "100"))
+
+MAX_HEADING_CHARS = 80
+MAX_CITATIONS = 20
+
+# Headings that open a section even when not written in capitals
+SECTION_WORDS = (
+    "synopsis", "list of dates", "brief facts", "facts", "grounds", "prayer", "reliefs",
+    "relief", "verification", "affidavit", "cause of action", "jurisdiction", "valuation",
+    "limitation", "interim relief", "questions of law", "declaration", "annexure", "index",
+    "issues", "submissions", "arguments", "analysis", "findings", "held", "order",
+    "judgment", "conclusion",
+)
+_SECTION_RE = re.compile(
+    r"^(?:%s)\b|respectfully\s+s[he]{1,2}weth\b" % "|".join(re.escape(w) for w in SECTION_WORDS),
+    re.IGNORECASE,
+)
+# "1.", "12)", "(3)", "(a)", "(iv)", "a)" at the start of a paragraph
+_NUMBERED_RE = re.compile(r"^\s*(?:\(?(\d{1,3})[.)]|\(([a-z]{1,4})\)|([a-z])\))\s+", re.IGNORECASE)
+# "I.", "IV)", "A." before a heading
+_HEADING_NUMBER_RE = re.compile(r"^(?:[IVXLC]{1,6}|[A-Z]|\d{1,2})[.)]\s+")
+_CITATION_RE = re.compile(
+    r"\(\d{4}\)\s*\d+\s*SCC\s*\d+"
+    r"|\[\d{4}\]\s*\d+\s*S\.?C\.?R\.?\s*\d+"
+    r"|AIR\s*\d{4}\s*[A-Z][A-Za-z]*\s*\d+"
+    r"|\b\d{4}\s+SCC\s+OnLine\s+[A-Za-z]+\s+\d+"
+    r"|\bArticles?\s+\d+[A-Z]?(?:\(\d+\))*"
+    r"|\bSections?\s+\d+[A-Z]?(?:\(\d+\))*"
+    r"|\bOrder\s+[IVXLC]+\s+Rule\s+\d+"
+)
+_SENTENCE_END_RE = re.compile(r"(?<=[.;:?!])\s+(?=[A-Z(\"'])")
+
+
+def _heading_name(line: str) -> str:
+    return _HEADING_NUMBER_RE.sub("", line.strip()).rstrip(":").strip()
+
+
+def heading_level(line: str) -> int:
+    """1 for a section heading (GROUNDS, PRAYER...), 2 for another capitalised title, else 0"""
+    text = line.strip()
+    if not text or len(text) > MAX_HEADING_CHARS:
+        return 0
+    text = _heading_name(text)
+    if _SECTION_RE.search(text) and len(text.split()) <= 8:
+        return 1
+    letters = [c for c in text if c.isalpha()]
+    if len(letters) < 4 or text.endswith((".", ",", ";")):
+        return 0
+    if sum(c.isupper() for c in letters) / len(letters) >= 0.8 and len(text.split()) <= 10:
+        return 2
+    return 0
+
+
+def find_citations(text: str) -> List[str]:
+    """Case citations and statutory references, in order of first appearance"""
+    seen = {}
+    for match in _CITATION_RE.finditer(text):
+        seen.setdefault(re.sub(r"\s+", " ", match.group(0)), None)
+    return list(seen)
+
+
+class Block:
+    """A heading line or a paragraph, with its offset in the document"""
+
+    __slots__ = ("kind", "text", "start", "number", "section", "subsection")
+
+    def __init__(self, kind: str, text: str, start: int, number: Optional[str] = None):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.number = number
+        self.section = None
+        self.subsection = None
+
+
+class LegalChunk:
+    """One section-aligned chunk and the metadata stored with it"""
+
+    __slots__ = ("text", "start", "section", "subsection", "paragraph", "citations")
+
+    def __init__(self, text: str, start: int, section: Optional[str], subsection: Optional[str],
+                 paragraph: Optional[str], citations: List[str]):
+        self.text = text
+        self.start = start
+        self.section = section
+        self.subsection = subsection
+        self.paragraph = paragraph
+        self.citations = citations
+
+    def metadata(self) -> Dict[str, object]:
+        """Chroma-compatible metadata (scalars only; absent values omitted)"""
+        metadata = {"start_index": self.start}
+        if self.section:
+            metadata["section"] = self.section
+        if self.subsection:
+            metadata["subsection"] = self.subsection
+        if self.paragraph:
+            metadata["paragraph"] = self.paragraph
+        if self.citations:
+            metadata["citations"] = "; ".join(self.citations[:MAX_CITATIONS])
+        return metadata
+
+
+def iter_lines(pages: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """(offset, line) pairs across page boundaries, holding at most one page"""
+    carry, offset = "", 0
+    for page in pages:
+        lines = (carry + page.replace("\x0c", "\n")).splitlines(keepends=True)
+        carry = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        for line in lines:
+            yield offset, line
+            offset += len(line)
+    if carry:
+        yield offset, carry
+
+
+def iter_blocks(pages: Iterable[str]) -> Iterator[Block]:
+    """Headings and paragraphs; a paragraph ends at a blank line, a heading or a new number"""
+    lines, start, number = [], 0, None
+    for offset, line in iter_lines(pages):
+        level = heading_level(line)
+        numbered = None if level else _NUMBERED_RE.match(line)
+        if lines and (not line.strip() or level or numbered):
+            yield Block("paragraph", "".join(lines).strip(), start, number)
+            lines = []
+        # Offsets point at the first character of the stripped text
+        indent = len(line) - len(line.lstrip())
+        if level:
+            yield Block("section" if level == 1 else "heading", line.strip(), offset + indent)
+        elif line.strip():
+            if not lines:
+                start = offset + indent
+                number = next((g for g in numbered.groups() if g), None) if numbered else None
+            lines.append(line)
+    if lines:
+        yield Block("paragraph", "".join(lines).strip(), start, number)
+
+
+def _sentence_spans(text: str, max_chars: int, overlap: int) -> Iterator[Tuple[int, int]]:
+    """(start, end) of each sentence; a sentence over max_chars is cut at spaces with overlap"""
+    start = 0
+    ends = [m.start() for m in _SENTENCE_END_RE.finditer(text)] + [len(text)]
+    for end in ends:
+        while end - start > max_chars:
+            cut = text.rfind(" ", start + max_chars // 2, start + max_chars)
+            cut = cut if cut > 0 else start + max_chars
+            yield start, cut
+            back = text.find(" ", max(start + 1, cut - overlap), cut) if overlap else -1
+            start = back + 1 if back > 0 else cut
+        if end > start:
+            yield start, end
+        start = end
+        while start < len(text) and text[start].isspace():
+            start += 1
+
+
+def _split_long(text: str, max_chars: int, overlap: int) -> Iterator[Tuple[int, str]]:
+    """(offset, piece) of an oversized paragraph, cut at sentence ends where possible"""
+    piece_start = piece_end = None
+    for start, end in _sentence_spans(text, max_chars, overlap):
+        if piece_start is not None and end - piece_start > max_chars:
+            yield piece_start, text[piece_start:piece_end].strip()
+            piece_start = None
+        if piece_start is None:
+            piece_start = start
+        piece_end = end
+    if piece_start is not None:
+        yield piece_start, text[piece_start:piece_end].strip()
+
+
+def _chunk(blocks: List[Block]) -> LegalChunk:
+    text = "\n\n".join(b.text for b in blocks)
+    # Labelled by the section of its first paragraph (or of its last heading)
+    content = next((b for b in blocks if b.kind == "paragraph"), blocks[-1])
+    paragraph = next((b.number for b in blocks if b.number), None)
+    return LegalChunk(text, blocks[0].start, content.section, content.subsection, paragraph, find_citations(text))
+
+
+def iter_chunks(
+    pages: Iterable[str],
+    max_chars: int = None,
+    min_chars: int = None,
+    overlap: int = None,
+) -> Iterator[LegalChunk]:
+    """Section-aligned chunks of a document given as an iterable of pages (or [text]).
+
+    Paragraphs are packed into a chunk until the next one would exceed
+    max_chars. A section heading (GROUNDS, PRAYER...) always starts a new
+    chunk and sets its section; another capitalised title sets the
+    subsection and starts a new chunk unless the chunk so far is shorter
+    than min_chars. Only a paragraph longer than max_chars is
+    split, at sentence ends. Runs as a generator, so a long document is
+    never held in memory as a whole.
+    """
+    max_chars = max_chars or CHUNK_MAX_CHARS
+    min_chars = CHUNK_MIN_CHARS if min_chars is None else min_chars
+    overlap = CHUNK_OVERLAP_CHARS if overlap is None else overlap
+    current: List[Block] = []
+    size = 0
+    section = subsection = None
+    for block in iter_blocks(pages):
+        if block.kind != "paragraph":
+            # Sections never share a chunk; short sub-sections are merged
+            has_text = any(b.kind == "paragraph" for b in current)
+            if current and ((block.kind == "section" and has_text) or size >= min_chars):
+                yield _chunk(current)
+                current, size = [], 0
+            if block.kind == "section":
+                section, subsection = _heading_name(block.text), None
+            else:
+                subsection = _heading_name(block.text)
+        block.section, block.subsection = section, subsection
+        if block.kind != "paragraph":
+            current.append(block)
+            size += len(block.text) + 2
+            continue
+        if len(block.text) > max_chars:
+            if current and size >= min_chars:
+                yield _chunk(current)
+                current, size = [], 0
+            # Headings (and a short lead-in) stay attached to the first piece
+            budget = max(max_chars - size, max_chars // 2)
+            for offset, piece in _split_long(block.text, budget, overlap):
+                part = Block("paragraph", piece, block.start + offset, block.number)
+                part.section, part.subsection = section, subsection
+                yield _chunk(current + [part])
+                current, size = [], 0
+            continue
+        if current and size + len(block.text) + 2 > max_chars:
+            yield _chunk(current)
+            current, size = [], 0
+        current.append(block)
+        size += len(block.text) + 2
+    if current:
+        yield _chunk(current)
+
+
+def chunk_text(text: str, max_chars: int = None, overlap: int = None) -> List[str]:
+    """Texts of the chunks of a whole document"""
+    return [c.text for c in iter_chunks([text], max_chars, overlap=overlap)]
@@ -0,0 +1,209 @@
+# On-disk inverted index with BM25 scoring for exact legal tokens
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services.rule_engine import normalize_draft_type
+
+# BM25 parameters (standard Okapi defaults)
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens plus joined "word_number" tokens.
+
+    Dense embeddings blur exact references such as "Article 226" or
+    "Section 420"; emitting "article_226" as its own term lets BM25 match
+    them exactly.
+    """
+    words = _TOKEN_RE.findall(text.lower())
+    tokens = [w for w in words if w not in _STOPWORDS]
+    for prev, word in zip(words, words[1:]):
+        if word[0].isdigit() and not prev[0].isdigit():
+            tokens.append(f"{prev}_{word}")
+    return tokens
+
+
+class LexicalIndex:
+    """BM25 inverted index stored in SQLite next to the vector store.
+
+    Chunks are keyed by the same deterministic IDs as the vector store, so it
+    is updated incrementally by the same upsert plan: new chunks are added,
+    stale ones deleted, unchanged ones left alone. Writes share one
+    connection under a lock; searches take no lock, each thread reading
+    through its own connection (WAL lets readers run beside a writer, in this
+    process or in other app workers sharing the file).
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY, source TEXT, draft_type TEXT,
+                text TEXT NOT NULL, length INTEGER NOT NULL, jurisdiction TEXT
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, chunk_id TEXT NOT NULL, tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_postings_chunk ON postings(chunk_id);
+            CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value REAL NOT NULL);
+            INSERT OR IGNORE INTO stats VALUES ('docs', 0), ('total_length', 0);
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")]
+        if "jurisdiction" not in columns:
+            self._conn.execute("ALTER TABLE chunks ADD COLUMN jurisdiction TEXT")
+        self._normalize_draft_types()
+
+    def _normalize_draft_types(self):
+        """Rewrite draft types stored before they were normalized ("writ petition" -> "writ_petition")"""
+        stored = [row[0] for row in self._conn.execute("SELECT DISTINCT draft_type FROM chunks WHERE draft_type IS NOT NULL")]
+        renamed = [(normalize_draft_type(v) or None, v) for v in stored if normalize_draft_type(v) != v]
+        if renamed:
+            with self._lock, self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany("UPDATE chunks SET draft_type = ? WHERE draft_type = ?", renamed)
+
+    def __len__(self) -> int:
+        return int(self._stat(self._reader(), "docs"))
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+        return conn
+
+    @staticmethod
+    def _stat(conn: sqlite3.Connection, key: str) -> float:
+        return conn.execute("SELECT value FROM stats WHERE key = ?", (key,)).fetchone()[0]
+
+    def add(self, chunks: Iterable[Tuple[str, str, Optional[str], Optional[str], str]]):
+        """Add (id, source, draft_type, jurisdiction, text) chunks; known IDs only get metadata updates"""
+        with self._lock, self._conn:
+            # Take the write lock up front: a deferred transaction that reads
+            # first fails at once, without waiting, if another process wrote
+            self._conn.execute("BEGIN IMMEDIATE")
+            added, added_length = 0, 0
+            for chunk_id, source, draft_type, jurisdiction, text in chunks:
+                draft_type = normalize_draft_type(draft_type) or None
+                jurisdiction = normalize_draft_type(jurisdiction) or None
+                updated = self._conn.execute(
+                    "UPDATE chunks SET source = ?, draft_type = ?, jurisdiction = ? WHERE id = ?",
+                    (source, draft_type, jurisdiction, chunk_id),
+                ).rowcount
+                if updated:
+                    continue
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                self._conn.execute(
+                    "INSERT INTO chunks (id, source, draft_type, jurisdiction, text, length) VALUES (?, ?, ?, ?, ?, ?)",
+                    (chunk_id, source, draft_type, jurisdiction, text, length),
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                    [(term, chunk_id, tf) for term, tf in counts.items()],
+                )
+                added += 1
+                added_length += length
+            self._bump(added, added_length)
+
+    def delete(self, chunk_ids: Iterable[str]):
+        """Remove chunks and their postings"""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            removed, removed_length = 0, 0
+            for chunk_id in chunk_ids:
+                row = self._conn.execute("SELECT length FROM chunks WHERE id = ?", (chunk_id,)).fetchone()
+                if row is None:
+                    continue
+                self._conn.execute("DELETE FROM postings WHERE chunk_id = ?", (chunk_id,))
+                self._conn.execute("DELETE FROM chunks WHERE id = ?", (chunk_id,))
+                removed += 1
+                removed_length += row[0]
+            self._bump(-removed, -removed_length)
+
+    def _bump(self, docs: int, length: int):
+        if docs:
+            self._conn.execute("UPDATE stats SET value = value + ? WHERE key = 'docs'", (docs,))
+            self._conn.execute("UPDATE stats SET value = value + ? WHERE key = 'total_length'", (length,))
+
+    def search(self, query: str, k: int, draft_type: str = None, jurisdiction: str = None) -> List[Dict[str, Any]]:
+        """Top-k chunks by BM25 score, optionally restricted to one draft_type (any spelling).
+
+        A jurisdiction further restricts them to chunks of that jurisdiction
+        or of none, as the KB shards a search is routed to.
+        """
+        draft_type = normalize_draft_type(draft_type)
+        jurisdiction = normalize_draft_type(jurisdiction)
+        terms = list(dict.fromkeys(tokenize(query)))
+        conn = self._reader()
+        # One read transaction, so statistics and postings agree
+        with conn:
+            conn.execute("BEGIN")
+            n_docs = self._stat(conn, "docs")
+            if not terms or not n_docs or k <= 0:
+                return []
+            avg_length = self._stat(conn, "total_length") / n_docs
+
+            scores: Dict[str, float] = {}
+            for term in terms:
+                df = conn.execute(
+                    "SELECT COUNT(*) FROM postings WHERE term = ?", (term,)
+                ).fetchone()[0]
+                if not df:
+                    continue
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                sql = (
+                    "SELECT p.chunk_id, p.tf, c.length FROM postings p "
+                    "JOIN chunks c ON c.id = p.chunk_id WHERE p.term = ?"
+                )
+                params = [term]
+                if draft_type:
+                    sql += " AND c.draft_type = ?"
+                    params.append(draft_type)
+                if jurisdiction:
+                    sql += " AND (c.jurisdiction = ? OR c.jurisdiction IS NULL)"
+                    params.append(jurisdiction)
+                for chunk_id, tf, length in conn.execute(sql, params):
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            hits = []
+            for chunk_id, score in top:
+                source, text = conn.execute(
+                    "SELECT source, text FROM chunks WHERE id = ?", (chunk_id,)
+                ).fetchone()
+                hits.append({"id": chunk_id, "source": source, "text": text, "score": score})
+            return hits
+
+    def rebuild_from(self, collection, page_size: int = 1000) -> int:
+        """Index every chunk of a Chroma collection (for stores built before this index)"""
+        total = collection.count()
+        for offset in range(0, total, page_size):
+            page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            self.add(
+                (chunk, (meta or {}).get("source"), (meta or {}).get("draft_type"), (meta or {}).get("jurisdiction"), text or "")
+                for chunk, text, meta in zip(page["ids"], page["documents"], page["metadatas"])
+            )
+        return total
@@ -0,0 +1,301 @@
+# LLM backends (OpenAI, Bedrock) over shared pooled HTTP clients
+import asyncio
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+import httpx
+
+from app.services.metrics import LLM_HEDGES, LLM_REQUESTS, LLM_RETRIES
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").strip().lower()
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+# Requests per second across the process; 0 disables the limiter
+LLM_RATE_LIMIT_RPS = float(os.getenv("LLM_RATE_LIMIT_RPS", "0"))
+# Send a second, identical completion if the first has not answered after
+# this many seconds and keep whichever finishes first; 0 disables hedging
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+
+OPENAI_DRAFT_MODEL = os.getenv("OPENAI_DRAFT_MODEL", "gpt-4o-mini")
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_backend = None
+_lock = threading.Lock()
+_backend_lock = threading.Lock()
+
+
+class LLMError(RuntimeError):
+    """A completion failed; retryable errors have already been retried"""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide pooled HTTP client for blocking callers - lazy initialization"""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(timeout=_timeout(), limits=_limits())
+    return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Process-wide pooled HTTP client for async callers - lazy initialization"""
+    global _async_http_client
+    with _lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(timeout=_timeout(), limits=_limits())
+    return _async_http_client
+
+
+async def close_http_clients():
+    """Close the shared HTTP clients (used on application shutdown)"""
+    global _http_client, _async_http_client
+    with _lock:
+        sync_client, async_client = _http_client, _async_http_client
+        _http_client = _async_http_client = None
+    if async_client is not None:
+        await async_client.aclose()
+    if sync_client is not None:
+        sync_client.close()
+
+
+class RateLimiter:
+    """Token bucket shared by threads and coroutines; rate 0 means unlimited"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long the caller must wait before using it"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, LLM_RETRY_BASE_SECONDS * (2 ** attempt))
+
+
+class LLMBackend(ABC):
+    """A chat model behind retries, rate limiting and (for completions) hedging.
+
+    Implementations provide one attempt of each call; the retry loop, the
+    limiter and the hedge live here so every provider behaves the same.
+    """
+
+    name = "llm"
+
+    def __init__(self, model: str):
+        self.model = model
+        self.limiter = RateLimiter(LLM_RATE_LIMIT_RPS, burst=max(1, int(LLM_RATE_LIMIT_RPS)))
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    @abstractmethod
+    def _complete_once(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        ...
+
+    @abstractmethod
+    async def _acomplete_once(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        ...
+
+    @abstractmethod
+    def _astream_once(self, prompt: str, max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        ...
+
+    def _failed(self, error: LLMError, attempt: int):
+        """Count a failed attempt; re-raise it unless it is retried"""
+        LLM_REQUESTS.inc(backend=self.name, outcome="error")
+        if not error.retryable or attempt == LLM_MAX_RETRIES:
+            raise error
+        LLM_RETRIES.inc(backend=self.name)
+
+    def complete(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        """Blocking completion with retries"""
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            time.sleep(self.limiter.reserve())
+            try:
+                result = self._complete_once(prompt, max_tokens, temperature)
+            except LLMError as e:
+                self._failed(e, attempt)
+            else:
+                LLM_REQUESTS.inc(backend=self.name, outcome="ok")
+                return result
+            time.sleep(backoff_seconds(attempt))
+
+    async def _aretrying(self, call: Callable[[], Awaitable[str]]) -> str:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await asyncio.sleep(self.limiter.reserve())
+            try:
+                result = await call()
+            except LLMError as e:
+                self._failed(e, attempt)
+            else:
+                LLM_REQUESTS.inc(backend=self.name, outcome="ok")
+                return result
+            await asyncio.sleep(backoff_seconds(attempt))
+
+    async def acomplete(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        """Async completion with retries and, if enabled, a hedged second request"""
+        def call():
+            return self._aretrying(lambda: self._acomplete_once(prompt, max_tokens, temperature))
+
+        if LLM_HEDGE_AFTER_SECONDS <= 0:
+            return await call()
+
+        tasks = [asyncio.ensure_future(call())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=LLM_HEDGE_AFTER_SECONDS)
+            if not done:
+                LLM_HEDGES.inc(backend=self.name)
+                tasks.append(asyncio.ensure_future(call()))
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The loser (if any) is abandoned; cancelling a finished task is a no-op
+            for task in tasks:
+                task.cancel()
+
+    async def astream(self, prompt: str, max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        """Stream completion deltas; retried only while nothing has been yielded yet"""
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await asyncio.sleep(self.limiter.reserve())
+            started = False
+            try:
+                async for delta in self._astream_once(prompt, max_tokens, temperature):
+                    started = True
+                    yield delta
+            except LLMError as e:
+                if started:
+                    LLM_REQUESTS.inc(backend=self.name, outcome="error")
+                    raise
+                self._failed(e, attempt)
+            else:
+                LLM_REQUESTS.inc(backend=self.name, outcome="ok")
+                return
+            await asyncio.sleep(backoff_seconds(attempt))
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI chat completions through the official SDK on the shared HTTP pool"""
+
+    name = "openai"
+
+    def __init__(self, model: str = OPENAI_DRAFT_MODEL):
+        super().__init__(model)
+        from openai import AsyncOpenAI, OpenAI
+
+        # Retries are handled by LLMBackend, so the SDK's own are disabled
+        self.client = OpenAI(max_retries=0, timeout=_timeout(), http_client=get_http_client())
+        self.async_client = AsyncOpenAI(max_retries=0, timeout=_timeout(), http_client=get_async_http_client())
+
+    @staticmethod
+    def _error(e: Exception) -> LLMError:
+        import openai
+
+        if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError)):
+            return LLMError(str(e), retryable=True)
+        if isinstance(e, openai.APIStatusError):
+            return LLMError(str(e), retryable=e.status_code in RETRYABLE_STATUS)
+        return LLMError(str(e))
+
+    def _kwargs(self, prompt: str, max_tokens: int, temperature: float) -> dict:
+        return dict(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+
+    def _complete_once(self, prompt, max_tokens, temperature):
+        import openai
+
+        try:
+            response = self.client.chat.completions.create(**self._kwargs(prompt, max_tokens, temperature))
+        except openai.OpenAIError as e:
+            raise self._error(e) from e
+        return response.choices[0].message.content or ""
+
+    async def _acomplete_once(self, prompt, max_tokens, temperature):
+        import openai
+
+        try:
+            response = await self.async_client.chat.completions.create(
+                **self._kwargs(prompt, max_tokens, temperature)
+            )
+        except openai.OpenAIError as e:
+            raise self._error(e) from e
+        return response.choices[0].message.content or ""
+
+    async def _astream_once(self, prompt, max_tokens, temperature):
+        import openai
+
+        try:
+            stream = await self.async_client.chat.completions.create(
+                stream=True, **self._kwargs(prompt, max_tokens, temperature)
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except openai.OpenAIError as e:
+            raise self._error(e) from e
+
+
+def create_backend(name: str) -> LLMBackend:
+    if name == "openai":
+        return OpenAIBackend()
+    if name == "bedrock":
+        # Imported here: bedrock_service builds on this module
+        from app.services.bedrock_service import BedrockBackend
+        return BedrockBackend()
+    raise ValueError(f"unknown LLM_BACKEND {name!r}; expected 'openai' or 'bedrock'")
+
+
+def get_llm_backend() -> LLMBackend:
+    """Process-wide backend selected by LLM_BACKEND - lazy initialization"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(LLM_BACKEND)
+    return _backend
@@ -0,0 +1,340 @@
+# Prometheus metrics and optional OpenTelemetry spans for the drafting pipeline
+import contextvars
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Set to 0 to stop recording (updates become no-ops and /metrics returns 404)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+# Emit an OpenTelemetry span per stage; needs opentelemetry-api, and
+# opentelemetry-sdk plus an OTLP exporter to send spans anywhere
+OTEL_TRACING = os.getenv("OTEL_TRACING", "0") == "1"
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "legalas")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; wide enough for a BM25 lookup and for a full LLM completion
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+logger = logging.getLogger(__name__)
+
+Collector = Callable[[], Dict[Tuple[str, ...], float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Registry:
+    """Metrics of this process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: List["Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "Metric"):
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"metric {metric.name} is already registered")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    """A named family of samples keyed by label values.
+
+    Besides values set in place, a metric can pull samples from collectors:
+    callables returning {label values: value}, evaluated at scrape time, for
+    state another module already keeps (cache counters, queue lengths).
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def add_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def samples(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            samples = dict(self._values)
+        for collector in self._collectors:
+            try:
+                for key, value in collector().items():
+                    samples[key] = samples.get(key, 0) + value
+            except Exception:
+                logger.exception("metrics collector for %s failed", self.name)
+        return samples
+
+    def render(self) -> Iterable[str]:
+        for key, value in sorted(self.samples().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram; observe() is one bisect and one locked update"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry: Registry = REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> Iterable[str]:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(round(values[-1], 6))}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+# Metric families of the drafting pipeline; modules that own a queue or a
+# cache add collectors to the gauges and counters below
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "legalas_http_request_seconds", "HTTP request latency, until the last body byte is sent",
+    ["method", "route", "status"],
+)
+STAGE_SECONDS = Histogram("legalas_stage_seconds", "Latency of one pipeline stage", ["stage"])
+STAGE_ERRORS = Counter("legalas_stage_errors_total", "Pipeline stages that raised", ["stage", "error"])
+LLM_REQUESTS = Counter(
+    "legalas_llm_requests_total", "LLM calls sent to the provider (each retry and hedge counts)",
+    ["backend", "outcome"],
+)
+LLM_RETRIES = Counter("legalas_llm_retries_total", "LLM calls retried after a retryable error", ["backend"])
+LLM_HEDGES = Counter("legalas_llm_hedges_total", "Hedged second completions sent", ["backend"])
+LLM_TOKENS = Counter("legalas_llm_tokens_total", "Draft tokens (prompt or completion)", ["kind"])
+EMBEDDING_REQUESTS = Counter(
+    "legalas_embedding_requests_total", "Embedding calls sent to the backend", ["model"],
+)
+EMBEDDING_TEXTS = Counter(
+    "legalas_embedding_texts_total", "Texts embedded, by where the vector came from", ["model", "source"],
+)
+CACHE_LOOKUPS = Counter("legalas_cache_lookups_total", "Cache lookups by result", ["cache", "result"])
+QUEUE_DEPTH = Gauge("legalas_queue_depth", "Work waiting or running, per queue and state", ["queue", "state"])
+
+
+# Tracing
+
+_tracer = None
+
+
+def setup_tracing(app=None) -> bool:
+    """Turn on stage spans when OTEL_TRACING=1; returns whether tracing is on.
+
+    With OTEL_EXPORTER_OTLP_ENDPOINT set and no tracer provider configured
+    yet (e.g. by opentelemetry-instrument), spans are batched to that
+    endpoint over OTLP/gRPC. Given the FastAPI app, each request also gets a
+    server span that stage spans nest under, when the FastAPI
+    instrumentation is installed. Call before the app starts serving.
+    """
+    global _tracer
+    if not OTEL_TRACING:
+        return False
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.warning("OTEL_TRACING=1 but opentelemetry-api is not installed; tracing is off")
+        return False
+
+    if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") and isinstance(trace.get_tracer_provider(), trace.ProxyTracerProvider):
+        try:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        except ImportError:
+            logger.warning("opentelemetry-sdk or the OTLP exporter is not installed; spans are not exported")
+        else:
+            provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+
+    if app is not None:
+        try:
+            from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+            FastAPIInstrumentor.instrument_app(app, excluded_urls="metrics,healthz")
+        except ImportError:
+            pass
+    _tracer = trace.get_tracer("legalas")
+    return True
+
+
+class Stage:
+    """Context manager timing one pipeline stage into legalas_stage_seconds.
+
+    An exception leaving the block is counted in legalas_stage_errors_total
+    (cancellations are not) and re-raised. With tracing on the stage is also
+    a span, a child of whatever span is current.
+    """
+
+    __slots__ = ("name", "attributes", "_start", "_span")
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self._span = None
+
+    def __enter__(self):
+        if _tracer is not None:
+            self._span = _tracer.start_as_current_span(self.name, attributes=self.attributes or None)
+            self._span.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        STAGE_SECONDS.observe(time.perf_counter() - self._start, stage=self.name)
+        if exc_type is not None and issubclass(exc_type, Exception):
+            STAGE_ERRORS.inc(stage=self.name, error=exc_type.__name__)
+        if self._span is not None:
+            self._span.__exit__(exc_type, exc, tb)
+        return False
+
+
+stage = Stage
+
+
+def observe_stage(name: str, seconds: float):
+    """Record a stage timed by the caller (e.g. excluding time spent elsewhere)"""
+    STAGE_SECONDS.observe(seconds, stage=name)
+
+
+def traced(name: str, fn: Callable) -> Callable:
+    """fn wrapped to run as stage name in the caller's context, for submitting to a thread pool"""
+    def run(*args, **kwargs):
+        with Stage(name):
+            return fn(*args, **kwargs)
+    return partial(contextvars.copy_context().run, run)
+
+
+@asynccontextmanager
+async def waited(slot, name: str):
+    """Hold slot (an asyncio.Semaphore), timing the wait for it as stage name"""
+    with Stage(name):
+        await slot.acquire()
+    try:
+        yield
+    finally:
+        slot.release()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording legalas_http_request_seconds per route template.
+
+    Timing ends when the response is fully sent, so a streamed draft counts
+    in full. Paths matching no route share the route label "unmatched", so
+    stray URLs cannot grow the number of series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_and_record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                route = route.path
+            else:
+                # Starlette routes (/docs) set no route template; 404s match nothing
+                route = "other" if "endpoint" in scope else "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=scope["method"], route=route, status=str(status)
+            )
+
+
+def render_metrics() -> str:
+    """Every registered metric in the Prometheus text format"""
+    return REGISTRY.render()
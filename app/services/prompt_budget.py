@@ -0,0 +1,121 @@
+# Token counting and budgeted packing of prompt sections
+import os
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from app.services.retrieval import chunk_hash
+
+# Upper bound for the whole filled prompt
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "12000"))
+# Per-section budgets
+PROMPT_BUDGET_FACTS = int(os.getenv("PROMPT_BUDGET_FACTS", "1500"))
+PROMPT_BUDGET_CONTEXT = int(os.getenv("PROMPT_BUDGET_CONTEXT", "6000"))
+PROMPT_BUDGET_STYLE = int(os.getenv("PROMPT_BUDGET_STYLE", "800"))
+PROMPT_BUDGET_INSTRUCTIONS = int(os.getenv("PROMPT_BUDGET_INSTRUCTIONS", "500"))
+
+# Overlap between neighbouring chunks of one document (the splitter uses
+# 100 characters) is trimmed when it is at least this long
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 300
+
+
+class TokenCounter:
+    """Count and truncate text in model tokens.
+
+    Uses tiktoken when it and its encoding files are available; otherwise
+    falls back to an estimate of four characters per token, so prompt
+    assembly never needs the network.
+    """
+
+    def __init__(self, model: str):
+        self.encoding = None
+        try:
+            import tiktoken
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            self.encoding = None
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of text within max_tokens, cut at a word boundary"""
+        if max_tokens <= 0 or not text:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        if self.encoding is not None:
+            prefix = self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens])
+        else:
+            prefix = text[:max_tokens * 4]
+        cut = prefix.rfind(" ")
+        return prefix[:cut] if cut > len(prefix) // 2 else prefix
+
+
+@lru_cache(maxsize=8)
+def get_token_counter(model: str) -> TokenCounter:
+    return TokenCounter(model)
+
+
+def _trim_overlap(text: str, kept: List[str]) -> str:
+    """Drop the part of text that repeats the start or end of an already kept chunk"""
+    for other in kept:
+        limit = min(MAX_OVERLAP_CHARS, len(text), len(other))
+        for k in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+            if other.endswith(text[:k]):
+                text = text[k:]
+                break
+        limit = min(MAX_OVERLAP_CHARS, len(text), len(other))
+        for k in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+            if text.endswith(other[:k]):
+                text = text[:-k]
+                break
+    return text
+
+
+def format_chunk(source: str, text: str) -> str:
+    return f"Source: {source}\n{text}"
+
+
+def pack_chunks(hits: List[Dict[str, Any]], budget: int, counter: TokenCounter) -> List[Dict[str, Any]]:
+    """Greedily keep the best-scoring chunks that fit in budget tokens.
+
+    Exact duplicates and chunks contained in an already kept chunk are
+    dropped, and the overlap between neighbouring chunks of one document is
+    trimmed. A chunk that does not fit is skipped, so a smaller, lower-ranked
+    chunk can still use the remaining budget.
+    """
+    ranked = sorted(hits, key=lambda h: h.get("score", 0.0), reverse=True)
+    packed, seen, kept_by_source = [], set(), {}
+    used = 0
+    for hit in ranked:
+        text = hit["text"].strip()
+        digest = chunk_hash(text)
+        if not text or digest in seen:
+            continue
+        kept = kept_by_source.setdefault(hit["source"], [])
+        if any(text in other for other in kept):
+            continue
+        text = _trim_overlap(text, kept).strip()
+        if not text:
+            continue
+        # Separator between chunks counts against the budget too
+        cost = counter.count(format_chunk(hit["source"], text)) + 2
+        if used + cost > budget:
+            continue
+        used += cost
+        seen.add(digest)
+        kept.append(hit["text"].strip())
+        packed.append(dict(hit, text=text))
+    return packed
@@ -1,113 +1,998 @@
 # Consolidated RAG Service
 from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
 from langchain.chains import RetrievalQA
 from langchain_openai import ChatOpenAI
-from typing import List, Dict, Any
+from langchain.schema import Document
+from typing import List, Dict, Any, AsyncIterator, Iterator
+from urllib.parse import urlsplit
+import asyncio
+import hashlib
+import logging
 import os
+import queue
+import threading
+import time
+from functools import partial
+import chromadb
+from app.services.concurrency import embedding_slot, get_search_pool, run_in_io_pool
+from app.services.embedding_backend import LEGACY_EMBEDDING_SPEC, configured_spec, create_embeddings
+from app.services.embedding_cache import CachedEmbeddings, embedding_model_name, get_embedding_cache
+from app.services.faiss_store import FaissVectorStore
+from app.services.legal_chunker import iter_chunks
+from app.services.lexical_index import LexicalIndex
+from app.services.llm_backend import get_async_http_client, get_http_client
+from app.services.metrics import stage, traced, waited
+from app.services.retrieval import (
+    distance_to_similarity,
+    merge_by_space,
+    mmr_select,
+    public_hits,
+    reciprocal_rank_fusion,
+)
+from app.services.rule_engine import normalize_draft_type
+from app.services.scratch_index import ScratchIndex
+
+logger = logging.getLogger(__name__)
+
+# Entries in the shared temp_kb collection expire after this many seconds
+TEMP_KB_TTL_SECONDS = int(os.getenv("TEMP_KB_TTL_SECONDS", "3600"))
+# Diversify merged results with maximal marginal relevance
+RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "0") == "1"
+RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.7"))
+# Fuse BM25 results over the permanent KB with the vector results
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") != "0"
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Embedding requests are split to stay under the API's per-request limits
+# (2048 inputs; token budget approximated as characters / 4)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "512"))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "250000"))
+# Collection metadata key recording the embedding spec a collection was written with
+EMBEDDING_METADATA_KEY = "embedding"
+# Shared Chroma server (`chroma run`, or `python run.py --workers N` starts
+# one); both collections then live there instead of the local directories.
+# Needed with several app processes, which must not open the same store files
+CHROMA_SERVER_URL = os.getenv("CHROMA_SERVER_URL", "")
+# Vector store of the permanent KB: "chroma", or "faiss" for memory-mapped
+# quantized FAISS segments (see app/services/faiss_store.py); temp_kb stays in Chroma
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma").lower()
+# Split the permanent KB into one collection per draft type (and per
+# jurisdiction, for documents ingested with one), so a search only scans the
+# chunks it can use. Set to 0 to keep one collection filtered by metadata
+KB_SHARDING = os.getenv("KB_SHARDING", "1") != "0"
+# How often searches look for shards created by other processes
+SHARD_REFRESH_SECONDS = float(os.getenv("SHARD_REFRESH_SECONDS", "30"))
+SHARD_PREFIX = "permanent_kb__"
+# Collection metadata keys recording the draft type / jurisdiction a shard holds
+SHARD_DRAFT_TYPE_KEY = "shard_draft_type"
+SHARD_JURISDICTION_KEY = "shard_jurisdiction"
+
+
+def shard_name(draft_type: str = None, jurisdiction: str = None) -> str:
+    """Permanent KB collection for a draft type and jurisdiction.
+
+    Both are normalized first, so "Writ Petition", "writ petition" and
+    "writ_petition" share a shard. Chunks without a draft type (and all
+    chunks with sharding off) stay in the unsharded permanent_kb collection.
+    """
+    draft = normalize_draft_type(draft_type)
+    if not KB_SHARDING or not draft:
+        return "permanent_kb"
+    place = normalize_draft_type(jurisdiction)
+    name = SHARD_PREFIX + draft + (f"__{place}" if place else "")
+    if len(name) > 63:
+        # Chroma's limit on collection names; the keys are in the metadata
+        name = f"{name[:54]}_{hashlib.sha256(name.encode('utf-8')).hexdigest()[:8]}"
+    return name
+
+
+def draft_type_spellings(draft_type: str) -> List[str]:
+    """draft_type values chunks stored before normalization may carry"""
+    draft = normalize_draft_type(draft_type)
+    raw = (draft_type or "").strip()
+    return list(dict.fromkeys(v for v in (raw, raw.lower(), draft, draft.replace("_", " ")) if v))
+
+
+def document_id(source: str) -> str:
+    """Stable identifier of a source document"""
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+
+
+def document_version(text: str) -> str:
+    """Content version of a source document"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_id(source: str, offset: int, text: str) -> str:
+    """Deterministic chunk ID: the same chunk of the same source always maps to one ID"""
+    return hashlib.sha256(f"{source}\0{offset}\0{text}".encode("utf-8")).hexdigest()
+
+
+def open_chroma_client(path: str):
+    """Client for the KB: the shared server when CHROMA_SERVER_URL is set, else the store files at path.
+
+    The server client keeps one pooled HTTP connection set for every thread
+    of the process.
+    """
+    if CHROMA_SERVER_URL:
+        url = urlsplit(CHROMA_SERVER_URL)
+        ssl = url.scheme == "https"
+        return chromadb.HttpClient(
+            host=url.hostname, port=url.port or (443 if ssl else 80), ssl=ssl,
+            # The client posts JSON bodies without a content type, which
+            # servers on recent FastAPI versions refuse to parse
+            headers={"Content-Type": "application/json"},
+        )
+    return chromadb.PersistentClient(path=path)
+
+
+def embedding_batches(texts: List[str], max_items: int = None, max_tokens: int = None) -> List[List[str]]:
+    """Group texts into consecutive batches within the item and token limits"""
+    max_items = max_items or EMBEDDING_BATCH_SIZE
+    max_tokens = max_tokens or EMBEDDING_BATCH_TOKENS
+    batches, batch, tokens = [], [], 0
+    for text in texts:
+        cost = len(text) // 4 + 1
+        if batch and (len(batch) >= max_items or tokens + cost > max_tokens):
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append(text)
+        tokens += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class UpsertPlan:
+    """What an ingest has to change in a collection to match the new chunks"""
+
+    def __init__(self, chunks: Dict[str, Document], existing: Dict[str, dict]):
+        self.chunks = chunks
+        # Chunks whose ID is not stored yet: these need embedding
+        self.new_ids = [i for i in chunks if i not in existing]
+        # Stored chunks of the same documents that no longer exist
+        self.stale_ids = [i for i in existing if i not in chunks]
+        # Unchanged chunks whose document version moved on
+        self.retag_ids = [
+            i for i in chunks
+            if i in existing
+            and (existing[i] or {}).get("doc_version") != chunks[i].metadata.get("doc_version")
+        ]
+
+    @property
+    def new_texts(self) -> List[str]:
+        return [self.chunks[i].page_content for i in self.new_ids]
+
 
 class RAGService:
     def __init__(self):
+        # Set to force one embeddings object for every collection (benchmarks, tests)
         self.embeddings = None
+        self._embeddings_by_spec = {}
+        # Spec each opened collection was embedded with
+        self.collection_specs: Dict[str, str] = {}
         self.permanent_store = None
+        # Permanent KB shards by collection name, and the (draft type,
+        # jurisdiction) each holds
+        self.shard_stores: Dict[str, Any] = {}
+        self.shard_keys: Dict[str, tuple] = {}
+        self._shards_listed_at = None
         self.temp_store = None
-        self.permanent_db_path = "./kb_store"
-        self.temp_db_path = "./temp/chroma_db"
+        self.permanent_db_path = os.getenv("KB_STORE_PATH", "./kb_store")
+        self.temp_db_path = os.getenv("TEMP_KB_PATH", "./temp/chroma_db")
+        self.faiss_db_path = os.getenv("FAISS_STORE_PATH", os.path.join(self.permanent_db_path, "faiss"))
+        self.lexical_index = None
+        self.client = None
+        self._lock = threading.RLock()
         
         # Ensure directories exist
         os.makedirs(self.permanent_db_path, exist_ok=True)
         os.makedirs(self.temp_db_path, exist_ok=True)
     
-    def get_embeddings(self):
-        """Get embeddings instance - lazy initialization"""
-        if self.embeddings is None:
-            self.embeddings = OpenAIEmbeddings()
-        return self.embeddings
+    def embedding_spec(self, collection: str = "permanent_kb") -> str:
+        """Embedding spec a collection's vectors, and queries against it, use"""
+        if self.embeddings is not None:
+            return embedding_model_name(self.embeddings)
+        return self.collection_specs.get(collection) or configured_spec(collection)
+
+    def get_embeddings(self, collection: str = "permanent_kb"):
+        """Embeddings for a collection - lazy initialization, wrapped in the embedding cache"""
+        if self.embeddings is not None:
+            return self.embeddings
+        spec = self.embedding_spec(collection)
+        embeddings = self._embeddings_by_spec.get(spec)
+        if embeddings is not None:
+            return embeddings
+        with self._lock:
+            if spec not in self._embeddings_by_spec:
+                self._embeddings_by_spec[spec] = CachedEmbeddings(
+                    create_embeddings(spec, get_http_client(), get_async_http_client()),
+                    get_embedding_cache(),
+                )
+            return self._embeddings_by_spec[spec]
     
+    def get_lexical_index(self) -> LexicalIndex:
+        """Get the BM25 index over the permanent KB - lazy initialization"""
+        if self.lexical_index is not None:
+            return self.lexical_index
+        with self._lock:
+            if self.lexical_index is None:
+                path = os.getenv(
+                    "LEXICAL_INDEX_PATH",
+                    os.path.join(self.permanent_db_path, "lexical_index.sqlite3"),
+                )
+                self.lexical_index = LexicalIndex(path)
+            return self.lexical_index
+    
+    def attach_client(self, client):
+        """Use an already-open Chroma client for the permanent store"""
+        with self._lock:
+            self.client = client
+            self.permanent_store = None
+            self.shard_stores, self.shard_keys = {}, {}
+            self._shards_listed_at = None
+    
+    def _open_store(self, name: str, store_class=Chroma, metadata: dict = None, **kwargs):
+        """Open a Chroma (or FAISS) collection and adopt the embedding spec it was written with.
+
+        New collections record the configured spec (and any other metadata
+        given). A collection written with another one keeps using it (its
+        vectors would not match otherwise) until reembed_kb.py migrates it.
+        """
+        store = store_class(
+            collection_name=name,
+            embedding_function=self.get_embeddings(name),
+            collection_metadata={**(metadata or {}), EMBEDDING_METADATA_KEY: self.embedding_spec(name)},
+            **kwargs,
+        )
+        if self.embeddings is not None:
+            return store
+        collection = store._collection
+        configured = configured_spec(name)
+        metadata = dict(collection.metadata or {})
+        recorded = metadata.get(EMBEDDING_METADATA_KEY)
+        if recorded is None:
+            # Created before specs were recorded
+            if collection.count():
+                recorded = LEGACY_EMBEDDING_SPEC
+            else:
+                recorded = configured
+                # modify() replaces all metadata and refuses hnsw settings
+                if not any(k.startswith("hnsw:") for k in metadata):
+                    collection.modify(metadata=dict(metadata, **{EMBEDDING_METADATA_KEY: configured}))
+        if recorded != configured:
+            logger.warning(
+                "%s is embedded with %r, not the configured %r; using %r until it is migrated with reembed_kb.py",
+                name, recorded, configured, recorded,
+            )
+        self.collection_specs[name] = recorded
+        store._embedding_function = self.get_embeddings(name)
+        return store
+
     def get_permanent_store(self):
         """Get or create permanent vector store"""
-        if self.permanent_store is None:
-            self.permanent_store = Chroma(
-                persist_directory=self.permanent_db_path,
-                embedding_function=self.get_embeddings(),
-                collection_name="permanent_kb"
-            )
-        return self.permanent_store
+        # Requests only read the attribute; the lock guards the first open
+        if self.permanent_store is not None:
+            return self.permanent_store
+        with self._lock:
+            if self.permanent_store is None:
+                if VECTOR_STORE == "faiss":
+                    self.permanent_store = self._open_store(
+                        "permanent_kb", FaissVectorStore, persist_directory=self.faiss_db_path
+                    )
+                    return self.permanent_store
+                if self.client is None and CHROMA_SERVER_URL:
+                    self.client = open_chroma_client(self.permanent_db_path)
+                if self.client is not None:
+                    self.permanent_store = self._open_store("permanent_kb", client=self.client)
+                else:
+                    self.permanent_store = self._open_store("permanent_kb", persist_directory=self.permanent_db_path)
+            return self.permanent_store
+    
+    def get_shard_store(self, name: str, draft_type: str = None, jurisdiction: str = None):
+        """Get or create a permanent KB shard (see shard_name); "permanent_kb" is the unsharded store"""
+        if name == "permanent_kb":
+            return self.get_permanent_store()
+        store = self.shard_stores.get(name)
+        if store is not None:
+            return store
+        with self._lock:
+            if name not in self.shard_stores:
+                keys = {
+                    SHARD_DRAFT_TYPE_KEY: normalize_draft_type(draft_type),
+                    SHARD_JURISDICTION_KEY: normalize_draft_type(jurisdiction),
+                }
+                if VECTOR_STORE == "faiss":
+                    store = self._open_store(
+                        name, FaissVectorStore, keys, persist_directory=os.path.join(self.faiss_db_path, name)
+                    )
+                else:
+                    store = self._open_store(name, metadata=keys, client=self._chroma_client())
+                # An existing shard keeps the keys it was created with
+                metadata = store._collection.metadata or {}
+                self.shard_keys[name] = (
+                    metadata.get(SHARD_DRAFT_TYPE_KEY, ""), metadata.get(SHARD_JURISDICTION_KEY, "")
+                )
+                self.shard_stores[name] = store
+            return self.shard_stores[name]
+    
+    def _chroma_client(self):
+        """Client of the permanent KB's Chroma store"""
+        return self.client or self.get_permanent_store()._client
+    
+    def _shard_names(self) -> List[str]:
+        """Permanent KB shards present in the store, including those other processes created"""
+        if VECTOR_STORE == "faiss":
+            if not os.path.isdir(self.faiss_db_path):
+                return []
+            return [
+                entry for entry in os.listdir(self.faiss_db_path)
+                if entry.startswith(SHARD_PREFIX) and os.path.isdir(os.path.join(self.faiss_db_path, entry))
+            ]
+        collections = self._chroma_client().list_collections()
+        names = [c.name if hasattr(c, "name") else c for c in collections]
+        return [name for name in names if name.startswith(SHARD_PREFIX)]
+    
+    def _shards_due(self) -> bool:
+        return KB_SHARDING and (
+            self._shards_listed_at is None or time.monotonic() - self._shards_listed_at >= SHARD_REFRESH_SECONDS
+        )
+    
+    def refresh_shards(self, force: bool = False) -> List[str]:
+        """Open shards not opened yet, at most every SHARD_REFRESH_SECONDS unless forced"""
+        if force or self._shards_due():
+            self._shards_listed_at = time.monotonic()
+            for name in self._shard_names():
+                self.get_shard_store(name)
+        return list(self.shard_stores)
+    
+    def permanent_stores(self) -> List[Any]:
+        """The unsharded permanent store and every opened shard"""
+        return [self.get_permanent_store()] + list(self.shard_stores.values())
+    
+    def permanent_count(self) -> int:
+        """Chunks in the permanent KB across all shards"""
+        self.refresh_shards(force=True)
+        return sum(store._collection.count() for store in self.permanent_stores())
     
     def get_temp_store(self):
         """Get or create temporary vector store"""
-        if self.temp_store is None:
-            self.temp_store = Chroma(
-                persist_directory=self.temp_db_path,
-                embedding_function=self.get_embeddings(),
-                collection_name="temp_kb"
+        if self.temp_store is not None:
+            return self.temp_store
+        with self._lock:
+            if self.temp_store is None:
+                if CHROMA_SERVER_URL:
+                    if self.client is None:
+                        self.client = open_chroma_client(self.permanent_db_path)
+                    self.temp_store = self._open_store("temp_kb", client=self.client)
+                else:
+                    self.temp_store = self._open_store("temp_kb", persist_directory=self.temp_db_path)
+            return self.temp_store
+    
+    @staticmethod
+    def _touch_index(store) -> int:
+        """Load a collection's HNSW index into memory with one cheap query"""
+        collection = store._collection
+        count = collection.count()
+        if count:
+            sample = collection.peek(limit=1)
+            collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1, include=[])
+        return count
+    
+    def _touch_permanent(self) -> int:
+        """Open every permanent KB shard and pre-touch its index"""
+        self.refresh_shards(force=True)
+        return sum(self._touch_index(store) for store in self.permanent_stores())
+    
+    def _ensure_lexical_index(self) -> int:
+        """Build the BM25 index from the permanent stores if it is missing"""
+        lexical = self.get_lexical_index()
+        if not len(lexical):
+            for store in self.permanent_stores():
+                if store._collection.count():
+                    lexical.rebuild_from(store._collection)
+        return len(lexical)
+    
+    def warm_up(self, embeddings: bool = True) -> Dict[str, Any]:
+        """Open both stores, pre-touch their indexes and the embeddings client.
+
+        Returns per-step timings in milliseconds; failures are reported in the
+        result instead of raised so the app can still start degraded.
+        """
+        report: Dict[str, Any] = {"errors": {}}
+        start = time.perf_counter()
+        
+        def step(name, fn):
+            t0 = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as e:
+                report["errors"][name] = str(e)
+                result = None
+            report[f"{name}_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            return result
+        
+        report["permanent_kb_chunks"] = step("permanent_kb", self._touch_permanent)
+        report["lexical_index_chunks"] = step("lexical_index", self._ensure_lexical_index)
+        report["temp_kb_chunks"] = step("temp_kb", lambda: self._touch_index(self.get_temp_store()))
+        # After the stores, so the specs they were written with are known.
+        # Bypasses the cache so the HTTP client connects / the local model loads
+        if embeddings:
+            step("embeddings", self._warm_embeddings)
+        report["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return report
+    
+    @staticmethod
+    def iter_split_documents(docs: List[Dict[str, Any]]) -> Iterator[Document]:
+        """Section-aligned chunks of each document, with source/draft_type/version/section metadata.
+
+        A document gives either "text" or "pages" (any iterable of strings,
+        consumed once). Chunks are produced one document at a time, so only
+        the current document's chunks are held before they are yielded.
+        """
+        for doc in docs:
+            base = RAGService._base_metadata(doc)
+            # Same value as document_version(text), known once the last page is read
+            digest = hashlib.sha256()
+
+            def hashed(pages, digest=digest):
+                for page in pages:
+                    digest.update(page.encode("utf-8"))
+                    yield page
+
+            pages = doc["pages"] if "pages" in doc else [doc["text"]]
+            chunks = [
+                Document(page_content=c.text, metadata={**base, **c.metadata()})
+                for c in iter_chunks(hashed(pages))
+            ]
+            version = digest.hexdigest()[:16]
+            for chunk in chunks:
+                chunk.metadata["doc_version"] = version
+                yield chunk
+
+    @staticmethod
+    def _base_metadata(doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Metadata every chunk of a document carries.
+
+        draft_type and jurisdiction are stored normalized, so every spelling
+        lands in one shard.
+        """
+        source = doc.get("source", "unknown")
+        base = {
+            "source": source,
+            "draft_type": normalize_draft_type(doc.get("draft_type")) or None,
+            "jurisdiction": normalize_draft_type(doc.get("jurisdiction")) or None,
+            "doc_id": document_id(source),
+            "ingested_at": time.time(),
+        }
+        # Chroma rejects None metadata values
+        return {k: v for k, v in base.items() if v is not None}
+
+    def _warm_embeddings(self):
+        specs = {self.embedding_spec(name): name for name in ("permanent_kb", "temp_kb", "scratch")}
+        for name in specs.values():
+            self.get_embeddings(name).inner.embed_query("warm-up")
+
+    def _split_documents(self, docs: List[Dict[str, Any]]) -> List[Document]:
+        """Split documents into chunks carrying source/draft_type/version metadata"""
+        with stage("chunk"):
+            return list(self.iter_split_documents(docs))
+    
+    def _get_store(self, name: str, metadata: dict = None):
+        """Store of a collection chunks are written to; a new shard takes its keys from metadata"""
+        if name == "temp_kb":
+            return self.get_temp_store()
+        metadata = metadata or {}
+        return self.get_shard_store(name, metadata.get("draft_type"), metadata.get("jurisdiction"))
+
+    def _group_chunks(self, split_docs: List[Document], permanent: bool) -> Dict[str, List[Document]]:
+        """Chunks by the collection they are written to: their shard, or temp_kb"""
+        if permanent:
+            # Pick up shards other processes created, so a document that
+            # moved shard is found there and dropped
+            self.refresh_shards()
+        groups: Dict[str, List[Document]] = {}
+        for d in split_docs:
+            name = shard_name(d.metadata.get("draft_type"), d.metadata.get("jurisdiction")) if permanent else "temp_kb"
+            groups.setdefault(name, []).append(d)
+        return groups
+
+    def _evict_moved(self, name: str, sources: Dict[str, str], keep: Dict[str, Any], lexical: LexicalIndex = None):
+        """Drop the documents' chunks from the other permanent collections.
+
+        sources maps the documents' doc_id to source. A document re-ingested
+        under another draft type, or first stored before sharding, leaves its
+        old chunks behind otherwise. keep holds the IDs of the chunks just
+        written, whose BM25 entries (shared by all shards) must stay.
+        """
+        where = {"$or": [{"doc_id": {"$in": list(sources)}}, {"source": {"$in": list(set(sources.values()))}}]}
+        others = [self.get_permanent_store()] if name != "permanent_kb" else []
+        others += [store for shard, store in list(self.shard_stores.items()) if shard != name]
+        for store in others:
+            collection = store._collection
+            if not collection.count():
+                continue
+            stale = collection.get(where=where, include=[])["ids"]
+            if stale:
+                collection.delete(ids=stale)
+                if lexical is not None:
+                    lexical.delete([i for i in stale if i not in keep])
+    
+    @staticmethod
+    def _doc_sources(split_docs: List[Document]) -> Dict[str, str]:
+        return {d.metadata["doc_id"]: d.metadata["source"] for d in split_docs}
+    
+    @staticmethod
+    def _plan_upsert(store, split_docs: List[Document]) -> UpsertPlan:
+        """Diff the new chunks against what is stored for the same documents"""
+        chunks = {}
+        for d in split_docs:
+            chunks[RAGService._chunk_id(d)] = d
+        return UpsertPlan(chunks, RAGService._stored_chunks(store._collection, RAGService._doc_sources(split_docs)))
+    
+    @staticmethod
+    def _chunk_id(d: Document) -> str:
+        return chunk_id(d.metadata["source"], d.metadata.get("start_index", 0), d.page_content)
+    
+    @staticmethod
+    def _stored_chunks(collection, sources: Dict[str, str]) -> Dict[str, dict]:
+        """Metadata of the stored chunks of documents (doc_id -> source), by chunk ID"""
+        existing = {}
+        for doc_id, source in sources.items():
+            # Matching on source as well picks up chunks stored before IDs were deterministic
+            stored = collection.get(
+                where={"$or": [{"doc_id": doc_id}, {"source": source}]},
+                include=["metadatas"],
             )
-        return self.temp_store
+            existing.update(zip(stored["ids"], stored["metadatas"]))
+        return existing
+    
+    @staticmethod
+    def _apply_upsert(store, plan: UpsertPlan, vectors: List[List[float]], lexical: LexicalIndex = None):
+        """Write new chunks, drop stale ones and refresh versions of unchanged ones.
+
+        Chroma is written first: if it fails, the BM25 index is left as it was
+        rather than holding chunks the vector store never got.
+        """
+        with stage("upsert"):
+            collection = store._collection
+            if plan.new_ids:
+                collection.upsert(
+                    ids=plan.new_ids,
+                    embeddings=vectors,
+                    documents=plan.new_texts,
+                    metadatas=[plan.chunks[i].metadata for i in plan.new_ids],
+                )
+            if plan.retag_ids:
+                collection.update(
+                    ids=plan.retag_ids,
+                    metadatas=[plan.chunks[i].metadata for i in plan.retag_ids],
+                )
+            if plan.stale_ids:
+                collection.delete(ids=plan.stale_ids)
+            if lexical is not None:
+                changed = [(i, plan.chunks[i]) for i in plan.new_ids + plan.retag_ids]
+                lexical.add(
+                    (i, d.metadata.get("source"), d.metadata.get("draft_type"), d.metadata.get("jurisdiction"), d.page_content)
+                    for i, d in changed
+                )
+                lexical.delete(plan.stale_ids)
     
     def ingest_documents(self, docs: List[Dict[str, str]], permanent: bool = False):
-        """Ingest documents into vector store"""
+        """Ingest documents into vector store.
+
+        Chunk IDs are deterministic, so re-ingesting a document is a no-op and
+        a changed document only embeds its new chunks and drops its stale ones.
+        """
         if not docs:
             return
-            
-        # Split documents into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, chunk_overlap=100
-        )
         
-        split_docs = []
-        for doc in docs:
-            split_docs.extend(
-                text_splitter.create_documents(
-                    [doc["text"]], 
-                    metadatas=[{
-                        "source": doc.get("source", "unknown"),
-                        "draft_type": doc.get("draft_type")
-                    }]
-                )
-            )
+        split_docs = self._split_documents(docs)
+        if not split_docs:
+            return
         
-        # Add to appropriate store
-        if permanent:
-            store = self.get_permanent_store()
-        else:
-            store = self.get_temp_store()
-            
-        store.add_documents(split_docs)
-        store.persist()
-    
-    def retrieve_context(self, query: str, top_k: int = 5, draft_type: str = None) -> List[Dict[str, Any]]:
-        """Retrieve context from both permanent and temporary stores with draft_type filtering"""
-        results = []
+        # Add to the store of each chunk's shard
+        lexical = self.get_lexical_index() if permanent else None
+        for name, chunks in self._group_chunks(split_docs, permanent).items():
+            store = self._get_store(name, chunks[0].metadata)
+            plan = self._plan_upsert(store, chunks)
+            vectors = []
+            if plan.new_ids:
+                with stage("embed_documents"):
+                    vectors = self.get_embeddings(name).embed_documents(plan.new_texts)
+            self._apply_upsert(store, plan, vectors, lexical)
+            if permanent:
+                self._evict_moved(name, self._doc_sources(chunks), plan.chunks, lexical)
+    
+    async def aembed_texts(self, texts: List[str], collection: str = "permanent_kb") -> List[List[float]]:
+        """Embed texts for a collection in API-sized batches, as many in flight as embedding_slot allows"""
+        embeddings = self.get_embeddings(collection)
+
+        async def embed(batch):
+            async with waited(embedding_slot(), "embedding_wait"):
+                return await embeddings.aembed_documents(batch)
+
+        with stage("embed_documents"):
+            results = await asyncio.gather(*(embed(b) for b in embedding_batches(texts)))
+        return [vector for batch in results for vector in batch]
+    
+    async def aingest_documents(self, docs: List[Dict[str, str]], permanent: bool = False) -> int:
+        """Async ingest: embeddings via the async client, Chroma access in the I/O pool.
+
+        Returns the number of chunks the documents were split into.
+        """
+        if not docs:
+            return 0
         
-        # Search permanent store
-        if self.permanent_store:
+        split_docs = await run_in_io_pool(self._split_documents, docs)
+        if not split_docs:
+            return 0
+        
+        lexical = self.get_lexical_index() if permanent else None
+        groups = await run_in_io_pool(self._group_chunks, split_docs, permanent)
+        chunks_total = 0
+        for name, chunks in groups.items():
+            store = await run_in_io_pool(self._get_store, name, chunks[0].metadata)
+            plan = await run_in_io_pool(self._plan_upsert, store, chunks)
+            vectors = await self.aembed_texts(plan.new_texts, name) if plan.new_ids else []
+            await run_in_io_pool(self._apply_upsert, store, plan, vectors, lexical)
+            if permanent:
+                await run_in_io_pool(self._evict_moved, name, self._doc_sources(chunks), plan.chunks, lexical)
+            chunks_total += len(plan.chunks)
+        return chunks_total
+    
+    async def aingest_pages(self, doc: Dict[str, Any], pages: AsyncIterator[str], permanent: bool = False) -> int:
+        """Ingest one document while it is being parsed, a batch of chunks at a time.
+
+        doc holds the document's metadata as for aingest_documents (source,
+        draft_type, jurisdiction) and pages its text, consumed once. Pages are
+        chunked in a thread of their own as they arrive; every EMBEDDING_BATCH_SIZE
+        chunks are embedded and stored before the next batch, so neither the
+        whole text nor all of its vectors are held at once. The document
+        version is known after the last page: chunks are then tagged with it
+        and the stale ones of an earlier version dropped. If parsing fails
+        part-way, the earlier version is left in place. Returns the number
+        of chunks.
+        """
+        base = self._base_metadata(doc)
+        name = shard_name(base.get("draft_type"), base.get("jurisdiction")) if permanent else "temp_kb"
+        if permanent:
+            await run_in_io_pool(self.refresh_shards)
+        store = await run_in_io_pool(self._get_store, name, base)
+        sources = {base["doc_id"]: base["source"]}
+        existing = await run_in_io_pool(self._stored_chunks, store._collection, sources)
+        lexical = self.get_lexical_index() if permanent else None
+
+        loop = asyncio.get_running_loop()
+        received = queue.Queue()
+        batches = asyncio.Queue()
+        digest = hashlib.sha256()
+        stopped = threading.Event()
+
+        chunked = loop.create_future()
+
+        def done(error: BaseException = None):
+            if chunked.done():
+                return
+            if error is None:
+                chunked.set_result(None)
+            else:
+                chunked.set_exception(error)
+
+        def chunk_pages():
+            # Waits on the parser for every page, so it gets its own thread:
+            # in the I/O pool, a few slow documents would hold every thread the
+            # batches they feed must be stored with
+            def text():
+                while not stopped.is_set():
+                    page = received.get()
+                    if page is None:
+                        return
+                    digest.update(page.encode("utf-8"))
+                    yield page
+
             try:
-                # Use metadata filter when draft_type provided
-                chroma_filter = {"draft_type": draft_type} if draft_type else None
-                perm_results = self.permanent_store.similarity_search(query, k=top_k, filter=chroma_filter)
-                for doc in perm_results:
-                    results.append({
-                        "source": doc.metadata.get("source", "permanent_kb"),
-                        "text": doc.page_content
-                    })
-            except Exception as e:
-                print(f"Error searching permanent store: {e}")
+                batch = []
+                for c in iter_chunks(text()):
+                    batch.append(Document(page_content=c.text, metadata={**base, **c.metadata()}))
+                    if len(batch) >= EMBEDDING_BATCH_SIZE:
+                        loop.call_soon_threadsafe(batches.put_nowait, batch)
+                        batch = []
+                if batch:
+                    loop.call_soon_threadsafe(batches.put_nowait, batch)
+            except BaseException as e:
+                loop.call_soon_threadsafe(done, e)
+            else:
+                loop.call_soon_threadsafe(done)
+            finally:
+                loop.call_soon_threadsafe(batches.put_nowait, None)
+
+        async def feed():
+            try:
+                async for page in pages:
+                    received.put_nowait(page)
+            finally:
+                received.put_nowait(None)
+
+        feeder = asyncio.ensure_future(feed())
+        threading.Thread(target=chunk_pages, name="legalas-chunk", daemon=True).start()
+        written: Dict[str, dict] = {}
+        try:
+            while (batch := await batches.get()) is not None:
+                chunks = {}
+                for d in batch:
+                    chunks.setdefault(self._chunk_id(d), d)
+                new_ids = [i for i in chunks if i not in existing and i not in written]
+                vectors = await self.aembed_texts([chunks[i].page_content for i in new_ids], name) if new_ids else []
+                await run_in_io_pool(self._store_batch, store, chunks, new_ids, vectors, lexical)
+                written.update((i, d.metadata) for i, d in chunks.items())
+            # A parse or chunking error fails the ingest before anything is dropped
+            await asyncio.gather(feeder, chunked)
+        finally:
+            stopped.set()
+            feeder.cancel()
+            received.put_nowait(None)
+            await asyncio.gather(feeder, chunked, return_exceptions=True)
+
+        if not written:
+            return 0
+        version = digest.hexdigest()[:16]
+        await run_in_io_pool(self._finish_version, store, written, existing, version, lexical)
+        if permanent:
+            await run_in_io_pool(self._evict_moved, name, sources, written, lexical)
+        return len(written)
+    
+    @staticmethod
+    def _store_batch(store, chunks: Dict[str, Document], new_ids: List[str], vectors: List[List[float]], lexical: LexicalIndex = None):
+        """Write a streamed batch's new chunks, then index the whole batch for BM25"""
+        with stage("upsert"):
+            if new_ids:
+                store._collection.upsert(
+                    ids=new_ids,
+                    embeddings=vectors,
+                    documents=[chunks[i].page_content for i in new_ids],
+                    metadatas=[chunks[i].metadata for i in new_ids],
+                )
+            if lexical is not None:
+                lexical.add(
+                    (i, d.metadata.get("source"), d.metadata.get("draft_type"), d.metadata.get("jurisdiction"), d.page_content)
+                    for i, d in chunks.items()
+                )
+    
+    @staticmethod
+    def _finish_version(store, written: Dict[str, dict], existing: Dict[str, dict], version: str, lexical: LexicalIndex = None):
+        """Tag a streamed document's chunks with its version and drop those it no longer has"""
+        with stage("upsert"):
+            collection = store._collection
+            retag_ids = [i for i in written if (existing.get(i) or {}).get("doc_version") != version]
+            for start in range(0, len(retag_ids), 1000):
+                ids = retag_ids[start:start + 1000]
+                collection.update(ids=ids, metadatas=[dict(written[i], doc_version=version) for i in ids])
+            stale_ids = [i for i in existing if i not in written]
+            if stale_ids:
+                collection.delete(ids=stale_ids)
+                if lexical is not None:
+                    lexical.delete(stale_ids)
+    
+    def build_scratch_index(self, docs: List[Dict[str, str]]) -> ScratchIndex:
+        """Embed a request's uploads into a throwaway in-memory index"""
+        split_docs = self._split_documents(docs)
+        with stage("embed_documents"):
+            vectors = self.get_embeddings("scratch").embed_documents([d.page_content for d in split_docs])
+        return ScratchIndex(split_docs, vectors)
+    
+    async def abuild_scratch_index(self, docs: List[Dict[str, str]]) -> ScratchIndex:
+        """Async build_scratch_index: embeddings via the async client"""
+        split_docs = await run_in_io_pool(self._split_documents, docs)
+        vectors = []
+        if split_docs:
+            vectors = await self.aembed_texts([d.page_content for d in split_docs], "scratch")
+        return ScratchIndex(split_docs, vectors)
+    
+    def collect_expired_temp(self, ttl_seconds: int = TEMP_KB_TTL_SECONDS) -> int:
+        """Delete temp_kb chunks older than the TTL (or from before TTLs existed)"""
+        collection = self.get_temp_store()._collection
+        cutoff = time.time() - ttl_seconds
+        expired = []
+        total = collection.count()
+        for offset in range(0, total, 1000):
+            page = collection.get(include=["metadatas"], limit=1000, offset=offset)
+            for chunk, metadata in zip(page["ids"], page["metadatas"]):
+                if (metadata or {}).get("ingested_at", 0) < cutoff:
+                    expired.append(chunk)
+        for i in range(0, len(expired), 1000):
+            collection.delete(ids=expired[i:i + 1000])
+        return len(expired)
+    
+    @staticmethod
+    def _query_store(store, query_vector: List[float], k: int, where: dict = None, label: str = "kb") -> List[Dict[str, Any]]:
+        """Top-k hits from one Chroma or FAISS store, scored as cosine similarity"""
+        collection = store._collection
+        if collection.count() == 0:
+            return []
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        res = collection.query(
+            query_embeddings=[query_vector],
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances", "embeddings"],
+        )
+        hits = []
+        for text, metadata, distance, embedding in zip(
+            res["documents"][0], res["metadatas"][0], res["distances"][0], res["embeddings"][0]
+        ):
+            hits.append({
+                "source": (metadata or {}).get("source", label),
+                "text": text,
+                "score": distance_to_similarity(distance, space),
+                "embedding": embedding,
+            })
+        return hits
+    
+    def _query_specs(self, scratch: ScratchIndex = None) -> Dict[str, str]:
+        """Embedding spec of each collection a search will query"""
+        names = [name for name, source in (
+            ("permanent_kb", self.permanent_store), ("temp_kb", self.temp_store), ("scratch", scratch),
+        ) if source is not None]
+        names += list(self.shard_stores)
+        return {name: self.embedding_spec(name) for name in names}
+
+    def _in_space(self, hits: List[Dict[str, Any]], collection: str) -> List[Dict[str, Any]]:
+        """Tag a collection's hits with the embedding spec their scores and vectors come from"""
+        space = self.embedding_spec(collection)
+        for hit in hits:
+            hit["space"] = space
+        return hits
+
+    def _permanent_searches(self, draft_type: str = None, jurisdiction: str = None) -> List[tuple]:
+        """(collection, store, where filter) of each permanent KB collection a search queries.
+
+        A draft type routes to its own shards; a jurisdiction narrows them to
+        that jurisdiction's shard plus the draft type's jurisdiction-less one
+        when it has a shard of its own. Without a draft type every shard is
+        searched. The unsharded collection holds chunks without a draft type
+        and those stored before sharding, under whichever spelling they were
+        written with.
+        """
+        draft = normalize_draft_type(draft_type)
+        place = normalize_draft_type(jurisdiction)
+        shards = [(name, self.shard_keys.get(name, ("", ""))) for name in list(self.shard_stores)]
+        if draft:
+            shards = [(name, keys) for name, keys in shards if keys[0] == draft]
+            if place and any(keys[1] == place for _, keys in shards):
+                shards = [(name, keys) for name, keys in shards if keys[1] in (place, "")]
+        searches = [(name, self.shard_stores[name], None) for name, _ in shards]
+        if self.permanent_store is not None:
+            where = {"draft_type": {"$in": draft_type_spellings(draft_type)}} if draft else None
+            searches.append(("permanent_kb", self.permanent_store, where))
+        return searches
+
+    def _search(self, query: str, query_vectors: Dict[str, List[float]], top_k: int, draft_type: str = None, scratch: ScratchIndex = None, mmr: bool = None, jurisdiction: str = None) -> List[Dict[str, Any]]:
+        """Search the scratch index, both stores and the BM25 index concurrently.
+
+        Each source returns its own top-k, so the request's uploads compete
+        on relevance instead of being cut off after the permanent store's
+        hits. The permanent KB is searched in every shard the draft type and
+        jurisdiction route to, all at once. query_vectors holds the query
+        embedded for each collection (one vector shared by all unless they use
+        different backends). Vector hits are merged by score with duplicate
+        chunks collapsed (by rank across backends, whose scores do not
+        compare), then fused with the BM25 ranking by reciprocal rank; MMR
+        optionally diversifies the result.
+        """
+        mmr = RETRIEVAL_MMR if mmr is None else mmr
+        fetch_k = top_k * 3 if mmr else top_k
         
-        # Search temporary store
+        searches = []
+        permanent = self._permanent_searches(draft_type, jurisdiction)
+        for name, store, where in permanent:
+            # A shard opened after the query was embedded is searched next time
+            if name in query_vectors:
+                searches.append((name, partial(
+                    self._query_store, store, query_vectors[name], fetch_k, where, "permanent_kb"
+                )))
         if self.temp_store:
+            searches.append(("temp_kb", partial(
+                self._query_store, self.temp_store, query_vectors["temp_kb"], fetch_k, None, "temp_kb"
+            )))
+        
+        lexical_future = None
+        pool = get_search_pool()
+        if HYBRID_RETRIEVAL and self.permanent_store is not None:
+            # BM25 covers every shard; narrowed to a jurisdiction like the shards are
+            place = normalize_draft_type(jurisdiction)
+            narrowed = place if any(self.shard_keys.get(name, ("", ""))[1] == place for name, _, _ in permanent) else None
+            lexical_future = pool.submit(
+                traced("search_lexical", self.get_lexical_index().search), query, fetch_k, draft_type, narrowed
+            )
+        
+        # Stores are searched in parallel, so latency is that of the slowest one
+        futures = [(name, pool.submit(traced(f"search_{name}", search))) for name, search in searches]
+        hit_lists = []
+        if scratch is not None:
+            with stage("search_scratch"):
+                hit_lists.append(self._in_space(scratch.search(query_vectors["scratch"], fetch_k), "scratch"))
+        for name, future in futures:
             try:
-                temp_results = self.temp_store.similarity_search(query, k=top_k)
-                for doc in temp_results:
-                    results.append({
-                        "source": doc.metadata.get("source", "temp_kb"),
-                        "text": doc.page_content
-                    })
+                hit_lists.append(self._in_space(future.result(), name))
             except Exception as e:
-                print(f"Error searching temporary store: {e}")
+                # Counted in legalas_stage_errors_total; the other sources still answer
+                logger.warning("Error searching %s: %s", name, e, exc_info=True)
         
-        return results[:top_k]
+        merged = merge_by_space(hit_lists, k=RRF_K)
+        if lexical_future is not None:
+            try:
+                lexical_hits = lexical_future.result()
+            except Exception as e:
+                logger.warning("Error searching lexical index: %s", e, exc_info=True)
+                lexical_hits = []
+            if lexical_hits:
+                merged = reciprocal_rank_fusion(merged, lexical_hits, k=RRF_K)
+        if mmr:
+            merged = mmr_select(merged, top_k, RETRIEVAL_MMR_LAMBDA)
+        return public_hits(merged[:top_k])
+    
+    def retrieve_context(self, query: str, top_k: int = 5, draft_type: str = None, scratch: ScratchIndex = None, mmr: bool = None, jurisdiction: str = None) -> List[Dict[str, Any]]:
+        """Retrieve context from the request's scratch index and both stores, routed by draft_type and jurisdiction"""
+        if not query or not (self.permanent_store is not None or self.temp_store or scratch):
+            return []
+        with stage("retrieve"):
+            if self._shards_due():
+                self.refresh_shards()
+            specs = self._query_specs(scratch)
+            by_spec = {}
+            with stage("embed_query"):
+                for name, spec in specs.items():
+                    if spec not in by_spec:
+                        by_spec[spec] = self.get_embeddings(name).embed_query(query)
+            vectors = {name: by_spec[spec] for name, spec in specs.items()}
+            return self._search(query, vectors, top_k, draft_type, scratch, mmr, jurisdiction)
+    
+    async def aretrieve_context(self, query: str, top_k: int = 5, draft_type: str = None, scratch: ScratchIndex = None, mmr: bool = None, jurisdiction: str = None) -> List[Dict[str, Any]]:
+        """Async retrieve: query embedding via the async client, search off the event loop"""
+        if not query or not (self.permanent_store is not None or self.temp_store or scratch):
+            return []
+        with stage("retrieve"):
+            if self._shards_due():
+                await run_in_io_pool(self.refresh_shards)
+            specs = self._query_specs(scratch)
+            by_spec = {}
+            for name, spec in specs.items():
+                if spec not in by_spec:
+                    async with waited(embedding_slot(), "embedding_wait"):
+                        with stage("embed_query"):
+                            by_spec[spec] = await self.get_embeddings(name).aembed_query(query)
+            vectors = {name: by_spec[spec] for name, spec in specs.items()}
+            return await run_in_io_pool(self._search, query, vectors, top_k, draft_type, scratch, mmr, jurisdiction)
+
+    async def aretrieve_many(self, requests: List[tuple], top_k: int = 5, scratch: ScratchIndex = None, mmr: bool = None) -> List[List[Dict[str, Any]]]:
+        """Retrieve for many (query, draft_type[, jurisdiction]) requests, each distinct one only once.
+
+        The distinct queries are embedded together in batched requests and
+        their searches run concurrently; results come back in input order,
+        with repeated requests sharing one hit list.
+        """
+        if not (self.permanent_store is not None or self.temp_store or scratch):
+            return [[] for _ in requests]
+        if self._shards_due():
+            await run_in_io_pool(self.refresh_shards)
+        unique = list(dict.fromkeys(r for r in requests if r[0]))
+        queries = list(dict.fromkeys(r[0] for r in unique))
+        specs = self._query_specs(scratch)
+        by_spec = {}
+        with stage("retrieve_many"):
+            for name, spec in specs.items():
+                if spec not in by_spec and queries:
+                    by_spec[spec] = dict(zip(queries, await self.aembed_texts(queries, name)))
+            results = await asyncio.gather(*(
+                run_in_io_pool(
+                    self._search, r[0], {name: by_spec[spec][r[0]] for name, spec in specs.items()},
+                    top_k, r[1], scratch, mmr, r[2] if len(r) > 2 else None,
+                )
+                for r in unique
+            ))
+        by_request = dict(zip(unique, results))
+        return [by_request.get(r, []) for r in requests]
 
 # Global RAG service instance
 rag_service = RAGService()
@@ -117,9 +1002,29 @@ def ingest_documents(docs: List[Dict[str, str]], permanent: bool = False):
     """Convenience function to ingest documents"""
     rag_service.ingest_documents(docs, permanent)
 
-def retrieve_context(query: str, top_k: int = 5, draft_type: str = None) -> List[Dict[str, Any]]:
-    """Convenience function to retrieve context with draft_type filtering"""
-    return rag_service.retrieve_context(query, top_k, draft_type)
+async def aingest_documents(docs: List[Dict[str, str]], permanent: bool = False) -> int:
+    """Convenience function to ingest documents without blocking the event loop"""
+    return await rag_service.aingest_documents(docs, permanent)
+
+async def aingest_pages(doc: Dict[str, Any], pages: AsyncIterator[str], permanent: bool = False) -> int:
+    """Convenience function to ingest one document page by page as it is parsed"""
+    return await rag_service.aingest_pages(doc, pages, permanent)
+
+def retrieve_context(query: str, top_k: int = 5, draft_type: str = None, scratch: ScratchIndex = None, mmr: bool = None, jurisdiction: str = None) -> List[Dict[str, Any]]:
+    """Convenience function to retrieve context routed by draft_type and jurisdiction"""
+    return rag_service.retrieve_context(query, top_k, draft_type, scratch, mmr, jurisdiction)
+
+async def aretrieve_context(query: str, top_k: int = 5, draft_type: str = None, scratch: ScratchIndex = None, mmr: bool = None, jurisdiction: str = None) -> List[Dict[str, Any]]:
+    """Convenience function to retrieve context without blocking the event loop"""
+    return await rag_service.aretrieve_context(query, top_k, draft_type, scratch, mmr, jurisdiction)
+
+async def aretrieve_many(requests: List[tuple], top_k: int = 5, scratch: ScratchIndex = None, mmr: bool = None) -> List[List[Dict[str, Any]]]:
+    """Convenience function to retrieve for many (query, draft_type[, jurisdiction]) requests at once"""
+    return await rag_service.aretrieve_many(requests, top_k, scratch, mmr)
+
+async def abuild_scratch_index(docs: List[Dict[str, str]]) -> ScratchIndex:
+    """Convenience function to build a per-request index from uploaded documents"""
+    return await rag_service.abuild_scratch_index(docs)
 
 def get_permanent_vector_store():
     """Get the permanent vector store"""
@@ -0,0 +1,192 @@
+# Exact and near-duplicate cache of generated drafts
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.services.metrics import CACHE_LOOKUPS
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "./cache/responses.sqlite3")
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+# Cosine similarity of payload embeddings above which a draft is reused;
+# set to 1 to only serve exact repeats
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.97"))
+
+# Fields that must match exactly for a near hit: a draft for other parties,
+# another court or another draft type is never a usable answer
+GUARD_FIELDS = ("draft_type", "case_type", "court_name", "jurisdiction", "petitioner", "respondent")
+
+_cache = None
+
+
+def _normalize(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_normalize(v) for v in value)
+    return " ".join(str(value or "").split()).lower()
+
+
+def prompt_key(model: str, prompt: str) -> str:
+    """Exact-hit key: the filled prompt sent to a given model"""
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+def payload_guard(data: dict, model: str, context_fingerprint: str = "") -> str:
+    """Near-hit partition: model, uploaded context and the GUARD_FIELDS"""
+    parts = [model, context_fingerprint] + [_normalize(data.get(f)) for f in GUARD_FIELDS]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def payload_signature(data: dict) -> str:
+    """Text of the whole payload, embedded to find near-duplicate requests"""
+    return "\n".join(f"{k}: {_normalize(v)}" for k, v in sorted(data.items()))
+
+
+class ResponseCache:
+    """SQLite cache of finished drafts (text and DOCX bytes).
+
+    Lookups are exact, by hash of the filled prompt, or near, by cosine
+    similarity of the payload embedding among entries sharing the same
+    guard. Entries expire after ttl_seconds; beyond max_entries the least
+    recently used are evicted.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int, similarity: float):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, guard TEXT NOT NULL, vector BLOB,
+                petition TEXT NOT NULL, docx BLOB NOT NULL,
+                created_at REAL NOT NULL, last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_responses_guard ON responses(guard);
+            CREATE INDEX IF NOT EXISTS ix_responses_access ON responses(last_access);
+            """
+        )
+
+    def _fresh_after(self) -> float:
+        return time.time() - self.ttl_seconds
+
+    def _touch(self, key: str):
+        self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+
+    def get_exact(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT petition, docx FROM responses WHERE key = ? AND created_at >= ?",
+                (key, self._fresh_after()),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._touch(key)
+            self.exact_hits += 1
+        return {"petition": row[0], "docx": bytes(row[1]), "cache": "exact"}
+
+    def get_near(self, guard: str, vector: Optional[List[float]]) -> Optional[Dict[str, Any]]:
+        """Most similar fresh entry with the same guard, if above the threshold"""
+        if vector is None:
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, vector FROM responses WHERE guard = ? AND created_at >= ? AND vector IS NOT NULL",
+                (guard, self._fresh_after()),
+            ).fetchall()
+            if not rows:
+                return None
+            matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+            query = np.asarray(vector, dtype=np.float32)
+            sims = matrix @ query / (
+                np.maximum(np.linalg.norm(matrix, axis=1) * np.linalg.norm(query), 1e-12)
+            )
+            best = int(np.argmax(sims))
+            if sims[best] < self.similarity:
+                return None
+            key = rows[best][0]
+            petition, docx = self._conn.execute(
+                "SELECT petition, docx FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._touch(key)
+            self.near_hits += 1
+        return {
+            "petition": petition,
+            "docx": bytes(docx),
+            "cache": "near",
+            "similarity": round(float(sims[best]), 4),
+        }
+
+    def put(self, key: str, guard: str, vector: Optional[List[float]], petition: str, docx: bytes):
+        blob = sqlite3.Binary(array("f", vector).tobytes()) if vector is not None else None
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, guard, blob, petition, sqlite3.Binary(docx), now, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (self._fresh_after(),))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.exact_hits + self.near_hits + self.misses
+        hits = self.exact_hits + self.near_hits
+        return {
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+def _lookups() -> Dict[tuple, float]:
+    if _cache is None:
+        return {}
+    return {
+        ("responses", "exact_hit"): _cache.exact_hits,
+        ("responses", "near_hit"): _cache.near_hits,
+        ("responses", "miss"): _cache.misses,
+    }
+
+
+CACHE_LOOKUPS.add_collector(_lookups)
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get the process-wide response cache, or None when disabled"""
+    global _cache
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ResponseCache(
+            RESPONSE_CACHE_PATH,
+            ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+            max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+            similarity=RESPONSE_CACHE_SIMILARITY,
+        )
+    return _cache
@@ -0,0 +1,118 @@
+# Merging and re-ranking of retrieval hits from several stores
+import hashlib
+from typing import Any, Dict, List
+
+import numpy as np
+
+# A hit is a dict with at least "source", "text" and "score" (higher is
+# better, roughly cosine similarity); "embedding" is optional and used by MMR,
+# and "space" names the embedding spec it and the score come from.
+Hit = Dict[str, Any]
+
+
+def chunk_hash(text: str) -> str:
+    """Identity of a chunk's content, independent of which store it came from"""
+    normalized = " ".join(text.split()).lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def distance_to_similarity(distance: float, space: str = "l2") -> float:
+    """Map a Chroma distance onto cosine similarity for unit-length embeddings"""
+    if space == "l2":
+        # Chroma reports squared L2: |a - b|^2 = 2 - 2cos for unit vectors
+        return 1.0 - distance / 2.0
+    # "cosine" and "ip" distances are both 1 - similarity
+    return 1.0 - distance
+
+
+def merge_by_score(*hit_lists: List[Hit]) -> List[Hit]:
+    """Merge hits from several stores by score, keeping the best copy of each chunk"""
+    best: Dict[str, Hit] = {}
+    for hits in hit_lists:
+        for hit in hits:
+            key = chunk_hash(hit["text"])
+            if key not in best or hit["score"] > best[key]["score"]:
+                best[key] = hit
+    return sorted(best.values(), key=lambda h: h["score"], reverse=True)
+
+
+def reciprocal_rank_fusion(*ranked_lists: List[Hit], k: int = 60) -> List[Hit]:
+    """Fuse ranked lists with RRF: score = sum of 1 / (k + rank) over the lists.
+
+    Only ranks matter, so lists with incomparable scores (cosine similarity,
+    BM25) can be combined. The returned hits carry the fused score; the copy
+    with an embedding is preferred when a chunk appears in several lists.
+    """
+    fused: Dict[str, float] = {}
+    best: Dict[str, Hit] = {}
+    for hits in ranked_lists:
+        for rank, hit in enumerate(hits, start=1):
+            key = chunk_hash(hit["text"])
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+            if key not in best or (best[key].get("embedding") is None and hit.get("embedding") is not None):
+                best[key] = hit
+    ordered = sorted(fused, key=fused.get, reverse=True)
+    return [dict(best[key], score=fused[key]) for key in ordered]
+
+
+def merge_by_space(hit_lists: List[List[Hit]], k: int = 60) -> List[Hit]:
+    """Merge hit lists, each from one embedding space, that may come from different models.
+
+    Lists of one space are merged by score; scores of different models are
+    not comparable, so the per-space lists are fused by rank (RRF) instead.
+    """
+    by_space: Dict[Any, List[List[Hit]]] = {}
+    for hits in hit_lists:
+        if hits:
+            by_space.setdefault(hits[0].get("space"), []).append(hits)
+    merged = [merge_by_score(*lists) for lists in by_space.values()]
+    if len(merged) <= 1:
+        return merged[0] if merged else []
+    return reciprocal_rank_fusion(*merged, k=k)
+
+
+def mmr_select(hits: List[Hit], k: int, lambda_mult: float = 0.7) -> List[Hit]:
+    """Maximal marginal relevance: trade relevance against redundancy among hits.
+
+    Relevance is each hit's score scaled to [0, 1], so it works on fused
+    rankings as well; redundancy is the highest cosine similarity to an
+    already selected hit of the same embedding space, and is zero for hits
+    without an embedding (vectors of different models are not comparable).
+    """
+    if len(hits) <= 1:
+        return hits[:k]
+
+    scores = np.asarray([h["score"] for h in hits], dtype=np.float32)
+    low, high = float(scores.min()), float(scores.max())
+    relevance = (scores - low) / (high - low) if high > low else np.ones_like(scores)
+
+    # Unit vectors of each space's hits, one matrix per space
+    members: Dict[Any, List[int]] = {}
+    for i, h in enumerate(hits):
+        if h.get("embedding") is not None:
+            members.setdefault(h.get("space"), []).append(i)
+    spaces = {}
+    for space, indexes in members.items():
+        vectors = np.asarray([hits[i]["embedding"] for i in indexes], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        spaces[space] = (np.asarray(indexes), vectors)
+    position = {i: (space, row) for space, (indexes, _) in spaces.items() for row, i in enumerate(indexes)}
+
+    redundancy = np.zeros(len(hits), dtype=np.float32)
+    selected: List[int] = []
+    remaining = list(range(len(hits)))
+    while remaining and len(selected) < k:
+        mmr = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy[remaining]
+        pick = remaining[int(np.argmax(mmr))]
+        selected.append(pick)
+        remaining.remove(pick)
+        if pick in position:
+            space, row = position[pick]
+            indexes, vectors = spaces[space]
+            redundancy[indexes] = np.maximum(redundancy[indexes], vectors @ vectors[row])
+    return [hits[i] for i in selected]
+
+
+def public_hits(hits: List[Hit]) -> List[Hit]:
+    """Drop internal fields (embeddings, spaces) before hits leave the service"""
+    return [{k: v for k, v in h.items() if k not in ("embedding", "space")} for h in hits]
@@ -1,7 +1,249 @@
+# Registry of draft-type rules (rules/*.yaml) and style samples
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
 import yaml
 
+logger = logging.getLogger(__name__)
+
+RULES_DIR = os.getenv("RULES_DIR", "rules")
+STYLE_SAMPLES_DIR = os.getenv("STYLE_SAMPLES_DIR", "sample_petitions")
+# Characters of a sample used as style reference, to avoid copying content
+STYLE_EXCERPT_CHARS = int(os.getenv("STYLE_EXCERPT_CHARS", "2500"))
+# How often lookups check the directories for changed files; 0 disables reloading
+RULES_RELOAD_SECONDS = float(os.getenv("RULES_RELOAD_SECONDS", "2"))
+
+SAMPLE_SUFFIX = "_sample.txt"
+RULE_KEYS = {"draft_type", "aliases", "legal_basis", "required_sections", "style_sample"}
+# Words shared by many draft types; never used alone to pick one
+GENERIC_WORDS = {"petition", "application", "the", "of", "and"}
+# Longest line treated as a heading when validating drafts
+MAX_HEADING_CHARS = 80
+# Numbering allowed before a heading: arabic, upper-case roman or a single
+# letter, followed by "." or ")" or enclosed in parentheses
+_NUMERAL = r"(?:[0-9]{1,3}|[IVXLC]{1,7}|[A-Za-z])"
+HEADING_NUMBERING = rf"(?:{_NUMERAL}[.)]|\({_NUMERAL}\))"
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def normalize_draft_type(value: str) -> str:
+    """Canonical draft-type key: "Writ Petition", "writ-petition" -> "writ_petition" """
+    return re.sub(r"[^a-z0-9]+", "_", (value or "").strip().lower()).strip("_")
+
+
+class RuleError(ValueError):
+    """A rule file that does not match the expected schema"""
+
+
+def _string_list(data: dict, key: str, path: str) -> List[str]:
+    value = data.get(key) or []
+    if not isinstance(value, list) or not all(isinstance(v, str) and v.strip() for v in value):
+        raise RuleError(f"{path}: {key} must be a list of non-empty strings")
+    return [v.strip() for v in value]
+
+
+def _sections(data: dict, path: str) -> Tuple[Tuple[str, ...], ...]:
+    """required_sections entries: a heading, or a list of accepted alternatives"""
+    value = data.get("required_sections") or []
+    if not isinstance(value, list):
+        raise RuleError(f"{path}: required_sections must be a list")
+    sections = []
+    for entry in value:
+        names = entry if isinstance(entry, list) else [entry]
+        if not names or not all(isinstance(n, str) and n.strip() for n in names):
+            raise RuleError(f"{path}: required_sections entries must be headings or lists of headings")
+        sections.append(tuple(n.strip() for n in names))
+    return tuple(sections)
+
+
+def _heading_pattern(names: Tuple[str, ...]) -> re.Pattern:
+    # Heading words in any case, after optional numbering: "1.", "(2)", "IV)",
+    # "A." or "a)". The numbering is matched case-sensitively, so a short
+    # word such as "Re." or "To)" is not taken for a numeral
+    alternatives = "|".join(r"\s+".join(map(re.escape, n.split())) for n in names)
+    return re.compile(rf"^\s*(?-i:{HEADING_NUMBERING}\s*)?(?:{alternatives})\b", re.IGNORECASE)
+
+
+class DraftTypeRules:
+    """Precomputed rules and style excerpt of one draft type"""
+
+    def __init__(self, key: str, aliases=(), legal_basis=(), required_sections=(), style_excerpt: str = ""):
+        self.key = key
+        self.aliases = tuple(aliases)
+        self.legal_basis = tuple(legal_basis)
+        self.required_sections = tuple(required_sections)
+        self.style_excerpt = style_excerpt
+        self._patterns = [(names[0], _heading_pattern(names)) for names in self.required_sections]
+
+    @property
+    def section_names(self) -> List[str]:
+        return [names[0] for names in self.required_sections]
+
+    def validate(self, text: str) -> dict:
+        """Which required sections appear as headings in a draft (no LLM involved)"""
+        headings = [line for line in (text or "").splitlines() if 0 < len(line.strip()) <= MAX_HEADING_CHARS]
+        missing = [name for name, pattern in self._patterns if not any(pattern.match(h) for h in headings)]
+        return {"draft_type": self.key, "valid": not missing, "missing_sections": missing}
+
+
+class RuleRegistry:
+    """All draft types, loaded once and indexed by normalized key.
+
+    Rule files and ``*_sample.txt`` style samples are read together; a type
+    may have either or both. Lookups are dictionary hits: the exact key, an
+    alias, or a distinctive word of a known type ("writ" -> writ_petition).
+    Unknown types return None instead of raising. When a file in either
+    directory changes, the next lookup after RULES_RELOAD_SECONDS reloads
+    the whole registry; an invalid rule file is logged and skipped.
+    """
+
+    def __init__(self, rules_dir: str = RULES_DIR, samples_dir: str = STYLE_SAMPLES_DIR,
+                 excerpt_chars: int = STYLE_EXCERPT_CHARS, reload_seconds: float = RULES_RELOAD_SECONDS):
+        self.rules_dir = rules_dir
+        self.samples_dir = samples_dir
+        self.excerpt_chars = excerpt_chars
+        self.reload_seconds = reload_seconds
+        self.types: Dict[str, DraftTypeRules] = {}
+        self.aliases: Dict[str, str] = {}
+        self.errors: List[str] = []
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _files(self, directory: str, suffixes: Tuple[str, ...]) -> List[os.DirEntry]:
+        try:
+            return sorted(
+                (e for e in os.scandir(directory) if e.is_file() and e.name.endswith(suffixes)),
+                key=lambda e: e.name,
+            )
+        except FileNotFoundError:
+            return []
+
+    def _scan(self):
+        rules = self._files(self.rules_dir, (".yaml", ".yml"))
+        samples = self._files(self.samples_dir, (SAMPLE_SUFFIX,))
+        signature = tuple((e.path, e.stat().st_mtime_ns, e.stat().st_size) for e in rules + samples)
+        return rules, samples, signature
+
+    def _excerpt(self, path: str) -> str:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read().strip()[:self.excerpt_chars]
+        except OSError as e:
+            self.errors.append(f"{path}: {e}")
+            return ""
+
+    def load(self) -> "RuleRegistry":
+        """(Re)load every rule file and style sample, then swap the indexes in"""
+        with self._lock:
+            rules, samples, signature = self._scan()
+            self.errors = []
+            excerpts = {
+                normalize_draft_type(e.name[:-len(SAMPLE_SUFFIX)]): e.path for e in samples
+            }
+            parsed = {}
+            for entry in rules:
+                try:
+                    with open(entry.path, "r", encoding="utf-8") as f:
+                        data = yaml.safe_load(f) or {}
+                    if not isinstance(data, dict):
+                        raise RuleError(f"{entry.path}: expected a mapping")
+                    unknown = set(data) - RULE_KEYS
+                    if unknown:
+                        logger.warning("%s: ignoring unknown keys %s", entry.path, ", ".join(sorted(unknown)))
+                    key = normalize_draft_type(data.get("draft_type") or entry.name.rsplit(".", 1)[0])
+                    parsed[key] = dict(
+                        aliases=[normalize_draft_type(a) for a in _string_list(data, "aliases", entry.path)],
+                        legal_basis=_string_list(data, "legal_basis", entry.path),
+                        required_sections=_sections(data, entry.path),
+                    )
+                    if data.get("style_sample"):
+                        excerpts[key] = os.path.join(self.samples_dir, str(data["style_sample"]))
+                except (OSError, yaml.YAMLError, RuleError) as e:
+                    self.errors.append(str(e))
+                    logger.error("Skipping rule file %s: %s", entry.path, e)
+
+            types = {}
+            for key in sorted(set(parsed) | set(excerpts)):
+                spec = parsed.get(key, {})
+                excerpt = self._excerpt(excerpts[key]) if key in excerpts else ""
+                types[key] = DraftTypeRules(key, style_excerpt=excerpt, **spec)
+
+            # Words of a type's key that no other type uses are aliases too,
+            # so free-form input such as "Civil Suit (money recovery)" resolves
+            owners: Dict[str, set] = {}
+            for key in types:
+                for word in key.split("_"):
+                    if word and word not in GENERIC_WORDS:
+                        owners.setdefault(word, set()).add(key)
+            aliases = {word: keys.pop() for word, keys in owners.items() if len(keys) == 1}
+            for key, spec in types.items():
+                for alias in spec.aliases:
+                    aliases[alias] = key
+
+            self.types, self.aliases = types, aliases
+            self._signature = signature
+            self._checked_at = time.monotonic()
+        logger.info("Loaded rules for %d draft types (%d errors)", len(types), len(self.errors))
+        return self
+
+    def _maybe_reload(self):
+        if self.reload_seconds <= 0 or time.monotonic() - self._checked_at < self.reload_seconds:
+            return
+        self._checked_at = time.monotonic()
+        if self._scan()[2] != self._signature:
+            self.load()
+
+    def resolve(self, draft_type: str) -> Optional[str]:
+        """Registered key for a free-form draft type, or None"""
+        self._maybe_reload()
+        key = normalize_draft_type(draft_type)
+        if not key:
+            return None
+        if key in self.types:
+            return key
+        if key in self.aliases:
+            return self.aliases[key]
+        for word in key.split("_"):
+            if word in self.aliases:
+                return self.aliases[word]
+        return None
+
+    def get(self, draft_type: str) -> Optional[DraftTypeRules]:
+        key = self.resolve(draft_type)
+        return self.types.get(key) if key else None
+
+    def required_sections(self, draft_type: str) -> List[str]:
+        spec = self.get(draft_type)
+        return spec.section_names if spec else []
+
+    def style_excerpt(self, draft_type: str) -> str:
+        spec = self.get(draft_type)
+        return spec.style_excerpt if spec else ""
+
+    def validate(self, draft_type: str, text: str) -> dict:
+        """Check a draft against its type's required sections; unknown types pass"""
+        spec = self.get(draft_type)
+        if spec is None:
+            return {"draft_type": normalize_draft_type(draft_type), "valid": True, "missing_sections": []}
+        return spec.validate(text)
+
+
+def get_rule_registry() -> RuleRegistry:
+    """Get the process-wide rule registry - loaded on first use"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = RuleRegistry().load()
+    return _registry
+
 
 def get_required_sections(case_type):
-    with open(f"rules/{case_type}.yaml") as f:
-        rule_data = yaml.safe_load(f)
-    return rule_data.get("required_sections", [])
+    """Required section headings for a draft type ([] when unknown)"""
+    return get_rule_registry().required_sections(case_type)
@@ -0,0 +1,55 @@
+# Ephemeral per-request vector index over a request's own uploads
+import hashlib
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain.schema import Document
+
+
+class ScratchIndex:
+    """Flat in-memory cosine index built from one request's uploaded documents.
+
+    Nothing is persisted: the index lives only as long as the request that
+    built it, so uploads never leak into other users' context and retrieval
+    cost depends only on the size of this request's uploads.
+    """
+
+    def __init__(self, chunks: List[Document], vectors: List[List[float]]):
+        self.chunks = chunks
+        digest = hashlib.sha256()
+        for text in sorted(c.page_content for c in chunks):
+            digest.update(text.encode("utf-8") + b"\0")
+        # Identifies the uploaded content, e.g. for keying cached responses
+        self.fingerprint = digest.hexdigest() if chunks else ""
+        if not chunks:
+            self.vectors = np.zeros((0, 0), dtype=np.float32)
+            return
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(chunks), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.vectors = matrix / norms
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search(self, query_vector: List[float], k: int) -> List[Dict[str, Any]]:
+        """Top-k chunks by cosine similarity to the query vector"""
+        if not self.chunks or k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.vectors @ query
+        k = min(k, len(self.chunks))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {
+                "source": self.chunks[i].metadata.get("source", "upload"),
+                "text": self.chunks[i].page_content,
+                "score": float(scores[i]),
+                "embedding": self.vectors[i],
+            }
+            for i in top
+        ]
@@ -0,0 +1,79 @@
+# Content-addressed cache of text extracted from uploaded documents
+import json
+import os
+import threading
+import zlib
+from typing import Dict, List, Optional
+
+from app.services.metrics import CACHE_LOOKUPS
+from utils.sqlite_cache import SQLiteLRUCache
+
+TEXT_CACHE_ENABLED = os.getenv("TEXT_CACHE", "1") != "0"
+TEXT_CACHE_PATH = os.getenv("TEXT_CACHE_PATH", "./cache/extracted_text.sqlite3")
+TEXT_CACHE_MAX_MB = float(os.getenv("TEXT_CACHE_MAX_MB", "1024"))
+# Bump when extraction output changes so stale text is not served
+EXTRACTOR_VERSION = "1"
+
+_cache = None
+
+
+class TextCache:
+    """Extracted text and page offsets keyed by sha256 of the file bytes.
+
+    Entries are zlib-compressed JSON in a SQLiteLRUCache, so the same FIR or
+    order uploaded again is never re-parsed. Each entry remembers how long
+    the original parse took, which is added to parse_seconds_saved on a hit.
+    """
+
+    def __init__(self, cache: SQLiteLRUCache):
+        self.cache = cache
+        self.parse_seconds_saved = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(digest: str, ext: str) -> str:
+        return f"{EXTRACTOR_VERSION}:{ext}:{digest}"
+
+    def get_pages(self, digest: str, ext: str) -> Optional[List[str]]:
+        blob = self.cache.get(self._key(digest, ext))
+        if blob is None:
+            return None
+        entry = json.loads(zlib.decompress(blob))
+        with self._lock:
+            self.parse_seconds_saved += entry["parse_seconds"]
+        text, offsets = entry["text"], entry["offsets"]
+        return [text[a:b] for a, b in zip(offsets, offsets[1:] + [len(text)])]
+
+    def put_pages(self, digest: str, ext: str, pages: List[str], parse_seconds: float):
+        offsets, position = [], 0
+        for page in pages:
+            offsets.append(position)
+            position += len(page)
+        entry = {"text": "".join(pages), "offsets": offsets, "parse_seconds": round(parse_seconds, 4)}
+        self.cache.set(self._key(digest, ext), zlib.compress(json.dumps(entry).encode("utf-8")))
+
+    def stats(self) -> dict:
+        return dict(self.cache.stats(), parse_seconds_saved=round(self.parse_seconds_saved, 3))
+
+
+def _lookups() -> Dict[tuple, float]:
+    if _cache is None:
+        return {}
+    return {("extracted_text", "hit"): _cache.cache.hits, ("extracted_text", "miss"): _cache.cache.misses}
+
+
+CACHE_LOOKUPS.add_collector(_lookups)
+
+
+def get_text_cache() -> Optional[TextCache]:
+    """Get the process-wide extracted-text cache, or None when disabled"""
+    global _cache
+    if not TEXT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = TextCache(SQLiteLRUCache(
+            TEXT_CACHE_PATH,
+            max_bytes=int(TEXT_CACHE_MAX_MB * 1024 * 1024),
+            table="extracted_text",
+        ))
+    return _cache
@@ -1,5 +1,6 @@
 # Simplified uploader service that uses the consolidated document loader
 from utils.document_loader import load_file_async
+from app.services.rag_service import aingest_documents
 from fastapi import UploadFile
 from typing import List
 
@@ -7,16 +8,19 @@ async def extract_text_from_file(file: UploadFile) -> str:
     """Extract text from uploaded file using consolidated loader"""
     return await load_file_async(file)
 
-async def process_and_store_permanent_docs(files: List[UploadFile], collection):
-    """Process and store permanent documents - simplified to use consolidated loader"""
+async def process_and_store_permanent_docs(files: List[UploadFile]) -> int:
+    """Process and store permanent documents through the regular permanent ingest.
+
+    Chunking, IDs, embeddings, shards and the BM25 index are the ones any
+    other ingest uses, so re-uploading a file is an idempotent upsert and a
+    changed file replaces its previous version. Returns the number of chunks.
+    """
+    docs = []
     for file in files:
         text = await extract_text_from_file(file)
         if text.strip():
-            collection.add(
-                documents=[text],
-                metadatas=[{"filename": file.filename}],
-                ids=[file.filename],
-            )
+            docs.append({"source": file.filename, "text": text})
+    return await aingest_documents(docs, permanent=True)
 
 async def process_and_store_temp_docs(files: List[UploadFile]) -> List[str]:
     """Process temporary documents - simplified to use consolidated loader"""
@@ -0,0 +1,99 @@
+"""
+Batch drafting: one /generate/batch job versus N concurrent /generate calls.
+
+Starts the fake OpenAI server and the app as subprocesses and drafts N
+petitions that differ only in the petitioner, first as N separate requests
+and then as a single batch (wait mode, ZIP response). Reports wall time,
+drafts per minute and the number of retrievals the batch needed.
+
+    python -m benchmarks.bench_batch_generate --items 50
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_generate_concurrency import FORM
+from benchmarks.common import REPO_ROOT, fake_openai_env, free_port, start_fake_openai, wait_until_up
+
+
+async def _individual(url: str, items: int) -> float:
+    limits = httpx.Limits(max_connections=items)
+    async with httpx.AsyncClient(timeout=600.0, limits=limits) as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post(url, data=dict(FORM, petitioner=f"Client {i}")) for i in range(items)
+        ))
+        elapsed = time.perf_counter() - start
+    for res in responses:
+        res.raise_for_status()
+    return elapsed
+
+
+def _batch(url: str, items: int):
+    common = {k: v for k, v in FORM.items() if k not in ("petitioner", "download")}
+    payloads = [{"petitioner": f"Client {i}"} for i in range(items)]
+    start = time.perf_counter()
+    res = httpx.post(url, data={
+        "items": json.dumps(payloads), "common": json.dumps(common), "wait": "true",
+    }, timeout=600.0)
+    elapsed = time.perf_counter() - start
+    res.raise_for_status()
+    job = httpx.get(f"{url}/{res.headers['x-batch-job']}", timeout=60.0).json()
+    return elapsed, job
+
+
+def run(items: int = 50, latency_ms: float = 800.0) -> dict:
+    fake_port, app_port = free_port(), free_port()
+    fake = start_fake_openai(fake_port, latency_ms)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = fake_openai_env(fake_port, {
+            "KB_STORE_PATH": f"{tmp}/kb_store",
+            "TEMP_KB_PATH": f"{tmp}/temp_kb",
+            "EMBEDDING_CACHE_PATH": f"{tmp}/embeddings.sqlite3",
+            "RESPONSE_CACHE": "0",
+            "BATCH_CONCURRENCY": "16",
+        })
+        app = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--port", str(app_port), "--log-level", "warning"],
+            cwd=REPO_ROOT, env=env,
+        )
+        try:
+            base = f"http://127.0.0.1:{app_port}"
+            wait_until_up(f"{base}/docs")
+            individual = asyncio.run(_individual(f"{base}/generate", items))
+            batch, job = _batch(f"{base}/generate/batch", items)
+        finally:
+            app.terminate()
+            fake.terminate()
+            app.wait()
+            fake.wait()
+    return {
+        "benchmark": "batch_generate",
+        "items": items,
+        "fake_llm_latency_ms": latency_ms,
+        "individual_seconds": round(individual, 3),
+        "individual_drafts_per_minute": round(items / individual * 60, 2),
+        "batch_seconds": round(batch, 3),
+        "batch_drafts_per_minute": job["drafts_per_minute"],
+        "batch_retrievals": job["retrievals"],
+        "batch_failed": job["failed"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=800.0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.items, args.latency_ms), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Chunking: fixed 1000-character splits versus the structure-aware legal chunker.
+
+Chunks the bundled sample petitions plus synthetic petitions (numbered facts,
+GROUNDS with sub-headings and citations, PRAYER, VERIFICATION) with both the
+RecursiveCharacterTextSplitter ingestion used before and legal_chunker.
+Reports chunk count, characters and estimated tokens/cost to embed, chunking
+throughput, how many numbered paragraphs end up cut across chunks, and
+recall@k: the query is a paragraph sentence with a few words dropped, and it
+is a hit when a top-k chunk (hashing embeddings, cosine) contains the
+whole sentence.
+
+    python -m benchmarks.bench_chunker --docs 200
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from benchmarks.common import HashingEmbeddings, sample_texts
+from benchmarks.corpus import synthetic_petition
+from app.services.legal_chunker import _SENTENCE_END_RE, iter_blocks, iter_chunks
+
+# text-embedding-3-small list price, USD per million tokens
+COST_PER_MILLION_TOKENS = 0.02
+
+
+def fixed_chunks(text: str):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100, add_start_index=True)
+    return [d.page_content for d in splitter.create_documents([text])]
+
+
+def legal_chunks(text: str):
+    return [c.text for c in iter_chunks([text])]
+
+
+def _queries(rng: random.Random, doc_index: int, text: str, per_doc: int):
+    """(doc, sentence, perturbed query) triples from numbered paragraphs"""
+    sentences = []
+    for block in iter_blocks([text]):
+        if block.kind == "paragraph" and block.number:
+            sentences += [s for s in _SENTENCE_END_RE.split(block.text) if len(s.split()) >= 8]
+    out = []
+    for sentence in rng.sample(sentences, min(per_doc, len(sentences))):
+        words = sentence.split()
+        for _ in range(max(1, len(words) // 6)):
+            words.pop(rng.randrange(len(words)))
+        out.append((doc_index, sentence, " ".join(words)))
+    return out
+
+
+def _evaluate(name: str, chunker, docs, queries, k: int) -> dict:
+    start = time.perf_counter()
+    chunks = [(i, c) for i, text in enumerate(docs) for c in chunker(text)]
+    seconds = time.perf_counter() - start
+    chars = sum(len(c) for _, c in chunks)
+
+    # Numbered paragraphs not contained whole in any one chunk
+    split_paragraphs = total_paragraphs = 0
+    by_doc = {}
+    for i, c in chunks:
+        by_doc.setdefault(i, []).append(c)
+    for i, text in enumerate(docs):
+        for block in iter_blocks([text]):
+            if block.kind == "paragraph" and block.number:
+                total_paragraphs += 1
+                split_paragraphs += not any(block.text in c for c in by_doc[i])
+
+    embeddings = HashingEmbeddings()
+    matrix = np.array(embeddings.embed_documents([c for _, c in chunks]), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-9
+    hits = 0
+    for doc_index, sentence, query in queries:
+        q = np.array(embeddings.embed_query(query), dtype=np.float32)
+        top = np.argsort(-(matrix @ q))[:k]
+        hits += any(chunks[j][0] == doc_index and sentence in chunks[j][1] for j in top)
+
+    tokens = chars / 4
+    return {
+        "chunker": name,
+        "chunks": len(chunks),
+        "mean_chunk_chars": round(chars / len(chunks), 1),
+        "chars_embedded": chars,
+        "est_tokens_embedded": int(tokens),
+        "est_embedding_cost_usd": round(tokens / 1e6 * COST_PER_MILLION_TOKENS, 6),
+        "chunking_seconds": round(seconds, 4),
+        "chunking_mb_per_second": round(sum(map(len, docs)) / 1e6 / seconds, 2) if seconds else 0.0,
+        "numbered_paragraphs_split": split_paragraphs,
+        "numbered_paragraphs": total_paragraphs,
+        f"recall_at_{k}": round(hits / len(queries), 4) if queries else 0.0,
+    }
+
+
+def run(docs: int = 200, queries_per_doc: int = 3, k: int = 5, seed: int = 7) -> dict:
+    texts = list(sample_texts().values()) + [synthetic_petition(seed + i) for i in range(docs)]
+    rng = random.Random(seed)
+    queries = [q for i, text in enumerate(texts) for q in _queries(rng, i, text, queries_per_doc)]
+    fixed = _evaluate("recursive_1000_100", fixed_chunks, texts, queries, k)
+    legal = _evaluate("legal_chunker", legal_chunks, texts, queries, k)
+    return {
+        "benchmark": "chunker",
+        "documents": len(texts),
+        "corpus_chars": sum(map(len, texts)),
+        "queries": len(queries),
+        "results": [fixed, legal],
+        "chunk_reduction": round(1 - legal["chunks"] / fixed["chunks"], 4),
+        "embedding_cost_reduction": round(1 - legal["chars_embedded"] / fixed["chars_embedded"], 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200, help="synthetic petitions besides the samples")
+    parser.add_argument("--queries-per-doc", type=int, default=3)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(run(args.docs, args.queries_per_doc, args.k, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
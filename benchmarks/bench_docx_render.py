@@ -0,0 +1,100 @@
+"""
+DOCX render time for 2k- and 20k-word drafts.
+
+Compares the original exporter (configure a fresh Document per call, format
+every paragraph through python-docx, save to temp/petition.docx and read the
+file back for the response) with the in-memory renderer (copy of a
+pre-built template, shared paragraph properties, plain text written
+straight into the run, bytes returned from a BytesIO).
+
+    python -m benchmarks.bench_docx_render --rounds 20
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from docx import Document
+from docx.shared import Inches, Pt
+
+from benchmarks.common import latency_summary
+from utils.doc_exporter import render_docx
+
+WORDS = (
+    "the petitioner respectfully submits that impugned order dated passed by "
+    "respondent authority is arbitrary illegal and violative of article 14 21 "
+    "constitution of india hon'ble court may be pleased to quash set aside"
+).split()
+
+
+def synthetic_draft(words: int, seed: int = 0) -> str:
+    """Numbered paragraphs of 30-90 words separated by blank lines"""
+    rng = random.Random(seed)
+    paragraphs, count = [], 0
+    while count < words:
+        n = min(rng.randint(30, 90), words - count)
+        paragraphs.append(f"{len(paragraphs) + 1}. " + " ".join(rng.choice(WORDS) for _ in range(n)))
+        count += n
+    return "\n\n".join(paragraphs)
+
+
+def legacy_render(text: str, directory: str) -> bytes:
+    """The exporter as it was: per-call setup, per-paragraph formatting, disk round trip"""
+    doc = Document()
+    for section in doc.sections:
+        section.top_margin = Inches(1)
+        section.bottom_margin = Inches(1)
+        section.left_margin = Inches(1)
+        section.right_margin = Inches(1)
+    style = doc.styles["Normal"]
+    style.font.name = "Times New Roman"
+    style.font.size = Pt(12)
+    for line in text.split("\n"):
+        if line.strip() == "":
+            doc.add_paragraph()
+            continue
+        p = doc.add_paragraph(line.strip())
+        p.paragraph_format.first_line_indent = Inches(0.25)
+        p.paragraph_format.space_after = Pt(8)
+    path = os.path.join(directory, "petition.docx")
+    doc.save(path)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _time(func, rounds: int):
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies)
+
+
+def run(sizes=(2000, 20000), rounds: int = 20) -> dict:
+    results = {}
+    render_docx("warm up")  # builds the template once, as the first request would
+    with tempfile.TemporaryDirectory() as tmp:
+        for words in sizes:
+            text = synthetic_draft(words)
+            results[f"{words}_words"] = {
+                "legacy_to_disk": _time(lambda: legacy_render(text, tmp), rounds),
+                "in_memory": _time(lambda: render_docx(text), rounds),
+                "docx_bytes": len(render_docx(text)),
+            }
+    return {"benchmark": "docx_render", "rounds": rounds, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--sizes", default="2000,20000", help="comma-separated draft sizes in words")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    print(json.dumps(run(sizes, args.rounds), indent=2))
+
+
+if __name__ == "__main__":
+    main()
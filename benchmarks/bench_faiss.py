@@ -0,0 +1,171 @@
+"""
+Chroma vs the FAISS store (VECTOR_STORE=faiss) at KB scale: build time, disk, memory, recall, latency.
+
+Synthetic clustered unit vectors stand in for chunk embeddings (cosine
+neighbourhoods like real text, without an embeddings API). Every store is
+built in the same way ingestion writes it, in upsert batches, then opened in
+a fresh process that runs the queries, so the resident memory reported is
+what a freshly started worker pays: RssAnon is its private heap, RssFile the
+mapped pages it touched (shared with other workers through the page cache).
+Recall@k is measured against exact search over the raw vectors.
+
+    python -m benchmarks.bench_faiss --vectors 1000000 --dim 256
+    python -m benchmarks.bench_faiss --vectors 100000 --indexes IVF1024,SQ8 HNSW32,SQ8 --no-chroma
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.faiss_store import FAISS_EF_SEARCH, FAISS_NPROBE, FAISS_SEGMENT_SIZE, FaissCollection
+from benchmarks.common import latency_summary
+
+BLOCK = 10_000
+
+
+def _block(number: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Vectors [number * BLOCK, (number + 1) * BLOCK), regenerated identically on every call"""
+    centers = np.random.default_rng(seed).standard_normal((clusters, dim)).astype(np.float32)
+    rng = np.random.default_rng(seed + 1 + number)
+    vectors = centers[rng.integers(0, clusters, BLOCK)] + 0.6 * rng.standard_normal((BLOCK, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _iter_vectors(count: int, dim: int, clusters: int, seed: int):
+    for number in range((count + BLOCK - 1) // BLOCK):
+        block = _block(number, dim, clusters, seed)
+        yield number * BLOCK, block[:count - number * BLOCK]
+
+
+def _queries(count: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Perturbed corpus vectors, like a query paraphrasing a stored passage"""
+    base = _block(0, dim, clusters, seed)[:count]
+    noisy = base + 0.3 / np.sqrt(dim) * np.random.default_rng(seed - 1).standard_normal(base.shape).astype(np.float32)
+    return noisy / np.linalg.norm(noisy, axis=1, keepdims=True)
+
+
+def _exact(queries: np.ndarray, count: int, dim: int, clusters: int, seed: int, k: int) -> list:
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), k), dtype=np.int64)
+    for start, block in _iter_vectors(count, dim, clusters, seed):
+        scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+        ids = np.concatenate([best_ids, np.broadcast_to(np.arange(start, start + len(block)), (len(queries), len(block)))], axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+    return [set(map(str, row)) for row in best_ids]
+
+
+def _metadata(i: int) -> dict:
+    return {"source": f"doc-{i // 20}.pdf", "doc_id": f"doc-{i // 20}", "draft_type": "writ petition"}
+
+
+def _open(kind: str, path: str):
+    if kind == "chroma":
+        import chromadb
+
+        return chromadb.PersistentClient(path=path).get_or_create_collection(
+            "permanent_kb", metadata={"hnsw:space": "cosine"}
+        )
+    return FaissCollection(path, index_factory=kind)
+
+
+def _build(kind: str, path: str, count: int, dim: int, clusters: int, seed: int, batch: int) -> dict:
+    collection = _open(kind, path)
+    began = time.perf_counter()
+    for start, block in _iter_vectors(count, dim, clusters, seed):
+        for offset in range(0, len(block), batch):
+            ids = range(start + offset, start + min(offset + batch, len(block)))
+            collection.upsert(
+                ids=[str(i) for i in ids],
+                embeddings=block[offset:offset + batch].tolist() if kind == "chroma" else block[offset:offset + batch],
+                documents=[f"chunk {i}" for i in ids],
+                metadatas=[_metadata(i) for i in ids],
+            )
+    seconds = time.perf_counter() - began
+    disk = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+    return {"build_seconds": round(seconds, 2), "vectors_per_second": round(count / seconds, 1),
+            "disk_mb": round(disk / 2**20, 1)}
+
+
+def _rss() -> dict:
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                fields[key] = round(int(value.split()[0]) / 1024, 1)
+    return {"rss_mb": fields.get("VmRSS"), "rss_anon_mb": fields.get("RssAnon"), "rss_file_mb": fields.get("RssFile")}
+
+
+def _measure(kind: str, path: str, queries: np.ndarray, truth: list, k: int, results) -> None:
+    """Runs in a fresh process: open the store, query it, report memory"""
+    began = time.perf_counter()
+    collection = _open(kind, path)
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=k, include=[])
+    opened = time.perf_counter() - began
+    latencies, recall = [], 0.0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        res = collection.query(query_embeddings=[query.tolist()], n_results=k, include=["documents", "metadatas", "distances"])
+        latencies.append(time.perf_counter() - start)
+        recall += len(expected & set(res["ids"][0])) / k
+    row = {"open_seconds": round(opened, 2), f"recall_at_{k}": round(recall / len(truth), 4)}
+    row.update(latency_summary(latencies))
+    row.update(_rss())
+    results.put(row)
+
+
+def run(vectors: int = 1_000_000, dim: int = 256, indexes=("IVF1024,SQ8", "IVF1024,PQ32", "HNSW32,SQ8"), chroma: bool = True,
+        queries: int = 200, k: int = 10, clusters: int = 1000, batch: int = 5000, seed: int = 7) -> dict:
+    query_vectors = _queries(queries, dim, clusters, seed)
+    truth = _exact(query_vectors, vectors, dim, clusters, seed, k)
+    kinds = (["chroma"] if chroma else []) + list(indexes)
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in kinds:
+            path = os.path.join(tmp, kind.replace(",", "_"))
+            row = {"store": kind if kind == "chroma" else f"faiss {kind}"}
+            row.update(_build(kind, path, vectors, dim, clusters, seed, batch))
+            results = context.Queue()
+            child = context.Process(target=_measure, args=(kind, path, query_vectors, truth, k, results))
+            child.start()
+            row.update(results.get())
+            child.join()
+            rows.append(row)
+    return {
+        "benchmark": "faiss",
+        "vectors": vectors,
+        "dim": dim,
+        "queries": queries,
+        "k": k,
+        "segment_size": FAISS_SEGMENT_SIZE,
+        "nprobe": FAISS_NPROBE,
+        "ef_search": FAISS_EF_SEARCH,
+        "results": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--indexes", nargs="+", default=["IVF1024,SQ8", "IVF1024,PQ32", "HNSW32,SQ8"],
+                        help="FAISS index factory strings to compare")
+    parser.add_argument("--no-chroma", action="store_true", help="skip the Chroma baseline")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=5000, help="vectors per upsert")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(run(args.vectors, args.dim, args.indexes, not args.no_chroma, args.queries, args.k,
+                         batch=args.batch, seed=args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
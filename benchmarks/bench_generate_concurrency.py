@@ -0,0 +1,116 @@
+"""
+Load test: N concurrent /generate calls against a local fake OpenAI server.
+
+Starts the fake OpenAI server and the app (uvicorn, single worker) as
+subprocesses, fires N concurrent requests and reports p50/p99 latency and
+throughput. With a blocking handler the p99 grows linearly with N (requests
+are served one after another); with the async path it stays close to the
+injected LLM latency.
+
+    python -m benchmarks.bench_generate_concurrency --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import (
+    REPO_ROOT,
+    fake_openai_env,
+    free_port,
+    latency_summary,
+    start_fake_openai,
+    wait_until_up,
+)
+
+FORM = {
+    "draft_type": "writ_petition",
+    "petitioner": "A. Kumar",
+    "respondent": "State of Karnataka",
+    "court_name": "HIGH COURT OF KARNATAKA",
+    "jurisdiction": "Bengaluru",
+    "case_type": "WRIT PETITION",
+    "key_dates": "01-01-2024, 15-02-2024",
+    "relief_sought": "Quash the impugned order",
+    "legal_articles": "Article 14, Article 226",
+    "rules_to_follow": "",
+    "case_summary": "The petitioner's licence was cancelled without a hearing.",
+    "download": "false",
+}
+
+
+async def _fire(client: httpx.AsyncClient, url: str, idx: int) -> float:
+    form = dict(FORM, petitioner=f"A. Kumar {idx}")
+    start = time.perf_counter()
+    res = await client.post(url, data=form)
+    res.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def _load(url: str, concurrency: int, rounds: int):
+    latencies = []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=600.0, limits=limits) as client:
+        start = time.perf_counter()
+        for r in range(rounds):
+            latencies.extend(
+                await asyncio.gather(
+                    *(_fire(client, url, r * concurrency + i) for i in range(concurrency))
+                )
+            )
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def run(concurrency: int = 50, rounds: int = 1, latency_ms: float = 800.0) -> dict:
+    fake_port, app_port = free_port(), free_port()
+    fake = start_fake_openai(fake_port, latency_ms)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = fake_openai_env(fake_port, {
+            "KB_STORE_PATH": f"{tmp}/kb_store",
+            "TEMP_KB_PATH": f"{tmp}/temp_kb",
+            "EMBEDDING_CACHE_PATH": f"{tmp}/embeddings.sqlite3",
+            # Measure the full pipeline, not cached drafts
+            "RESPONSE_CACHE": "0",
+        })
+        app = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--port", str(app_port), "--log-level", "warning"],
+            cwd=REPO_ROOT, env=env,
+        )
+        try:
+            wait_until_up(f"http://127.0.0.1:{app_port}/docs")
+            latencies, elapsed = asyncio.run(
+                _load(f"http://127.0.0.1:{app_port}/generate", concurrency, rounds)
+            )
+        finally:
+            app.terminate()
+            fake.terminate()
+            app.wait()
+            fake.wait()
+    result = {
+        "benchmark": "generate_concurrency",
+        "concurrency": concurrency,
+        "fake_llm_latency_ms": latency_ms,
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+    }
+    result.update(latency_summary(latencies))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=800.0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.concurrency, args.rounds, args.latency_ms), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Retrieval quality and latency: vector-only vs BM25-only vs hybrid (RRF).
+
+Builds a permanent KB from sample_petitions/ (optionally replicated with
+per-copy party names to grow it) and issues exact-token queries - article
+and section numbers, case numbers, names, dates - drawn from known chunks.
+A query counts as a hit when its source chunk is in the top-k.
+
+The default embeddings are the deterministic hashing fake, which is itself
+bag-of-words, so vector-only numbers here flatter dense retrieval; pass
+--openai to use the real embeddings API (network and API key required).
+
+    python -m benchmarks.bench_hybrid_retrieval --copies 20
+"""
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import time
+
+from benchmarks.common import HashingEmbeddings, latency_summary, sample_texts
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+import app.services.rag_service as rag  # noqa: E402
+from app.services.retrieval import chunk_hash  # noqa: E402
+
+_EXACT_RE = re.compile(
+    r"(?:Articles?|Sections?|Order|Rule)\s+\d+[A-Z]?|No\.\s*\d+|\b\d{1,2}(?:st|nd|rd|th)\s+\w+\s+\d{4}|\b[A-Z]{3,}(?:\s+[A-Z]{3,})+"
+)
+
+
+def _corpus(copies: int):
+    docs = []
+    for name, text in sample_texts().items():
+        for c in range(copies):
+            # Distinct parties per copy so copies are not identical chunks
+            docs.append({
+                "source": f"{name}-{c}",
+                "text": f"CLIENT FILE {c} PARTY{c}\n{text}",
+                "draft_type": name,
+            })
+    return docs
+
+
+def _queries(svc, n: int, seed: int):
+    rng = random.Random(seed)
+    svc.refresh_shards(force=True)
+    documents = [text for store in svc.permanent_stores() for text in store._collection.get(include=["documents"])["documents"]]
+    candidates = []
+    for text in documents:
+        exact = _EXACT_RE.findall(text)
+        if len(exact) >= 2:
+            candidates.append((text, exact))
+    rng.shuffle(candidates)
+    queries = []
+    for text, exact in candidates[:n]:
+        words = [w for w in re.findall(r"[a-z]{5,}", text.lower())]
+        query = " ".join(rng.sample(exact, min(3, len(exact))) + rng.sample(words, min(2, len(words))))
+        queries.append((query, chunk_hash(text)))
+    return queries
+
+
+def _evaluate(svc, queries, k: int, hybrid: bool, vector: bool):
+    rag.HYBRID_RETRIEVAL = hybrid
+    hits, rr, latencies = 0, 0.0, []
+    for query, target in queries:
+        start = time.perf_counter()
+        if vector:
+            results = svc.retrieve_context(query, top_k=k)
+        else:
+            results = svc.get_lexical_index().search(query, k)
+        latencies.append(time.perf_counter() - start)
+        ranks = [i for i, r in enumerate(results, start=1) if chunk_hash(r["text"]) == target]
+        if ranks:
+            hits += 1
+            rr += 1.0 / ranks[0]
+    result = {"recall_at_k": round(hits / len(queries), 3), "mrr": round(rr / len(queries), 3)}
+    result.update(latency_summary(latencies))
+    return result
+
+
+def run(copies: int = 20, queries: int = 200, k: int = 5, openai: bool = False, seed: int = 7) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tmp, "emb.sqlite3")
+        svc = rag.RAGService()
+        svc.permanent_db_path = os.path.join(tmp, "kb")
+        svc.temp_db_path = os.path.join(tmp, "temp")
+        if not openai:
+            svc.embeddings = HashingEmbeddings()
+        docs = _corpus(copies)
+        start = time.perf_counter()
+        svc.ingest_documents(docs, permanent=True)
+        ingest_s = time.perf_counter() - start
+        qs = _queries(svc, queries, seed)
+        return {
+            "benchmark": "hybrid_retrieval",
+            "embeddings": "openai" if openai else "hashing-fake",
+            "documents": len(docs),
+            "chunks": svc.permanent_count(),
+            "queries": len(qs),
+            "k": k,
+            "ingest_seconds": round(ingest_s, 2),
+            "vector_only": _evaluate(svc, qs, k, hybrid=False, vector=True),
+            "bm25_only": _evaluate(svc, qs, k, hybrid=False, vector=False),
+            "hybrid_rrf": _evaluate(svc, qs, k, hybrid=True, vector=True),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--openai", action="store_true", help="use real OpenAI embeddings")
+    args = parser.parse_args()
+    print(json.dumps(run(args.copies, args.queries, args.k, args.openai), indent=2))
+
+
+if __name__ == "__main__":
+    main()
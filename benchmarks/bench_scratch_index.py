@@ -0,0 +1,85 @@
+"""
+Retrieval latency as request count grows: shared temp_kb vs per-request index.
+
+Before, every /generate call with uploads wrote them into one persistent
+Chroma collection that was never cleared, so each later query searched
+everything ever uploaded. Now each request builds a ScratchIndex from its own
+uploads and drops it. This simulates N requests with the same upload volume
+and reports query latency at several points along the way.
+
+    python -m benchmarks.bench_scratch_index --requests 300
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.common import HashingEmbeddings, latency_summary, sample_texts
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+from app.services.rag_service import RAGService  # noqa: E402
+
+
+def _uploads(texts, request_no: int):
+    # Each request uploads every sample with a unique header, as different
+    # clients' notices would be
+    return [
+        {"source": f"req{request_no}-{name}.txt", "text": f"Client {request_no}\n{text}"}
+        for name, text in texts.items()
+    ]
+
+
+def run(requests: int = 300, checkpoints=(1, 10, 50, 100, 200, 300)) -> dict:
+    texts = sample_texts()
+    query = "petition challenging cancellation of licence without hearing Article 226"
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tmp, "emb.sqlite3")
+        svc = RAGService()
+        svc.temp_db_path = os.path.join(tmp, "temp_kb")
+        svc.embeddings = HashingEmbeddings()
+        query_vector = svc.embeddings.embed_query(query)
+
+        shared, scratch = {}, {}
+        shared_lat, scratch_lat = [], []
+        for n in range(1, requests + 1):
+            docs = _uploads(texts, n)
+
+            # Old behaviour: write to the shared temp store, then search it
+            svc.ingest_documents(docs, permanent=False)
+            start = time.perf_counter()
+            svc.temp_store.similarity_search_by_vector(query_vector, k=6)
+            shared_lat.append(time.perf_counter() - start)
+
+            # New behaviour: request-local index, discarded afterwards
+            index = svc.build_scratch_index(docs)
+            start = time.perf_counter()
+            index.search(query_vector, 6)
+            scratch_lat.append(time.perf_counter() - start)
+
+            if n in checkpoints:
+                window = slice(max(0, n - 10), n)
+                shared[n] = latency_summary(shared_lat[window])["p50_ms"]
+                scratch[n] = latency_summary(scratch_lat[window])["p50_ms"]
+        temp_chunks = svc.temp_store._collection.count()
+
+    return {
+        "benchmark": "scratch_index",
+        "requests": requests,
+        "shared_temp_kb_chunks_at_end": temp_chunks,
+        "shared_temp_kb_p50_ms_by_request": shared,
+        "scratch_index_p50_ms_by_request": scratch,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+    checkpoints = sorted({1, 10, 50, 100, 200, args.requests} & set(range(1, args.requests + 1)))
+    print(json.dumps(run(args.requests, checkpoints), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+End-to-end benchmark suite over a synthetic legal corpus, fully offline.
+
+Starts the fake OpenAI server (chat and embeddings, fixed latency) and grows
+one permanent KB through each requested corpus size (see
+benchmarks.corpus: sample petitions as templates, plus judgments). At every
+size it measures ingest throughput through the async ingest path and the
+retrieval latency, both end to end (query embedding included) and for the
+store search alone. Hit rate counts a query as found when its document is
+in the top k. It then times prompt assembly and DOCX export in-process. Last,
+the app runs under uvicorn on the largest KB and /generate is loaded at the
+given concurrency.
+
+Results are written as JSON (by default to benchmarks/results/, named
+after the current commit) for benchmarks.compare to diff against another run.
+
+    python -m benchmarks.bench_suite --sizes 1000,10000 --concurrency 20
+    python -m benchmarks.compare benchmarks/results/suite-<old>.json benchmarks/results/suite-<new>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_generate_concurrency import FORM
+from benchmarks.common import (
+    REPO_ROOT,
+    fake_openai_env,
+    free_port,
+    latency_summary,
+    start_fake_openai,
+    wait_until_up,
+)
+from benchmarks.corpus import corpus_document, generated_sentences, iter_corpus
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+MAX_CORPUS_DOCUMENTS = 100_000
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def corpus_queries(size: int, count: int, seed: int):
+    """(query, draft_type, source) triples: a generated sentence of a random document, a few words dropped"""
+    rng = random.Random(seed + size)
+    queries = []
+    for index in rng.sample(range(size), min(count, size)):
+        document = corpus_document(index, seed)
+        sentences = generated_sentences(document)
+        if not sentences:
+            continue
+        words = rng.choice(sentences).split()
+        for _ in range(max(1, len(words) // 6)):
+            words.pop(rng.randrange(len(words)))
+        queries.append((" ".join(words), document.get("draft_type"), document["source"]))
+    return queries
+
+
+async def _ingest(svc, start: int, stop: int, seed: int, batch: int) -> dict:
+    documents = chunks = chars = 0
+    began = time.perf_counter()
+    docs = []
+    for doc in iter_corpus(start, stop, seed):
+        docs.append(doc)
+        if len(docs) == batch:
+            chunks += await svc.aingest_documents(docs, permanent=True)
+            documents += len(docs)
+            chars += sum(len(d["text"]) for d in docs)
+            docs = []
+    if docs:
+        chunks += await svc.aingest_documents(docs, permanent=True)
+        documents += len(docs)
+        chars += sum(len(d["text"]) for d in docs)
+    seconds = time.perf_counter() - began
+    return {
+        "documents_added": documents,
+        "chunks_added": chunks,
+        "seconds": round(seconds, 3),
+        "documents_per_second": round(documents / seconds, 2) if seconds else 0.0,
+        "chunks_per_second": round(chunks / seconds, 2) if seconds else 0.0,
+        "mb_per_second": round(chars / 1e6 / seconds, 3) if seconds else 0.0,
+    }
+
+
+async def _retrieval(svc, queries, k: int) -> dict:
+    end_to_end, search_only, hits = [], [], 0
+    for query, draft_type, source in queries:
+        start = time.perf_counter()
+        results = await svc.aretrieve_context(query, top_k=k, draft_type=draft_type)
+        end_to_end.append(time.perf_counter() - start)
+        hits += any(r.get("source") == source for r in results)
+
+        vector = await svc.get_embeddings().aembed_query(query)
+        vectors = {name: vector for name in svc._query_specs()}
+        start = time.perf_counter()
+        svc._search(query, vectors, k, draft_type)
+        search_only.append(time.perf_counter() - start)
+    return {
+        "queries": len(queries),
+        f"hit_rate_at_{k}": round(hits / len(queries), 4) if queries else 0.0,
+        "retrieve": latency_summary(end_to_end),
+        "search_only": latency_summary(search_only),
+    }
+
+
+async def _grow(svc, sizes, queries: int, k: int, seed: int, batch: int) -> list:
+    """Ingest up to each size in turn, measuring retrieval at every step (one event loop for the async clients)"""
+    by_size, loaded = [], 0
+    for size in sizes:
+        ingest = await _ingest(svc, loaded, size, seed, batch)
+        loaded = size
+        ingest["chunks_total"] = svc.permanent_count()
+        retrieval = await _retrieval(svc, corpus_queries(size, queries, seed), k)
+        by_size.append({"documents": size, "ingest": ingest, "retrieval": retrieval})
+    return by_size
+
+
+def _prompt_assembly(svc, queries, k: int) -> dict:
+    from app.services.draft_generator import build_prompt, normalize_payload
+
+    latencies, lengths = [], []
+    for query, draft_type, _ in queries:
+        payload = normalize_payload(dict(FORM, draft_type=draft_type or "writ_petition", case_summary=query))
+        retrieved = svc.retrieve_context(query, top_k=k, draft_type=draft_type)
+        start = time.perf_counter()
+        prompt = build_prompt(payload, retrieved)
+        latencies.append(time.perf_counter() - start)
+        lengths.append(len(prompt))
+    result = latency_summary(latencies)
+    result["mean_prompt_chars"] = round(sum(lengths) / len(lengths), 1) if lengths else 0.0
+    return result
+
+
+def _docx_export(count: int, seed: int) -> dict:
+    from utils.doc_exporter import render_docx
+
+    latencies, sizes = [], []
+    for document in iter_corpus(0, count, seed):
+        start = time.perf_counter()
+        sizes.append(len(render_docx(document["text"])))
+        latencies.append(time.perf_counter() - start)
+    result = latency_summary(latencies)
+    result["mean_docx_bytes"] = round(sum(sizes) / len(sizes)) if sizes else 0
+    return result
+
+
+async def generate_load(url: str, queries, concurrency: int, requests: int):
+    limits = httpx.Limits(max_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def fire(client, i):
+        nonlocal errors
+        query, draft_type, _ = queries[i % len(queries)] if queries else (FORM["case_summary"], None, None)
+        form = dict(FORM, petitioner=f"A. Kumar {i}", case_summary=query, draft_type=draft_type or "writ_petition")
+        async with semaphore:
+            start = time.perf_counter()
+            res = await client.post(url, data=form)
+            if res.status_code != 200:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    async with httpx.AsyncClient(timeout=600.0, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(fire(client, i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def _generate(env: dict, tmp: str, queries, concurrency: int, requests: int) -> dict:
+    port = free_port()
+    app_env = dict(env, EMBEDDING_CACHE_PATH=os.path.join(tmp, "app-embeddings.sqlite3"))
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=app_env,
+    )
+    try:
+        wait_until_up(f"http://127.0.0.1:{port}/docs", timeout=600)
+        latencies, errors, elapsed = asyncio.run(
+            generate_load(f"http://127.0.0.1:{port}/generate", queries, concurrency, requests)
+        )
+    finally:
+        app.terminate()
+        app.wait()
+    result = {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+    result.update(latency_summary(latencies))
+    return result
+
+
+def run(sizes=(1000,), queries: int = 100, k: int = 5, concurrency: int = 20, requests: int = 100,
+        llm_latency_ms: float = 800.0, embedding_latency_ms: float = 20.0, docx_documents: int = 50,
+        ingest_batch: int = 200, seed: int = 7) -> dict:
+    sizes = sorted(set(sizes))
+    if not sizes or sizes[0] < 1 or sizes[-1] > MAX_CORPUS_DOCUMENTS:
+        raise ValueError(f"corpus sizes must be between 1 and {MAX_CORPUS_DOCUMENTS}")
+    fake_port = free_port()
+    fake = start_fake_openai(fake_port, llm_latency_ms, embedding_latency_ms)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = fake_openai_env(fake_port, {
+                "KB_STORE_PATH": os.path.join(tmp, "kb_store"),
+                "TEMP_KB_PATH": os.path.join(tmp, "temp_kb"),
+                "EMBEDDING_CACHE_PATH": os.path.join(tmp, "embeddings.sqlite3"),
+                "TEXT_CACHE_PATH": os.path.join(tmp, "extracted_text.sqlite3"),
+                "INGEST_QUEUE_PATH": os.path.join(tmp, "ingest_queue.sqlite3"),
+                # Measure the full pipeline, not cached drafts
+                "RESPONSE_CACHE": "0",
+            })
+            # Settings are read at import, so the app is imported only now
+            os.environ.update(env)
+            from app.services.rag_service import RAGService
+
+            svc = RAGService()
+            by_size = asyncio.run(_grow(svc, sizes, queries, k, seed, ingest_batch))
+            last_queries = corpus_queries(sizes[-1], queries, seed)
+            results = {
+                "benchmark": "suite",
+                "commit": git_commit(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+                "parameters": {
+                    "sizes": sizes, "queries": queries, "k": k, "concurrency": concurrency,
+                    "requests": requests, "llm_latency_ms": llm_latency_ms,
+                    "embedding_latency_ms": embedding_latency_ms, "seed": seed,
+                },
+                "corpus": by_size,
+                "prompt_assembly": _prompt_assembly(svc, last_queries, k),
+                "docx_export": _docx_export(docx_documents, seed),
+            }
+            if requests:
+                results["generate"] = _generate(env, tmp, last_queries, concurrency, requests)
+                results["generate"]["documents"] = sizes[-1]
+            return results
+    finally:
+        fake.terminate()
+        fake.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000", help="comma-separated corpus sizes (documents, up to 100000)")
+    parser.add_argument("--queries", type=int, default=100, help="retrieval queries per size")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent /generate requests")
+    parser.add_argument("--requests", type=int, default=100, help="/generate requests in total (0 skips)")
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="fake completion latency")
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0, help="fake embedding latency")
+    parser.add_argument("--docx-documents", type=int, default=50)
+    parser.add_argument("--ingest-batch", type=int, default=200, help="documents per ingest call")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="JSON file (default: benchmarks/results/suite-<commit>.json)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = run(sizes, args.queries, args.k, args.concurrency, args.requests, args.latency_ms,
+                  args.embedding_latency_ms, args.docx_documents, args.ingest_batch, args.seed)
+    output = args.output or os.path.join(RESULTS_DIR, f"suite-{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Throughput vs worker count: /generate served by 1..N app processes sharing one Chroma server.
+
+Builds a KB from the synthetic corpus once, then for each worker count
+starts a Chroma server on it and `uvicorn --workers N` pointed at the
+server (what `python run.py --workers N` does), and drives /generate at a
+fixed concurrency. A single worker opening the store files itself is
+measured too, as the baseline the shared server has to keep up with.
+Retrieval and prompt assembly are CPU work, so with a short fake LLM
+latency throughput should grow with workers up to the number of cores.
+
+    python -m benchmarks.bench_workers --workers 1,2,4 --documents 1000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.bench_suite import corpus_queries, generate_load
+from benchmarks.common import (
+    REPO_ROOT,
+    fake_openai_env,
+    free_port,
+    latency_summary,
+    start_fake_openai,
+    wait_until_up,
+)
+from benchmarks.corpus import iter_corpus
+from run import start_chroma_server
+
+
+def _build_kb(documents: int, seed: int, batch: int = 200):
+    from app.services.rag_service import RAGService
+
+    svc = RAGService()
+    for start in range(0, documents, batch):
+        svc.ingest_documents(list(iter_corpus(start, min(start + batch, documents), seed)), permanent=True)
+    return svc.permanent_count()
+
+
+def _measure(env: dict, workers: int, shared: bool, queries, concurrency: int, requests: int) -> dict:
+    port = free_port()
+    server = None
+    if shared:
+        chroma_port = free_port()
+        server = start_chroma_server(env["KB_STORE_PATH"], chroma_port)
+        env = dict(env, CHROMA_SERVER_URL=f"http://127.0.0.1:{chroma_port}")
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env,
+    )
+    try:
+        wait_until_up(f"http://127.0.0.1:{port}/docs", timeout=600)
+        url = f"http://127.0.0.1:{port}/generate"
+        # Every worker opens its stores on startup; one round warms connections and caches
+        asyncio.run(generate_load(url, queries, concurrency, concurrency))
+        latencies, errors, elapsed = asyncio.run(generate_load(url, queries, concurrency, requests))
+    finally:
+        app.terminate()
+        app.wait()
+        if server is not None:
+            server.terminate()
+            server.wait()
+    result = {
+        "workers": workers,
+        "store": "chroma_server" if shared else "local",
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+    result.update(latency_summary(latencies))
+    return result
+
+
+def run(workers=(1, 2, 4), documents: int = 1000, concurrency: int = 32, requests: int = 200,
+        latency_ms: float = 50.0, queries: int = 100, seed: int = 7) -> dict:
+    fake_port = free_port()
+    fake = start_fake_openai(fake_port, latency_ms)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = fake_openai_env(fake_port, {
+                "KB_STORE_PATH": os.path.join(tmp, "kb_store"),
+                "TEMP_KB_PATH": os.path.join(tmp, "temp_kb"),
+                "EMBEDDING_CACHE_PATH": os.path.join(tmp, "embeddings.sqlite3"),
+                "TEXT_CACHE_PATH": os.path.join(tmp, "extracted_text.sqlite3"),
+                "INGEST_QUEUE_PATH": os.path.join(tmp, "ingest_queue.sqlite3"),
+                # Measure the full pipeline, not cached drafts
+                "RESPONSE_CACHE": "0",
+                "LOG_LEVEL": "WARNING",
+            })
+            # Settings are read at import, so the app is imported only now
+            os.environ.update(env)
+            chunks = _build_kb(documents, seed)
+            forms = corpus_queries(documents, queries, seed)
+
+            rows = [_measure(env, 1, False, forms, concurrency, requests)]
+            for count in sorted(set(workers)):
+                rows.append(_measure(env, count, True, forms, concurrency, requests))
+    finally:
+        fake.terminate()
+        fake.wait()
+    single = next((r for r in rows if r["store"] == "chroma_server" and r["workers"] == 1), rows[0])
+    for row in rows:
+        row["speedup"] = round(row["requests_per_second"] / single["requests_per_second"], 2) \
+            if single["requests_per_second"] else 0.0
+    return {
+        "benchmark": "workers",
+        "cpus": os.cpu_count(),
+        "documents": documents,
+        "chunks": chunks,
+        "concurrency": concurrency,
+        "requests": requests,
+        "llm_latency_ms": latency_ms,
+        "results": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--documents", type=int, default=1000, help="synthetic corpus size")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200, help="measured /generate requests per run")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="fake completion latency")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    workers = [int(w) for w in args.workers.split(",") if w.strip()]
+    print(json.dumps(run(workers, args.documents, args.concurrency, args.requests, args.latency_ms,
+                         seed=args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
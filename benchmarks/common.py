@@ -0,0 +1,131 @@
+# Shared helpers for the offline benchmarks
+import hashlib
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+from langchain_core.embeddings import Embeddings
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_EMBEDDING_DIM = int(os.getenv("FAKE_EMBEDDING_DIM", "256"))
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def hashing_embedding(text_or_tokens, dim: int = FAKE_EMBEDDING_DIM) -> List[float]:
+    """Deterministic bag-of-words embedding; accepts text or a list of token ids"""
+    if isinstance(text_or_tokens, str):
+        tokens: Iterable = _TOKEN_RE.findall(text_or_tokens.lower())
+    else:
+        tokens = text_or_tokens
+    vec = [0.0] * dim
+    for token in tokens:
+        digest = hashlib.blake2b(str(token).encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vec[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+class HashingEmbeddings(Embeddings):
+    """In-process LangChain embeddings backed by hashing_embedding (no network)"""
+
+    model = "fake-hashing"
+
+    def __init__(self, dim: int = FAKE_EMBEDDING_DIM):
+        self.dim = dim
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [hashing_embedding(t, self.dim) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return hashing_embedding(text, self.dim)
+
+
+def sample_texts() -> Dict[str, str]:
+    """The bundled sample petitions keyed by draft type"""
+    folder = os.path.join(REPO_ROOT, "sample_petitions")
+    texts = {}
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if os.path.isdir(path):
+            for fname in sorted(os.listdir(path)):
+                if fname.endswith(".txt"):
+                    with open(os.path.join(path, fname), encoding="utf-8") as f:
+                        texts[name] = f.read()
+    return texts
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/max of a list of latencies (seconds) reported in milliseconds"""
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 60.0):
+    """Poll a URL until it answers or the timeout expires"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def start_fake_openai(port: int, latency_ms: float, embedding_latency_ms: float = 20.0, *extra_args: str) -> subprocess.Popen:
+    """Launch the fake OpenAI server in a subprocess and wait for it"""
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_openai",
+            "--port", str(port),
+            "--latency-ms", str(latency_ms),
+            "--embedding-latency-ms", str(embedding_latency_ms),
+            *extra_args,
+        ],
+        cwd=REPO_ROOT,
+    )
+    wait_until_up(f"http://127.0.0.1:{port}/health")
+    return proc
+
+
+def fake_openai_env(port: int, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Environment pointing the OpenAI and LangChain clients at the fake server"""
+    env = dict(os.environ)
+    base_url = f"http://127.0.0.1:{port}/v1"
+    env.update({
+        "OPENAI_API_KEY": "sk-fake",
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_API_BASE": base_url,
+        "OPENAI_EMBEDDING_CHECK_CTX_LENGTH": "0",
+    })
+    env.update(extra or {})
+    return env
@@ -0,0 +1,88 @@
+"""
+Compare two benchmark result files, e.g. bench_suite runs on two commits.
+
+Every numeric value present in both files is listed with its relative
+change. Latencies (keys ending in _ms or seconds) regress when they grow,
+throughputs (per_second) and hit rates when they shrink; other values are
+shown without a verdict. Exits with status 1 when any metric regressed by
+more than the threshold, so it can gate CI.
+
+    python -m benchmarks.compare benchmarks/results/suite-<old>.json benchmarks/results/suite-<new>.json --threshold 10
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Optional
+
+
+def flatten(value, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves as {dotted.path: value}; list items of the corpus are keyed by their size"""
+    if isinstance(value, bool):
+        return {}
+    if isinstance(value, (int, float)):
+        return {prefix: float(value)}
+    items = {}
+    if isinstance(value, dict):
+        for key, child in value.items():
+            if key == "parameters":
+                continue
+            items.update(flatten(child, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(value, list):
+        for i, child in enumerate(value):
+            label = child.get("documents", i) if isinstance(child, dict) else i
+            items.update(flatten(child, f"{prefix}[{label}]"))
+    return items
+
+
+def direction(key: str) -> Optional[int]:
+    """+1 when larger is better, -1 when smaller is better, None when neither"""
+    leaf = key.rsplit(".", 1)[-1]
+    if leaf.endswith("per_second") or leaf.startswith("hit_rate"):
+        return 1
+    if leaf.endswith("_ms") or leaf.endswith("seconds") or leaf == "errors":
+        return -1
+    return None
+
+
+def compare(old: dict, new: dict, threshold: float = 10.0) -> dict:
+    before, after = flatten(old), flatten(new)
+    rows, regressions = [], []
+    for key in sorted(before.keys() & after.keys()):
+        a, b = before[key], after[key]
+        change = (b - a) / abs(a) * 100 if a else (0.0 if a == b else float("inf"))
+        sign = direction(key)
+        regressed = sign is not None and -sign * change > threshold
+        rows.append({"metric": key, "old": a, "new": b, "change_pct": round(change, 1), "regressed": regressed})
+        if regressed:
+            regressions.append(key)
+    return {"old_commit": old.get("commit"), "new_commit": new.get("commit"),
+            "threshold_pct": threshold, "rows": rows, "regressions": regressions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    parser.add_argument("--json", action="store_true", help="print the comparison as JSON")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    result = compare(old, new, args.threshold)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{result['old_commit']} -> {result['new_commit']}")
+        width = max((len(r["metric"]) for r in result["rows"]), default=0)
+        for row in result["rows"]:
+            mark = "  REGRESSION" if row["regressed"] else ""
+            print(f"{row['metric']:<{width}}  {row['old']:>12g}  {row['new']:>12g}  {row['change_pct']:>+8.1f}%{mark}")
+        print(f"\n{len(result['regressions'])} regression(s) over {args.threshold:g}%")
+    sys.exit(1 if result["regressions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
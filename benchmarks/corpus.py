@@ -0,0 +1,134 @@
+"""
+Synthetic legal corpus for the benchmarks.
+
+Petitions are the bundled sample_petitions/ with every fact and ground
+paragraph extended by generated sentences, so documents share the real
+structure (parties, numbered facts, GROUNDS, PRAYER) but differ in content.
+Judgments follow the usual shape of a reported decision (facts, issues,
+analysis with sub-headings, conclusion, order). Document i is the same
+for a given seed whatever the corpus size, so a larger corpus extends a
+smaller one.
+"""
+import random
+import re
+from typing import Dict, Iterator, List, Optional
+
+from benchmarks.common import sample_texts
+
+_WORDS = (
+    "petitioner respondent licence cancellation notice hearing order authority statutory "
+    "arbitrary discrimination livelihood tender contract payment invoice goods delivery "
+    "interest recovery limitation jurisdiction tribunal appeal review record error judgment "
+    "constitution fundamental right equality procedure natural justice compensation damages "
+    "property possession eviction tenancy lease municipal corporation department secretary"
+).split()
+_GROUNDS = ("VIOLATION OF ARTICLE 14", "VIOLATION OF ARTICLE 21", "BREACH OF NATURAL JUSTICE",
+            "ERROR APPARENT ON THE FACE OF THE RECORD", "LACK OF JURISDICTION")
+_CITATIONS = ("(2017) 10 SCC 1", "AIR 1978 SC 597", "(1981) 1 SCC 248", "Article 226", "Section 9")
+_ISSUES = ("WHETHER THE IMPUGNED ORDER IS SUSTAINABLE", "WHETHER THE SUIT IS BARRED BY LIMITATION",
+           "WHETHER NATURAL JUSTICE WAS FOLLOWED", "WHETHER THE TRIBUNAL HAD JURISDICTION",
+           "WHETHER THE CONTRACT WAS LAWFULLY TERMINATED")
+_COURTS = ("SUPREME COURT OF INDIA", "HIGH COURT OF DELHI AT NEW DELHI", "HIGH COURT OF KARNATAKA AT BENGALURU",
+           "HIGH COURT OF JUDICATURE AT BOMBAY", "HIGH COURT OF MADRAS")
+
+# A fact or ground paragraph of a template: "1. That ...", "A. VIOLATION ...:" bodies, indented text
+_TEMPLATE_PARAGRAPH_RE = re.compile(r"^(?:\d{1,3}\.\s+\S|\s{2,}\S)")
+_YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+
+
+def _term(rng: random.Random) -> str:
+    # Names, places and amounts that make real petitions distinguishable
+    return "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(rng.randint(2, 4)))
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.sample(_WORDS, rng.randint(8, 18)) + [_term(rng) for _ in range(rng.randint(2, 4))]
+    rng.shuffle(words)
+    if rng.random() < 0.3:
+        words.insert(rng.randint(1, len(words) - 1), rng.choice(_CITATIONS))
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, label: str, long: bool = False) -> str:
+    count = rng.randint(14, 24) if long else rng.randint(2, 6)
+    return f"{label} " + " ".join(_sentence(rng) for _ in range(count))
+
+
+def synthetic_petition(seed: int) -> str:
+    """A petition shaped like the samples, with randomised contents"""
+    rng = random.Random(seed)
+    lines = ["IN THE HIGH COURT OF DELHI AT NEW DELHI", f"W.P. (C) NO. {seed} OF 2024", "",
+             "IN THE MATTER OF:", f"PETITIONER {seed} ...PETITIONER", "VERSUS",
+             "UNION OF INDIA ...RESPONDENT", "", "MOST RESPECTFULLY SHEWETH:", ""]
+    for n in range(1, rng.randint(6, 14)):
+        lines += [_paragraph(rng, f"{n}.", long=rng.random() < 0.1), ""]
+    lines += ["GROUNDS", ""]
+    for letter, title in zip("ABCDE", rng.sample(_GROUNDS, rng.randint(2, 5))):
+        lines += [f"{letter}. {title}", ""]
+        for n in range(1, rng.randint(2, 5)):
+            lines += [_paragraph(rng, f"({n})"), ""]
+    lines += ["PRAYER", "", "It is, therefore, most respectfully prayed that this Court may be pleased to:", ""]
+    for letter in "abcd"[:rng.randint(2, 4)]:
+        lines += [_paragraph(rng, f"{letter})"), ""]
+    lines += ["VERIFICATION", "", _paragraph(rng, "Verified at New Delhi."), ""]
+    return "\n".join(lines)
+
+
+def templated_petition(template: str, rng: random.Random) -> str:
+    """A sample petition with fresh years and 1-4 generated sentences added to each paragraph"""
+    lines = []
+    for line in template.split("\n"):
+        if _TEMPLATE_PARAGRAPH_RE.match(line) and len(line.strip()) > 40:
+            line = line.rstrip() + " " + " ".join(_sentence(rng) for _ in range(rng.randint(1, 4)))
+        lines.append(line)
+    return _YEAR_RE.sub(lambda _: str(rng.randint(1995, 2024)), "\n".join(lines))
+
+
+def synthetic_judgment(rng: random.Random, number: int) -> str:
+    """A reported judgment: parties, facts, issues, analysis per issue, conclusion and order"""
+    year = rng.randint(1995, 2024)
+    lines = [f"IN THE {rng.choice(_COURTS)}", "", f"CIVIL APPEAL NO. {number} OF {year}", "",
+             f"{_term(rng).upper()} {_term(rng).upper()} ...APPELLANT", "VERSUS",
+             f"STATE OF {_term(rng).upper()} AND OTHERS ...RESPONDENTS", "", "JUDGMENT", ""]
+    lines += ["FACTS", ""]
+    for n in range(1, rng.randint(4, 9)):
+        lines += [_paragraph(rng, f"{n}."), ""]
+    issues = rng.sample(_ISSUES, rng.randint(1, 3))
+    lines += ["ISSUES", ""] + [f"({i}) {issue.capitalize()}." for i, issue in enumerate(issues, 1)] + [""]
+    lines += ["ANALYSIS", ""]
+    for roman, issue in zip(("I", "II", "III"), issues):
+        lines += [f"{roman}. {issue}", ""]
+        for n in range(1, rng.randint(2, 6)):
+            lines += [_paragraph(rng, f"({n})", long=rng.random() < 0.1), ""]
+    lines += ["CONCLUSION", "", _paragraph(rng, "In view of the above,"), "", "ORDER", "",
+              "The appeal is accordingly disposed of. " + _sentence(rng), ""]
+    return "\n".join(lines)
+
+
+def corpus_document(index: int, seed: int = 7, judgment_share: float = 0.3,
+                    templates: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Document number index of the corpus as an ingest payload (source, text, draft_type)"""
+    rng = random.Random(seed * 1_000_003 + index)
+    if rng.random() < judgment_share:
+        return {"source": f"synthetic/judgment-{index:06d}.txt", "text": synthetic_judgment(rng, index)}
+    templates = templates or sample_texts()
+    draft_type = rng.choice(sorted(templates))
+    return {
+        "source": f"synthetic/{draft_type}-{index:06d}.txt",
+        "text": templated_petition(templates[draft_type], rng),
+        "draft_type": draft_type,
+    }
+
+
+def iter_corpus(start: int, stop: int, seed: int = 7, judgment_share: float = 0.3) -> Iterator[Dict[str, str]]:
+    """Documents [start, stop) of the corpus, generated lazily"""
+    templates = sample_texts()
+    for index in range(start, stop):
+        yield corpus_document(index, seed, judgment_share, templates)
+
+
+def generated_sentences(document: Dict[str, str], templates: Optional[Dict[str, str]] = None) -> List[str]:
+    """Sentences of a corpus document written by the generator, not copied from a template"""
+    template = (templates or sample_texts()).get(document.get("draft_type"), "")
+    sentences = re.split(r"(?<=\.)\s+", document["text"])
+    return [s for s in sentences if len(s.split()) >= 10 and s.endswith(".") and "\n" not in s and s not in template]
@@ -0,0 +1,269 @@
+"""
+Deterministic local stand-in for the OpenAI chat and embeddings APIs and the
+Bedrock Converse API.
+
+Used by the benchmarks so the full /generate path can be exercised without
+network access or API cost. Latency is injected with asyncio.sleep, so the
+server itself never becomes the bottleneck. Completions can also fail
+(HTTP 503) or stall at configurable rates, drawn from a seeded generator, to
+exercise retries and hedging reproducibly.
+
+    python -m benchmarks.fake_openai --port 9100 --latency-ms 800 [--error-rate 0.05]
+        [--slow-rate 0.02 --slow-ms 5000] [--seed 0]
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:9100/v1, or with
+LLM_BACKEND=bedrock BEDROCK_ENDPOINT_URL=http://127.0.0.1:9100 (any AWS
+credentials).
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import random
+import re
+import struct
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.common import hashing_embedding
+
+app = FastAPI()
+app.state.latency_ms = 500.0
+app.state.embedding_latency_ms = 20.0
+app.state.error_rate = 0.0
+app.state.slow_rate = 0.0
+app.state.slow_ms = 5000.0
+app.state.rng = random.Random(0)
+
+DRAFT_TEMPLATE = """IN THE HIGH COURT
+WRIT PETITION NO. ______ OF 2025
+
+IN THE MATTER OF:
+Petitioner ................Petitioner
+-VS-
+Respondent ................Respondent
+
+SYNOPSIS
+{synopsis}
+
+FACTS OF THE CASE
+1. The petitioner is a law-abiding citizen aggrieved by the impugned action.
+2. The impugned action is arbitrary and violative of Article 14 of the Constitution.
+
+GROUNDS
+A. Because the impugned action was taken without affording a hearing.
+B. Because the respondents failed to consider relevant material.
+
+PRAYER
+It is therefore most respectfully prayed that this Hon'ble Court may be pleased to quash the impugned order.
+
+VERIFICATION
+Verified at ______ on this ___ day of ______.
+"""
+
+
+def fake_draft(prompt: str) -> str:
+    """Deterministic draft text derived from the prompt"""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return DRAFT_TEMPLATE.format(synopsis=f"Reference {digest[:16]}.")
+
+
+async def _sleep(ms: float):
+    if ms > 0:
+        await asyncio.sleep(ms / 1000.0)
+
+
+def _fault():
+    """"error", "slow" or None for the next completion, from the seeded generator"""
+    roll = app.state.rng.random()
+    if roll < app.state.error_rate:
+        return "error"
+    if roll < app.state.error_rate + app.state.slow_rate:
+        return "slow"
+    return None
+
+
+def _completion_latency(fault) -> float:
+    return app.state.latency_ms + (app.state.slow_ms if fault == "slow" else 0.0)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+def _chunk(model: str, delta: dict, finish_reason=None) -> str:
+    payload = {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def _pieces(text: str):
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+async def _stream_draft(model: str, text: str, latency_ms: float):
+    # A quarter of the latency is time-to-first-token, the rest is spread
+    # evenly over the generated pieces
+    pieces = _pieces(text)
+    await _sleep(latency_ms * 0.25)
+    per_piece = latency_ms * 0.75 / max(1, len(pieces))
+    yield _chunk(model, {"role": "assistant", "content": ""})
+    for piece in pieces:
+        await _sleep(per_piece)
+        yield _chunk(model, {"content": piece})
+    yield _chunk(model, {}, finish_reason="stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+    text = fake_draft(prompt)
+    fault = _fault()
+    if fault == "error":
+        return JSONResponse({"error": {"message": "injected failure", "type": "server_error"}}, status_code=503)
+    if body.get("stream"):
+        return StreamingResponse(
+            _stream_draft(body.get("model", "fake"), text, _completion_latency(fault)),
+            media_type="text/event-stream",
+        )
+    await _sleep(_completion_latency(fault))
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": len(text.split()),
+            "total_tokens": len(prompt.split()) + len(text.split()),
+        },
+    }
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body.get("input", [])
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    await _sleep(app.state.embedding_latency_ms)
+    data = []
+    for i, item in enumerate(inputs):
+        vector = hashing_embedding(item)
+        if body.get("encoding_format") == "base64":
+            packed = struct.pack(f"<{len(vector)}f", *vector)
+            embedding = base64.b64encode(packed).decode("ascii")
+        else:
+            embedding = vector
+        data.append({"object": "embedding", "index": i, "embedding": embedding})
+    return {
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "fake"),
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }
+
+
+def _event_message(event_type: str, payload: dict) -> bytes:
+    """One AWS event-stream message, as sent by Bedrock's converse-stream"""
+    headers = b""
+    for name, value in ((":event-type", event_type), (":content-type", "application/json"), (":message-type", "event")):
+        name_bytes, value_bytes = name.encode(), value.encode()
+        headers += struct.pack(">B", len(name_bytes)) + name_bytes
+        headers += struct.pack(">BH", 7, len(value_bytes)) + value_bytes
+    body = json.dumps(payload).encode()
+    total = 12 + len(headers) + len(body) + 4
+    prelude = struct.pack(">II", total, len(headers))
+    prelude += struct.pack(">I", binascii.crc32(prelude) & 0xFFFFFFFF)
+    message = prelude + headers + body
+    return message + struct.pack(">I", binascii.crc32(message) & 0xFFFFFFFF)
+
+
+async def _stream_converse(text: str, latency_ms: float):
+    pieces = _pieces(text)
+    await _sleep(latency_ms * 0.25)
+    per_piece = latency_ms * 0.75 / max(1, len(pieces))
+    yield _event_message("messageStart", {"role": "assistant"})
+    for piece in pieces:
+        await _sleep(per_piece)
+        yield _event_message("contentBlockDelta", {"contentBlockIndex": 0, "delta": {"text": piece}})
+    yield _event_message("contentBlockStop", {"contentBlockIndex": 0})
+    yield _event_message("messageStop", {"stopReason": "end_turn"})
+
+
+def _converse_prompt(body: dict) -> str:
+    return "\n".join(
+        part.get("text", "")
+        for message in body.get("messages", [])
+        for part in message.get("content", [])
+    )
+
+
+@app.post("/model/{model_id}/converse")
+async def converse(model_id: str, request: Request):
+    text = fake_draft(_converse_prompt(await request.json()))
+    fault = _fault()
+    if fault == "error":
+        return JSONResponse({"message": "injected failure"}, status_code=503)
+    await _sleep(_completion_latency(fault))
+    return {
+        "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+        "stopReason": "end_turn",
+        "usage": {"inputTokens": 0, "outputTokens": len(text.split()), "totalTokens": len(text.split())},
+    }
+
+
+@app.post("/model/{model_id}/converse-stream")
+async def converse_stream(model_id: str, request: Request):
+    text = fake_draft(_converse_prompt(await request.json()))
+    fault = _fault()
+    if fault == "error":
+        return JSONResponse({"message": "injected failure"}, status_code=503)
+    return StreamingResponse(
+        _stream_converse(text, _completion_latency(fault)),
+        media_type="application/vnd.amazon.eventstream",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of completions failing with 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of completions delayed by --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=5000.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    app.state.latency_ms = args.latency_ms
+    app.state.embedding_latency_ms = args.embedding_latency_ms
+    app.state.error_rate = args.error_rate
+    app.state.slow_rate = args.slow_rate
+    app.state.slow_ms = args.slow_ms
+    app.state.rng = random.Random(args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+One-off compaction of an existing ChromaDB knowledge base.
+
+Older ingests stored chunks under random IDs, so every re-ingest duplicated
+them. This script re-keys every chunk to its deterministic ID (hash of
+source, chunk offset and text), keeps one copy per ID and deletes the rest.
+Stored embeddings are reused. Chunks stored without their offset are
+re-chunked instead, split like an ingest so their IDs match those a
+re-ingest computes; only chunk texts not stored before are embedded. The
+source file is re-read when found under a --source-dir (as a relative path,
+the way ingest_corpus.py names sources); otherwise the text is reassembled
+from the chunks, which loses the whitespace between them, so a later
+re-ingest may still replace some. With CHROMA_SERVER_URL set, the
+collections on that server are compacted.
+
+    python dedupe_kb.py [--path ./kb_store] [--collection permanent_kb] [--source-dir corpus/] [--dry-run]
+"""
+
+import argparse
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from app.services.bulk_ingest import parse_path
+from app.services.embedding_backend import LEGACY_EMBEDDING_SPEC
+from app.services.lexical_index import LexicalIndex
+from app.services.rag_service import (
+    EMBEDDING_METADATA_KEY,
+    SHARD_PREFIX,
+    RAGService,
+    chunk_id,
+    document_id,
+    open_chroma_client,
+    rag_service,
+)
+
+PAGE_SIZE = 1000
+# Longest text a legacy chunk can repeat from the one before it
+MAX_OVERLAP_CHARS = 1000
+
+
+def _source(metadata: dict) -> str:
+    return metadata.get("source") or metadata.get("filename") or "unknown"
+
+
+def reassemble(texts: List[str]) -> str:
+    """Document text from its consecutive chunks, dropping the text each repeats from the previous one.
+
+    The old splitter repeated whole words or paragraphs, so an overlap must
+    start and end at whitespace; the whitespace it stripped between chunks
+    is restored as a paragraph break.
+    """
+    document = texts[0] if texts else ""
+    for text in texts[1:]:
+        overlap = 0
+        for size in range(min(len(text), len(document), MAX_OVERLAP_CHARS), 0, -1):
+            at_boundary = (size == len(text) or text[size].isspace()) and (
+                size == len(document) or document[-size - 1].isspace()
+            )
+            if at_boundary and document.endswith(text[:size]):
+                overlap = size
+                break
+        document += text[overlap:] if overlap else "\n\n" + text
+    return document
+
+
+def _source_text(source: str, source_dirs: List[str]) -> Optional[str]:
+    """Text of a source file under one of source_dirs, parsed as ingest_corpus.py does"""
+    for directory in source_dirs:
+        path = os.path.join(directory, source)
+        if os.path.isfile(path):
+            parsed = parse_path(path)
+            if "text" in parsed:
+                return parsed["text"]
+    return None
+
+
+def _rechunk(legacy: Dict[str, list], source_dirs: List[str]) -> Dict[str, tuple]:
+    """(text, metadata) by deterministic ID of the legacy chunks' sources, split as an ingest would"""
+    chunks = {}
+    for source, rows in legacy.items():
+        texts = [text for _, text, _ in rows]
+        # Every re-ingest stored the document again: its last copy starts at the last repeat of its first chunk
+        start = max(i for i, text in enumerate(texts) if text == texts[0])
+        metadata = rows[start][2]
+        doc = {
+            "source": source,
+            "text": _source_text(source, source_dirs) or reassemble(texts[start:]),
+            "draft_type": metadata.get("draft_type"),
+            "jurisdiction": metadata.get("jurisdiction"),
+        }
+        for d in RAGService.iter_split_documents([doc]):
+            chunks[chunk_id(source, d.metadata["start_index"], d.page_content)] = (d.page_content, d.metadata)
+    return chunks
+
+
+def dedupe_collection(
+    collection, dry_run: bool = False, lexical: LexicalIndex = None, embeddings=None, source_dirs: List[str] = (),
+) -> dict:
+    """Re-key a collection to deterministic chunk IDs and drop duplicates.
+
+    Legacy chunks without a start_index are re-chunked per source (read
+    from source_dirs when found there), and the chunk texts not stored
+    before are embedded with embeddings (the collection's model). When the
+    collection has a BM25 index, it is brought in line as well.
+    """
+    groups = defaultdict(list)
+    # Chunks without an offset, in stored (= ingest) order, by source
+    legacy = defaultdict(list)
+    total = collection.count()
+    for offset in range(0, total, PAGE_SIZE):
+        page = collection.get(include=["documents", "metadatas"], limit=PAGE_SIZE, offset=offset)
+        for old_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            metadata = metadata or {}
+            if "start_index" not in metadata:
+                legacy[_source(metadata)].append((old_id, text or "", metadata))
+                continue
+            new_id = chunk_id(_source(metadata), metadata["start_index"], text or "")
+            groups[new_id].append(old_id)
+
+    to_delete, to_rekey = [], []
+    for new_id, old_ids in groups.items():
+        if new_id in old_ids:
+            to_delete.extend(i for i in old_ids if i != new_id)
+        else:
+            to_rekey.append((old_ids[0], new_id))
+            to_delete.extend(old_ids[1:])
+    rechunked = {i: c for i, c in _rechunk(legacy, list(source_dirs)).items() if i not in groups}
+    legacy_ids = [old_id for rows in legacy.values() for old_id, _, _ in rows]
+
+    if not dry_run:
+        for i in range(0, len(to_rekey), PAGE_SIZE):
+            batch = dict(to_rekey[i:i + PAGE_SIZE])
+            rows = collection.get(ids=list(batch), include=["documents", "metadatas", "embeddings"])
+            metadatas = []
+            for metadata in rows["metadatas"]:
+                metadata = dict(metadata or {})
+                metadata.setdefault("source", _source(metadata))
+                metadata.setdefault("doc_id", document_id(metadata["source"]))
+                metadata.setdefault("doc_version", "legacy")
+                metadatas.append(metadata)
+            collection.upsert(
+                ids=[batch[old_id] for old_id in rows["ids"]],
+                embeddings=rows["embeddings"],
+                documents=rows["documents"],
+                metadatas=metadatas,
+            )
+            to_delete.extend(rows["ids"])
+        _store_rechunked(collection, rechunked, legacy_ids, embeddings)
+        to_delete.extend(legacy_ids)
+        for i in range(0, len(to_delete), PAGE_SIZE):
+            collection.delete(ids=to_delete[i:i + PAGE_SIZE])
+        if lexical is not None:
+            lexical.delete(to_delete)
+            lexical.rebuild_from(collection)
+
+    return {
+        "before": total,
+        "after": len(groups) + len(rechunked),
+        "duplicates_removed": total - len(groups) - len(legacy_ids),
+        "rekeyed": len(to_rekey),
+        "rechunked": len(legacy_ids),
+    }
+
+
+def _store_rechunked(collection, rechunked: Dict[str, tuple], legacy_ids: List[str], embeddings):
+    """Write re-chunked legacy text, reusing the stored vector of any chunk whose text is unchanged"""
+    vectors = {}
+    for i in range(0, len(legacy_ids), PAGE_SIZE):
+        rows = collection.get(ids=legacy_ids[i:i + PAGE_SIZE], include=["documents", "embeddings"])
+        vectors.update(zip(rows["documents"], rows["embeddings"]))
+    ids = list(rechunked)
+    for i in range(0, len(ids), PAGE_SIZE):
+        batch = ids[i:i + PAGE_SIZE]
+        texts = [rechunked[c][0] for c in batch]
+        missing = [t for t in dict.fromkeys(texts) if t not in vectors]
+        if missing:
+            embeddings = embeddings or rag_service.get_embeddings(collection.name)
+            vectors.update(zip(missing, embeddings.embed_documents(missing)))
+        collection.upsert(
+            ids=batch,
+            embeddings=[list(vectors[t]) for t in texts],
+            documents=texts,
+            metadatas=[rechunked[c][1] for c in batch],
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate a ChromaDB knowledge base")
+    parser.add_argument("--path", default=os.getenv("KB_STORE_PATH", "./kb_store"))
+    parser.add_argument("--collection", action="append", help="collection name (default: all)")
+    parser.add_argument(
+        "--source-dir", action="append", default=[],
+        help="directory the sources of chunks stored without offsets are re-read from",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="report without changing anything")
+    args = parser.parse_args()
+
+    client = open_chroma_client(args.path)
+    names = args.collection or [c.name if hasattr(c, "name") else c for c in client.list_collections()]
+    for name in names:
+        collection = client.get_collection(name)
+        lexical = None
+        if name == "permanent_kb" or name.startswith(SHARD_PREFIX):
+            lexical = LexicalIndex(
+                os.getenv("LEXICAL_INDEX_PATH", os.path.join(args.path, "lexical_index.sqlite3"))
+            )
+        # Re-chunked legacy text is embedded with the model the collection was written with
+        rag_service.collection_specs[name] = (collection.metadata or {}).get(EMBEDDING_METADATA_KEY) or LEGACY_EMBEDDING_SPEC
+        stats = dedupe_collection(
+            collection, dry_run=args.dry_run, lexical=lexical, embeddings=rag_service.get_embeddings(name),
+            source_dirs=args.source_dir,
+        )
+        prefix = "[dry run] " if args.dry_run else ""
+        print(
+            f"✓ {prefix}{name}: {stats['before']} → {stats['after']} chunks "
+            f"({stats['duplicates_removed']} duplicates removed, {stats['rekeyed']} re-keyed, "
+            f"{stats['rechunked']} re-chunked)"
+        )
+
+
+if __name__ == "__main__":
+    print("Deduplicating knowledge base...\n")
+    main()
+    print("\nDone!")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Copy the permanent ChromaDB knowledge base into the FAISS store (VECTOR_STORE=faiss).
+
+Chunks are copied with their IDs, texts, metadata and stored vectors, so
+nothing is re-embedded; the collection's embedding spec is carried over.
+Chunks already in the FAISS store are skipped, so an interrupted run can be
+restarted. Every permanent KB shard is copied (to a subdirectory of the same
+name), unless --collection picks one. The Chroma collections are left as they
+are. With CHROMA_SERVER_URL set, the collections on that server are read.
+
+    python faiss_kb.py [--path ./kb_store] [--faiss-path ./kb_store/faiss]
+"""
+
+import argparse
+import os
+import time
+
+from app.services.faiss_store import FaissCollection
+from app.services.rag_service import (
+    EMBEDDING_METADATA_KEY,
+    SHARD_DRAFT_TYPE_KEY,
+    SHARD_JURISDICTION_KEY,
+    SHARD_PREFIX,
+    open_chroma_client,
+)
+
+PAGE_SIZE = 1000
+
+
+def copy_collection(source, target: FaissCollection) -> dict:
+    """Copy every chunk of a Chroma collection that the FAISS collection lacks"""
+    carried = {
+        key: value for key, value in (source.metadata or {}).items()
+        if key in (EMBEDDING_METADATA_KEY, SHARD_DRAFT_TYPE_KEY, SHARD_JURISDICTION_KEY)
+    }
+    spec = carried.get(EMBEDDING_METADATA_KEY)
+    if carried:
+        target.modify(metadata=dict(target.metadata, **carried))
+    total = source.count()
+    start = time.perf_counter()
+    copied = 0
+    for offset in range(0, total, PAGE_SIZE):
+        page = source.get(include=["documents", "metadatas", "embeddings"], limit=PAGE_SIZE, offset=offset)
+        done = set(target.get(ids=page["ids"], include=[])["ids"])
+        rows = [
+            row for row in zip(page["ids"], page["embeddings"], page["documents"], page["metadatas"])
+            if row[0] not in done
+        ]
+        if not rows:
+            continue
+        target.upsert(
+            ids=[r[0] for r in rows],
+            embeddings=[r[1] for r in rows],
+            documents=[r[2] or "" for r in rows],
+            metadatas=[r[3] for r in rows],
+        )
+        copied += len(rows)
+        print(f"{min(offset + PAGE_SIZE, total)}/{total} chunks")
+    return {"chunks": total, "copied": copied, "spec": spec, "seconds": round(time.perf_counter() - start, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the permanent Chroma KB into the FAISS store")
+    parser.add_argument("--path", default=os.getenv("KB_STORE_PATH", "./kb_store"), help="ChromaDB directory")
+    parser.add_argument("--faiss-path", default=None, help="FAISS store directory (default: FAISS_STORE_PATH)")
+    parser.add_argument("--collection", action="append", help="collection name (default: permanent_kb and its shards)")
+    args = parser.parse_args()
+
+    faiss_path = args.faiss_path or os.getenv("FAISS_STORE_PATH", os.path.join(args.path, "faiss"))
+    client = open_chroma_client(args.path)
+    names = args.collection or [
+        name for name in (c.name if hasattr(c, "name") else c for c in client.list_collections())
+        if name == "permanent_kb" or name.startswith(SHARD_PREFIX)
+    ]
+    for name in names:
+        # Shards live next to the unsharded collection's files, as RAGService opens them
+        path = faiss_path if name == "permanent_kb" else os.path.join(faiss_path, name)
+        result = copy_collection(client.get_collection(name), FaissCollection(path, name))
+        print(
+            f"{name}: {result['copied']} of {result['chunks']} chunks copied to {path} "
+            f"in {result['seconds']}s (embedding spec {result['spec'] or 'unrecorded'})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Re-embed an existing ChromaDB knowledge base with another embedding backend.
+
+Every chunk is copied, with its ID, text and metadata, into a staging
+collection embedded with the target spec (see EMBEDDING_BACKEND). The
+original collection is then replaced. An interrupted run resumes where it
+stopped: chunks already in the staging collection are skipped, and vectors
+computed before are served from the embedding cache. Stop the app first.
+The BM25 index is keyed by chunk ID and text and stays valid. With
+CHROMA_SERVER_URL set, the collections on that server are migrated.
+
+    python reembed_kb.py --to onnx [--path ./kb_store] [--collection permanent_kb] [--dry-run]
+"""
+
+import argparse
+import os
+import time
+
+from app.services.embedding_backend import LEGACY_EMBEDDING_SPEC, create_embeddings, parse_spec
+from app.services.embedding_cache import CachedEmbeddings, get_embedding_cache
+from app.services.llm_backend import get_http_client
+from app.services.rag_service import EMBEDDING_METADATA_KEY, embedding_batches, open_chroma_client
+
+PAGE_SIZE = 1000
+STAGING_SUFFIX = "__reembed"
+
+
+def _names(client) -> list:
+    return [c.name if hasattr(c, "name") else c for c in client.list_collections()]
+
+
+def reembed_collection(client, name: str, target: str, dry_run: bool = False, force: bool = False) -> dict:
+    """Re-embed one collection with the target spec and swap it in place"""
+    staging_name = name + STAGING_SUFFIX
+    names = _names(client)
+    if name not in names and staging_name in names:
+        # Interrupted after the original was dropped: only the rename is left
+        staging = client.get_collection(staging_name)
+        if not dry_run:
+            staging.modify(name=name)
+        return {"source": target, "chunks": staging.count(), "embedded": 0, "skipped": False, "seconds": 0.0}
+
+    collection = client.get_collection(name)
+    metadata = dict(collection.metadata or {})
+    source = metadata.get(EMBEDDING_METADATA_KEY) or (LEGACY_EMBEDDING_SPEC if collection.count() else None)
+    total = collection.count()
+    if (source == target and not force) or dry_run:
+        return {"source": source, "chunks": total, "embedded": 0, "skipped": source == target, "seconds": 0.0}
+
+    staging_metadata = dict(metadata, **{EMBEDDING_METADATA_KEY: target})
+    if staging_name in names:
+        staging = client.get_collection(staging_name)
+        if (staging.metadata or {}).get(EMBEDDING_METADATA_KEY) != target:
+            # Left over from a run towards another backend
+            client.delete_collection(staging_name)
+            staging = client.create_collection(staging_name, metadata=staging_metadata)
+    else:
+        staging = client.create_collection(staging_name, metadata=staging_metadata)
+
+    embeddings = CachedEmbeddings(create_embeddings(target, get_http_client()), get_embedding_cache())
+    start = time.perf_counter()
+    embedded = 0
+    for offset in range(0, total, PAGE_SIZE):
+        page = collection.get(include=["documents", "metadatas"], limit=PAGE_SIZE, offset=offset)
+        done = set(staging.get(ids=page["ids"], include=[])["ids"])
+        rows = [
+            (chunk, text or "", meta)
+            for chunk, text, meta in zip(page["ids"], page["documents"], page["metadatas"])
+            if chunk not in done
+        ]
+        if not rows:
+            continue
+        texts = [text for _, text, _ in rows]
+        vectors = [v for batch in embedding_batches(texts) for v in embeddings.embed_documents(batch)]
+        staging.upsert(
+            ids=[chunk for chunk, _, _ in rows],
+            embeddings=vectors,
+            documents=texts,
+            metadatas=[meta for _, _, meta in rows],
+        )
+        embedded += len(rows)
+        print(f"  {name}: {min(offset + PAGE_SIZE, total)}/{total}")
+
+    if staging.count() != total:
+        raise RuntimeError(f"{staging_name} has {staging.count()} chunks, expected {total}; rerun to resume")
+    client.delete_collection(name)
+    staging.modify(name=name)
+    return {"source": source, "chunks": total, "embedded": embedded, "skipped": False,
+            "seconds": round(time.perf_counter() - start, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed a ChromaDB knowledge base with another backend")
+    parser.add_argument("--to", required=True, help='target spec, e.g. "onnx" or "openai:text-embedding-3-small"')
+    parser.add_argument("--path", default=os.getenv("KB_STORE_PATH", "./kb_store"))
+    parser.add_argument("--collection", action="append", help="collection name (default: all)")
+    parser.add_argument("--force", action="store_true", help="re-embed even when already on the target spec")
+    parser.add_argument("--dry-run", action="store_true", help="report without changing anything")
+    args = parser.parse_args()
+    parse_spec(args.to)
+
+    client = open_chroma_client(args.path)
+    # A staging collection without its original is a run interrupted before the rename
+    names = args.collection or list(dict.fromkeys(n.removesuffix(STAGING_SUFFIX) for n in _names(client)))
+    for name in names:
+        stats = reembed_collection(client, name, args.to, dry_run=args.dry_run, force=args.force)
+        prefix = "[dry run] " if args.dry_run else ""
+        if stats["skipped"]:
+            print(f"✓ {prefix}{name}: already embedded with {args.to!r} ({stats['chunks']} chunks)")
+        else:
+            print(
+                f"✓ {prefix}{name}: {stats['source']!r} → {args.to!r}, {stats['chunks']} chunks "
+                f"({stats['embedded']} embedded in {stats['seconds']}s)"
+            )
+
+
+if __name__ == "__main__":
+    print("Re-embedding knowledge base...\n")
+    main()
+    print("\nDone!")
@@ -1,4 +1,82 @@
+"""
+Start the API.
+
+By default one worker with auto-reload, the vector store opened in-process
+(development). With --workers N, N processes serve requests; since several
+processes must not write the same store files, a Chroma server is started
+on KB_STORE_PATH first and every worker connects to it. Set
+CHROMA_SERVER_URL to use a server that is already running instead.
+
+    python run.py
+    python run.py --workers 4 [--port 8000] [--chroma-port 8001]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import httpx
 import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Workers in production mode (the usual variable of uvicorn/gunicorn setups)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Port of the Chroma server started for the workers
+CHROMA_SERVER_PORT = int(os.getenv("CHROMA_SERVER_PORT", "8001"))
+
+
+def start_chroma_server(path: str, port: int, timeout: float = 60.0) -> subprocess.Popen:
+    """Run `chroma run` on the store at path, returning once it answers"""
+    os.makedirs(path, exist_ok=True)
+    # The CLI module of chromadb 1.x has no __main__ guard, so `-m` would exit at once;
+    # calling app() runs `chroma` with this interpreter's chromadb
+    server = subprocess.Popen(
+        [sys.executable, "-c", "from chromadb.cli.cli import app; app()", "run", "--path", path,
+         "--host", "127.0.0.1", "--port", str(port), "--log-path", os.path.join(path, "chroma.log")],
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Chroma server exited with status {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/v2/heartbeat", timeout=1.0).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Chroma server did not start on port {port} within {timeout:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start the drafting API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY,
+                        help="worker processes; more than one starts the shared Chroma server")
+    parser.add_argument("--chroma-port", type=int, default=CHROMA_SERVER_PORT)
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True)
+        return
+
+    server = None
+    if not os.getenv("CHROMA_SERVER_URL"):
+        server = start_chroma_server(os.getenv("KB_STORE_PATH", "./kb_store"), args.chroma_port)
+        # Read by the workers at import
+        os.environ["CHROMA_SERVER_URL"] = f"http://127.0.0.1:{args.chroma_port}"
+    try:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
 
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    main()
@@ -1,6 +1,26 @@
+import base64
+import json
+import time
 import streamlit as st
 import requests
 
+
+def iter_sse(response):
+    """Yield (event, data) pairs from a text/event-stream response"""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+
 st.title("📜 AI Legal Petition Drafter (RAG)")
 
 # Form fields
@@ -31,41 +51,81 @@ if st.button("Ingest Files"):
         files = []
         for f in uploaded_files:
             files.append(("files", (f.name, f.getvalue(), f.type)))
-        with st.spinner("Ingesting into knowledge base..."):
-            res = requests.post("http://localhost:8000/ingest", files=files)
-            if res.status_code == 200:
+        res = requests.post("http://localhost:8000/ingest", files=files)
+        if res.status_code != 202:
+            st.error(f"Ingestion failed: {res.status_code} {res.text}")
+        else:
+            # Ingestion runs in the background; poll the job for progress
+            status_url = "http://localhost:8000" + res.json()["status_url"]
+            progress = st.progress(0.0, text="Queued for ingestion...")
+            while True:
+                job = requests.get(status_url).json()
+                done = job["documents_ingested"] + job["documents_failed"]
+                progress.progress(
+                    done / max(1, job["documents"]),
+                    text=f"{job['documents_parsed']}/{job['documents']} documents parsed, "
+                         f"{job['chunks_embedded']} chunks embedded",
+                )
+                if job["status"] in ("done", "failed"):
+                    break
+                time.sleep(1)
+            for f in job["files"]:
+                if f["status"] == "failed":
+                    st.warning(f"{f['filename']}: {f['error']}")
+            if job["status"] == "done":
                 st.success("Files ingested successfully into the knowledge base!")
             else:
-                st.error(f"Ingestion failed: {res.status_code} {res.text}")
+                st.error("Ingestion failed for every file.")
 
 # Generate draft using already ingested files
 if st.button("Generate Draft"):
+    data = {
+        "draft_type": draft_type,
+        "petitioner": petitioner,
+        "respondent": respondent,
+        "court_name": court_name,
+        "jurisdiction": jurisdiction,
+        "case_type": case_type,
+        "key_dates": key_dates,
+        "relief_sought": relief,
+        "legal_articles": legal_articles,
+        "rules_to_follow": rules,
+        "case_summary": case_summary,
+        "instructions": instructions,
+    }
+
+    # Render the draft live as tokens stream in
+    preview = st.empty()
+    draft_text = ""
+    docx_bytes = None
+    missing_sections = []
+    error = None
     with st.spinner("Generating..."):
-        data = {
-            "draft_type": draft_type,
-            "petitioner": petitioner,
-            "respondent": respondent,
-            "court_name": court_name,
-            "jurisdiction": jurisdiction,
-            "case_type": case_type,
-            "key_dates": key_dates,
-            "relief_sought": relief,
-            "legal_articles": legal_articles,
-            "rules_to_follow": rules,
-            "case_summary": case_summary,
-            "instructions": instructions,
-        }
+        with requests.post(
+            "http://localhost:8000/generate/stream", data=data, stream=True
+        ) as res:
+            if res.status_code != 200:
+                error = f"{res.status_code} {res.text}"
+            else:
+                for event, payload in iter_sse(res):
+                    if event == "token":
+                        draft_text += payload["text"]
+                        preview.text(draft_text)
+                    elif event == "done":
+                        docx_bytes = base64.b64decode(payload["docx_base64"])
+                        missing_sections = (payload.get("validation") or {}).get("missing_sections", [])
+                    elif event == "error":
+                        error = payload.get("message", "unknown error")
 
-        res = requests.post("http://localhost:8000/generate", data=data)
-        if res.status_code == 200:
-            with open("petition.docx", "wb") as f:
-                f.write(res.content)
-            st.success("Draft generated successfully!")
-            st.download_button(
-                "Download Petition",
-                data=open("petition.docx", "rb"),
-                file_name="petition.docx",
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            )
-        else:
-            st.error(f"Generation failed: {res.status_code} {res.text}")
+    if docx_bytes is not None:
+        st.success("Draft generated successfully!")
+        if missing_sections:
+            st.warning("Draft is missing required sections: " + ", ".join(missing_sections))
+        st.download_button(
+            "Download Petition",
+            data=docx_bytes,
+            file_name="petition.docx",
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        )
+    else:
+        st.error(f"Generation failed: {error}")
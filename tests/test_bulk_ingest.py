@@ -0,0 +1,97 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.services import bulk_ingest  # noqa: E402
+from app.services import rag_service as rag  # noqa: E402
+from app.services.bulk_ingest import IngestManifest, ingest_corpus, iter_files  # noqa: E402
+from benchmarks.common import HashingEmbeddings  # noqa: E402
+from benchmarks.corpus import corpus_document  # noqa: E402
+
+
+class BulkIngestTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        env = mock.patch.dict(os.environ, {
+            "KB_STORE_PATH": os.path.join(self.tmp, "kb"),
+            "TEMP_KB_PATH": os.path.join(self.tmp, "temp"),
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        self.svc = rag.RAGService()
+        self.svc.embeddings = HashingEmbeddings()
+        self.svc.get_permanent_store()
+        service = mock.patch.object(bulk_ingest, "rag_service", self.svc)
+        service.start()
+        self.addCleanup(service.stop)
+
+        self.corpus = os.path.join(self.tmp, "corpus")
+        self.paths = []
+        for n in range(10):
+            folder = os.path.join(self.corpus, "writ_petition" if n % 2 else "civil_suit")
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"doc-{n:02}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(corpus_document(n)["text"])
+            self.paths.append(path)
+        with open(os.path.join(self.corpus, "notes.md"), "w") as f:
+            f.write("not ingested")
+        self.manifest = IngestManifest(os.path.join(self.tmp, "manifest.sqlite3"))
+
+    def _ingest(self, **kwargs):
+        progress = []
+        report = asyncio.run(ingest_corpus(
+            [self.corpus], self.manifest, batch_docs=3, workers=1,
+            on_progress=lambda files, chunks: progress.append(files), **kwargs,
+        ))
+        return report, progress
+
+    def test_listing_is_sorted_and_not_repeated(self):
+        expected = sorted(self.paths)
+        self.assertEqual(list(iter_files([self.corpus])), expected)
+        overlapping = [self.corpus, os.path.join(self.corpus, "civil_suit"), self.paths[1], self.corpus]
+        self.assertEqual(list(iter_files(overlapping)), expected)
+        self.assertEqual(list(iter_files([self.corpus], ["md"])), [os.path.join(self.corpus, "notes.md")])
+
+    def test_batches_are_stored_while_the_tree_is_listed(self):
+        listed, stored = [], []
+        store = self.svc.aingest_documents
+
+        def listing(*args):
+            for path in iter_files(*args):
+                listed.append(path)
+                yield path
+
+        async def record(docs, **kwargs):
+            stored.append((len(listed), len(self.manifest)))
+            return await store(docs, **kwargs)
+
+        with mock.patch.object(bulk_ingest, "iter_files", listing), \
+                mock.patch.object(self.svc, "aingest_documents", side_effect=record):
+            report, progress = self._ingest()
+        self.assertEqual((report["files"], report["ingested"], report["failed"]), (10, 10, 0))
+        self.assertEqual(progress, [3, 3, 3, 1])
+        # Listed at most one batch ahead of the one stored; each batch is checkpointed before the next
+        self.assertEqual(stored, [(6, 0), (9, 3), (10, 6), (10, 9)])
+
+        report, progress = self._ingest()
+        self.assertEqual((report["skipped"], report["ingested"]), (10, 0))
+        self.assertEqual(sum(progress), 10)
+
+    def test_changed_file_is_ingested_again(self):
+        self._ingest()
+        with open(self.paths[4], "a", encoding="utf-8") as f:
+            f.write("\n\nANNEXURE\n\nA copy of the impugned order.\n")
+        report, progress = self._ingest()
+        self.assertEqual((report["skipped"], report["ingested"]), (9, 1))
+        self.assertEqual(sum(progress), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
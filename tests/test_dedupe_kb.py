@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import dedupe_kb  # noqa: E402
+from app.services import rag_service as rag  # noqa: E402
+from benchmarks.common import HashingEmbeddings  # noqa: E402
+from benchmarks.corpus import corpus_document  # noqa: E402
+from langchain.text_splitter import RecursiveCharacterTextSplitter  # noqa: E402
+
+TEXT = "\n\n".join(
+    f"{n}. The petitioner states that the order dated {n} March is arbitrary and violates Article 14." * 3
+    for n in range(1, 30)
+)
+
+
+def legacy_chunks(text):
+    """Chunks as ingests stored them before chunk offsets were kept"""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    return [d.page_content for d in splitter.create_documents([text])]
+
+
+class LegacyRechunkTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        env = mock.patch.dict(os.environ, {
+            "KB_STORE_PATH": os.path.join(self.tmp, "kb"),
+            "TEMP_KB_PATH": os.path.join(self.tmp, "temp"),
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        # Legacy chunks go straight into the one Chroma collection, as before sharding
+        for patch in (mock.patch.object(rag, "KB_SHARDING", False), mock.patch.object(rag, "VECTOR_STORE", "chroma")):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.embeddings = HashingEmbeddings()
+        self.svc = rag.RAGService()
+        self.svc.embeddings = self.embeddings
+        self.collection = self.svc.get_permanent_store()._collection
+
+    def _store_legacy(self, source, text, copies=2):
+        chunks = legacy_chunks(text) * copies
+        self.collection.add(
+            ids=[str(uuid.uuid4()) for _ in chunks],
+            embeddings=self.embeddings.embed_documents(chunks),
+            documents=chunks,
+            metadatas=[{"source": source, "draft_type": "writ petition"} for _ in chunks],
+        )
+
+    def _assert_reingest_is_noop(self, source, text):
+        stored = set(self.collection.get(include=[])["ids"])
+        with mock.patch.object(self.embeddings, "embed_documents", wraps=self.embeddings.embed_documents) as embed:
+            self.svc.ingest_documents([{"source": source, "text": text, "draft_type": "writ petition"}], permanent=True)
+        embed.assert_not_called()
+        self.assertEqual(set(self.collection.get(include=[])["ids"]), stored)
+
+    def test_source_file_is_rechunked_to_ingest_ids(self):
+        text = corpus_document(0)["text"]
+        with open(os.path.join(self.tmp, "writ.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        self._store_legacy("writ.txt", text)
+
+        stats = dedupe_kb.dedupe_collection(self.collection, embeddings=self.embeddings, source_dirs=[self.tmp])
+        self.assertEqual(stats["rechunked"], 2 * len(legacy_chunks(text)))
+        self._assert_reingest_is_noop("writ.txt", text)
+
+    def test_text_is_reassembled_without_the_source(self):
+        self._store_legacy("writ.txt", TEXT)
+        self.assertEqual(dedupe_kb.reassemble(legacy_chunks(TEXT)), TEXT)
+
+        dedupe_kb.dedupe_collection(self.collection, embeddings=self.embeddings)
+        self._assert_reingest_is_noop("writ.txt", TEXT)
+
+
+if __name__ == "__main__":
+    unittest.main()
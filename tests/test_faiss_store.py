@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+import unittest
+
+import chromadb
+import numpy as np
+
+from app.services.faiss_store import FaissCollection
+
+DIM = 16
+
+
+def vectors(seed, n):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32).tolist()
+
+
+class FaissRoundTripTest(unittest.TestCase):
+    """Same writes to a FAISS collection and a Chroma one, read back after a reload"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        # Small segments, so the writes cross sealed files and the live segment
+        self.faiss = self._open()
+        client = chromadb.PersistentClient(path=f"{self.tmp}/chroma")
+        self.chroma = client.create_collection("permanent_kb", metadata={"hnsw:space": "cosine"})
+
+        ids = [f"chunk-{n}" for n in range(30)]
+        docs = [f"Paragraph {n} of the petition." for n in range(30)]
+        metas = [{"source": f"doc-{n % 3}.txt", "doc_version": "v1"} for n in range(30)]
+        self.vectors = vectors(0, 30)
+        self.replacement = vectors(1, 1)[0]
+        for collection in (self.faiss, self.chroma):
+            # In batches: seals a file, grows it, then starts a second one
+            for i in range(0, 30, 5):
+                collection.upsert(ids=ids[i:i + 5], embeddings=self.vectors[i:i + 5], documents=docs[i:i + 5],
+                                  metadatas=metas[i:i + 5])
+            # An existing ID gets new text, vector and metadata
+            collection.upsert(ids=["chunk-4"], embeddings=[self.replacement], documents=["Rewritten paragraph."],
+                              metadatas=[{"source": "doc-1.txt", "doc_version": "v2"}])
+            collection.delete(ids=["chunk-7", "chunk-8"])
+            collection.delete(where={"source": "doc-2.txt"})
+            collection.update(ids=["chunk-0"], metadatas=[{"source": "doc-0.txt", "doc_version": "v3"}])
+
+    def _open(self):
+        return FaissCollection(f"{self.tmp}/faiss", index_factory="Flat", segment_size=8, max_segment=16)
+
+    def _rows(self, collection, **kwargs):
+        got = collection.get(include=["documents", "metadatas"], **kwargs)
+        return sorted(zip(got["ids"], got["documents"], got["metadatas"]))
+
+    def test_reload_matches_chroma(self):
+        reloaded = self._open()
+        stats = reloaded.stats()
+        self.assertEqual((sorted(stats["sealed"].values()), stats["live_vectors"]), ([10, 20], 1))
+        self.assertEqual(reloaded.count(), self.chroma.count())
+        self.assertEqual(self._rows(reloaded), self._rows(self.chroma))
+        self.assertEqual(self._rows(reloaded, where={"source": "doc-1.txt"}),
+                         self._rows(self.chroma, where={"source": "doc-1.txt"}))
+        self.assertEqual(self._rows(reloaded, ids=["chunk-4", "chunk-7"]), [
+            ("chunk-4", "Rewritten paragraph.", {"source": "doc-1.txt", "doc_version": "v2"}),
+        ])
+
+    def test_query_after_reload_matches_chroma(self):
+        reloaded = self._open()
+        for vector in (self.vectors[5], self.vectors[7], self.replacement, vectors(2, 1)[0]):
+            mine = reloaded.query(query_embeddings=[vector], n_results=5)
+            theirs = self.chroma.query(query_embeddings=[vector], n_results=5)
+            self.assertEqual(mine["ids"][0], theirs["ids"][0])
+            np.testing.assert_allclose(mine["distances"][0], theirs["distances"][0], atol=1e-4)
+        # The replaced vector no longer answers for its ID
+        hit = reloaded.query(query_embeddings=[self.vectors[4]], n_results=1)
+        self.assertNotEqual(hit["ids"][0], ["chunk-4"])
+
+    def test_where_filter_on_query(self):
+        reloaded = self._open()
+        hits = reloaded.query(query_embeddings=[self.vectors[1]], n_results=20, where={"source": "doc-1.txt"})
+        self.assertEqual(sorted(hits["ids"][0]), sorted(self.chroma.get(where={"source": "doc-1.txt"})["ids"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.services import concurrency, ingest_queue  # noqa: E402
+from app.services import rag_service as rag  # noqa: E402
+from benchmarks.common import HashingEmbeddings  # noqa: E402
+from benchmarks.corpus import corpus_document  # noqa: E402
+
+
+async def paged(text, size=700):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+class StreamedIngestTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        env = mock.patch.dict(os.environ, {
+            "KB_STORE_PATH": os.path.join(self.tmp, "kb"),
+            "TEMP_KB_PATH": os.path.join(self.tmp, "temp"),
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        # Small batches, so a document spans several embed-and-store rounds
+        for patch in (mock.patch.object(rag, "EMBEDDING_BATCH_SIZE", 3), mock.patch.object(rag, "KB_SHARDING", True)):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.svc = rag.RAGService()
+        self.svc.embeddings = HashingEmbeddings()
+        self.doc = corpus_document(1, judgment_share=0.0)
+
+    def _stored(self):
+        store = self.svc.get_shard_store(rag.shard_name(self.doc["draft_type"]))
+        return store._collection.get(include=["metadatas"])
+
+    def test_pages_store_the_same_chunks_as_the_whole_text(self):
+        meta = {"source": "doc.txt", "draft_type": self.doc["draft_type"]}
+        self.svc.ingest_documents([dict(meta, text=self.doc["text"])], permanent=True)
+        whole = self._stored()
+        self.assertGreater(len(whole["ids"]), 3)
+
+        count = asyncio.run(self.svc.aingest_pages(meta, paged(self.doc["text"]), permanent=True))
+        streamed = self._stored()
+        self.assertEqual(count, len(whole["ids"]))
+        self.assertEqual(sorted(streamed["ids"]), sorted(whole["ids"]))
+        self.assertEqual({m["doc_version"] for m in streamed["metadatas"]}, {rag.document_version(self.doc["text"])})
+
+    def test_parse_error_keeps_the_earlier_version(self):
+        meta = {"source": "doc.txt", "draft_type": self.doc["draft_type"]}
+        asyncio.run(self.svc.aingest_pages(meta, paged(self.doc["text"]), permanent=True))
+        before = sorted(self._stored()["ids"])
+
+        async def broken():
+            yield "A different first page of the same petition. " * 40
+            raise ValueError("corrupt page")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(self.svc.aingest_pages(meta, broken(), permanent=True))
+        self.assertTrue(set(before) <= set(self._stored()["ids"]))
+
+
+    def test_more_streamed_ingests_than_io_threads_complete(self):
+        async def parsed(text):
+            # Pages come from a parser that needs the I/O pool, as aiter_path_pages does
+            async for page in paged(text):
+                yield await concurrency.run_in_io_pool(str, page)
+                await asyncio.sleep(0.01)
+
+        async def ingest_all():
+            docs = [corpus_document(i, judgment_share=0.0) for i in range(6)]
+            return await asyncio.gather(*(
+                self.svc.aingest_pages({"source": f"doc-{i}.txt", "draft_type": d["draft_type"]}, parsed(d["text"]), True)
+                for i, d in enumerate(docs)
+            ))
+
+        pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(pool.shutdown, wait=False)
+        with mock.patch.object(concurrency, "_io_pool", pool):
+            counts = asyncio.run(asyncio.wait_for(ingest_all(), 60))
+        self.assertTrue(all(counts))
+
+
+class ClaimTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.queue = ingest_queue.IngestQueue(
+            os.path.join(self.tmp, "jobs.sqlite3"), os.path.join(self.tmp, "spool")
+        )
+        self.queue.enqueue("job", [{"filename": "a.txt", "path": "a.txt", "sha256": "0"}])
+
+    def _abandon(self):
+        self.queue._conn.execute("UPDATE jobs SET heartbeat_at = 0 WHERE id = 'job'")
+
+    def test_job_fails_after_max_attempts(self):
+        for _ in range(ingest_queue.INGEST_MAX_ATTEMPTS):
+            self.assertEqual(self.queue.claim(), "job")
+            self._abandon()
+        self.assertIsNone(self.queue.claim())
+        status = self.queue.status("job")
+        self.assertEqual(status["status"], "failed")
+        self.assertEqual(status["files"][0]["status"], "failed")
+        self.assertIn("gave up", status["files"][0]["error"])
+
+    def test_requeue_on_shutdown_is_not_an_attempt(self):
+        for _ in range(ingest_queue.INGEST_MAX_ATTEMPTS + 1):
+            self.assertEqual(self.queue.claim(), "job")
+            self.queue.requeue(["job"])
+        self.assertEqual(self.queue.status("job")["status"], "queued")
+
+
+if __name__ == "__main__":
+    unittest.main()
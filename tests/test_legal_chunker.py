@@ -0,0 +1,96 @@
+import os
+import unittest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.services import legal_chunker  # noqa: E402
+from app.services.legal_chunker import iter_chunks  # noqa: E402
+from app.services.rag_service import RAGService  # noqa: E402
+from benchmarks.corpus import corpus_document  # noqa: E402
+from utils import rag as rag_utils  # noqa: E402
+
+PETITION = """IN THE HIGH COURT OF KARNATAKA
+
+BRIEF FACTS
+
+1. The petitioner holds a trade licence issued by the respondent municipality.
+
+2. By an order dated 4 March the licence was cancelled without notice.
+
+GROUNDS
+
+A. The order violates Article 14 and the principles of natural justice.
+
+B. No show cause notice was issued under Section 256 of the Act.
+
+PRAYER
+
+It is therefore prayed that this Court quash the impugned order.
+"""
+
+
+def chunk_ids(text, source="doc.txt"):
+    return [RAGService._chunk_id(d) for d in RAGService.iter_split_documents([{"source": source, "text": text}])]
+
+
+class LegalChunkerTest(unittest.TestCase):
+    def test_sections_start_chunks(self):
+        chunks = list(iter_chunks([PETITION], max_chars=1100, min_chars=0))
+        self.assertEqual(
+            [(c.section, c.text.split("\n")[0]) for c in chunks],
+            [
+                (None, "IN THE HIGH COURT OF KARNATAKA"),
+                ("BRIEF FACTS", "BRIEF FACTS"),
+                ("GROUNDS", "GROUNDS"),
+                ("PRAYER", "PRAYER"),
+            ],
+        )
+        self.assertEqual(chunks[1].paragraph, "1")
+        self.assertIn("Article 14", chunks[2].citations)
+
+    def test_capitalised_title_sets_the_subsection(self):
+        text = "GROUNDS\n\nON LIMITATION\n\n" + "The claim is in time. " * 20 + "\n\nON MERITS\n\n" + "The order is bad. " * 20
+        chunks = list(iter_chunks([text], max_chars=1100, min_chars=100))
+        self.assertEqual([(c.section, c.subsection) for c in chunks],
+                         [("GROUNDS", "ON LIMITATION"), ("GROUNDS", "ON MERITS")])
+
+    def test_start_index_points_into_the_source(self):
+        for index in range(20):
+            text = corpus_document(index)["text"]
+            pages = [text[i:i + 997] for i in range(0, len(text), 997)]
+            chunks = list(iter_chunks(pages))
+            for c in chunks:
+                self.assertTrue(text.startswith(c.text.split("\n")[0], c.start), (index, c.start))
+            # Page boundaries do not move chunks
+            self.assertEqual([(c.start, c.text) for c in chunks], [(c.start, c.text) for c in iter_chunks([text])])
+
+    def test_indented_paragraph_offsets_skip_the_indent(self):
+        text = "FACTS\n\n   The petitioner is aggrieved. " + "It has no remedy. " * 100
+        for c in iter_chunks([text], max_chars=400):
+            self.assertTrue(text.startswith(c.text.split("\n")[0], c.start))
+
+    def test_overlap_is_passed_through(self):
+        # One sentence longer than the chunk size is cut at spaces, repeating the overlap
+        text = " ".join(f"word{i}" for i in range(600))
+        plain = rag_utils.chunk_text(text, size=100, overlap=0)
+        overlapping = rag_utils.chunk_text(text, size=100, overlap=20)
+        self.assertEqual(plain, legal_chunker.chunk_text(text, max_chars=600, overlap=0))
+        self.assertEqual(overlapping, legal_chunker.chunk_text(text, max_chars=600, overlap=120))
+        self.assertFalse(set(plain[0].split()) & set(plain[1].split()))
+        repeated = set(overlapping[0].split()) & set(overlapping[1].split())
+        self.assertTrue(repeated)
+        self.assertLessEqual(sum(len(w) + 1 for w in repeated), 121)
+
+    def test_ids_are_stable(self):
+        text = corpus_document(3)["text"]
+        ids = chunk_ids(text)
+        self.assertEqual(ids, chunk_ids(text))
+        self.assertEqual(len(ids), len(set(ids)))
+        # Appending to the document keeps the IDs of the chunks before it
+        longer = chunk_ids(text + "\n\nANNEXURE\n\nA copy of the impugned order.\n")
+        self.assertEqual(longer[:len(ids) - 1], ids[:-1])
+        self.assertNotEqual(chunk_ids(text, source="other.txt"), ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from langchain.embeddings.base import Embeddings  # noqa: E402
+
+from app.services import rag_service as rag  # noqa: E402
+
+DISTRACTORS = [f"The respondent filed counter affidavit number {n} in the writ petition." for n in range(5)]
+RARE = "The lease deed was stamped under the Karnataka Stamp Act with a deficit duty of rupees nine hundred."
+
+
+class BlindEmbeddings(Embeddings):
+    """Puts the query next to every chunk except those mentioning "stamp", so only BM25 can find them"""
+
+    model = "fake-blind"
+
+    def embed_documents(self, texts):
+        return [[0.0, 1.0] if "stamp" in t.lower() else [1.0, 0.0] for t in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+class LexicalRetrievalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        env = mock.patch.dict(os.environ, {
+            "KB_STORE_PATH": os.path.join(self.tmp, "kb"),
+            "TEMP_KB_PATH": os.path.join(self.tmp, "temp"),
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        self.svc = rag.RAGService()
+        self.svc.embeddings = BlindEmbeddings()
+        self.svc.get_permanent_store()
+        docs = [{"source": f"counter-{n}.txt", "text": t} for n, t in enumerate(DISTRACTORS)]
+        self.svc.ingest_documents(docs + [{"source": "lease.txt", "text": RARE}], permanent=True)
+
+    def _sources(self, query):
+        return [hit["source"] for hit in self.svc.retrieve_context(query, top_k=3)]
+
+    def test_lexical_only_match_is_fused_into_the_results(self):
+        self.assertIn("lease.txt", self._sources("stamp duty deficit"))
+        with mock.patch.object(rag, "HYBRID_RETRIEVAL", False):
+            self.assertNotIn("lease.txt", self._sources("stamp duty deficit"))
+
+    def test_chunk_dropped_by_upsert_leaves_bm25(self):
+        self.svc.ingest_documents([{"source": "lease.txt", "text": "The lease was registered in time."}], permanent=True)
+        self.assertEqual(self.svc.get_lexical_index().search("stamp deficit", 5), [])
+        texts = [hit["text"] for hit in self.svc.retrieve_context("stamp duty deficit", top_k=3)]
+        self.assertFalse([t for t in texts if "Stamp" in t])
+        hits = self.svc.get_lexical_index().search("registered", 5)
+        self.assertEqual([hit["source"] for hit in hits], ["lease.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
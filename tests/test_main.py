@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs the app's lifespan in a fresh interpreter: settings are read at import
+LIFESPAN = """
+from fastapi.testclient import TestClient
+from app.main import app
+
+with TestClient(app) as client:
+    response = client.get("/healthz")
+    print(response.status_code, response.json()["warmup"].get("embeddings_ms"))
+"""
+
+
+class LifespanTest(unittest.TestCase):
+    def test_starts_without_embeddings_warmup(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                PYTHONPATH=REPO_ROOT,
+                OPENAI_API_KEY="test",
+                WARMUP_EMBEDDINGS="0",
+                KB_STORE_PATH=os.path.join(tmp, "kb"),
+                TEMP_KB_PATH=os.path.join(tmp, "temp"),
+                EMBEDDING_CACHE_PATH=os.path.join(tmp, "embeddings.sqlite3"),
+                INGEST_QUEUE_PATH=os.path.join(tmp, "ingest_jobs.sqlite3"),
+                RESPONSE_CACHE_PATH=os.path.join(tmp, "responses.sqlite3"),
+                TEXT_CACHE_PATH=os.path.join(tmp, "extracted_text.sqlite3"),
+            )
+            result = subprocess.run(
+                [sys.executable, "-c", LIFESPAN], cwd=REPO_ROOT, env=env,
+                capture_output=True, text=True, timeout=300,
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split()[-2:], ["200", "None"])
+        self.assertIn("embeddings skipped", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import re
+import unittest
+
+from app.services.prompt_budget import TokenCounter, format_chunk, pack_chunks
+
+WORDS = " ".join(f"clause{n} of the agreement binds the parties." for n in range(200))
+
+
+class WordEncoding:
+    """Stand-in for a tiktoken encoding: one token per word or run of spaces"""
+
+    def encode(self, text, disallowed_special=()):
+        return re.findall(r"\S+|\s+", text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+def counters():
+    estimate = TokenCounter("gpt-4o-mini")
+    estimate.encoding = None
+    encoded = TokenCounter("gpt-4o-mini")
+    encoded.encoding = WordEncoding()
+    found = [("chars/4", estimate), ("encoding", encoded)]
+    tiktoken = TokenCounter("gpt-4o-mini")
+    if tiktoken.exact:
+        found.append(("tiktoken", tiktoken))
+    return found
+
+
+def hits(*texts, source="doc.txt"):
+    return [{"source": f"{source}-{n}", "text": t, "score": 1.0 - n / 100} for n, t in enumerate(texts)]
+
+
+class PromptBudgetTest(unittest.TestCase):
+    def test_packed_chunks_fit_the_budget(self):
+        chunks = [WORDS[i:i + 400] for i in range(0, len(WORDS), 400)]
+        for name, counter in counters():
+            with self.subTest(counter=name):
+                for budget in (150, 300, 1000):
+                    packed = pack_chunks(hits(*chunks), budget, counter)
+                    self.assertTrue(packed)
+                    used = sum(counter.count(format_chunk(h["source"], h["text"])) + 2 for h in packed)
+                    self.assertLessEqual(used, budget)
+
+    def test_truncate_fits_the_budget(self):
+        for name, counter in counters():
+            with self.subTest(counter=name):
+                for budget in (1, 10, 250):
+                    text = counter.truncate(WORDS, budget)
+                    self.assertLessEqual(counter.count(text), budget)
+                    self.assertTrue(WORDS.startswith(text))
+                self.assertEqual(counter.truncate("short text", 100), "short text")
+                self.assertEqual(counter.truncate(WORDS, 0), "")
+
+    def test_chunk_larger_than_the_budget_is_skipped(self):
+        for name, counter in counters():
+            with self.subTest(counter=name):
+                packed = pack_chunks(hits(WORDS, "A short relevant paragraph."), 60, counter)
+                self.assertEqual([h["text"] for h in packed], ["A short relevant paragraph."])
+                self.assertEqual(pack_chunks(hits(WORDS), 60, counter), [])
+
+    def test_ranking_order_is_kept(self):
+        counter = counters()[0][1]
+        texts = [f"Paragraph {n} about the tenancy." for n in range(6)]
+        packed = pack_chunks(list(reversed(hits(*texts))), 1000, counter)
+        self.assertEqual([h["text"] for h in packed], texts)
+        tied = [{"source": f"s{n}", "text": t, "score": 0.5} for n, t in enumerate(texts)]
+        self.assertEqual([h["text"] for h in pack_chunks(tied, 1000, counter)], texts)
+
+
+if __name__ == "__main__":
+    unittest.main()
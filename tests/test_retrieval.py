@@ -0,0 +1,45 @@
+import unittest
+
+from app.services.retrieval import merge_by_space, mmr_select, reciprocal_rank_fusion
+
+
+def hit(text, score, space, embedding):
+    return {"source": text, "text": text, "score": score, "space": space, "embedding": embedding}
+
+
+class MixedSpacesTest(unittest.TestCase):
+    def test_scores_of_different_models_are_fused_by_rank(self):
+        # The second model scores everything higher; its top hit must not outrank the first model's
+        first = [hit("a", 0.5, "openai", [1.0, 0.0]), hit("b", 0.4, "openai", [0.0, 1.0])]
+        second = [hit("c", 0.95, "local", [1.0, 0.0, 0.0]), hit("d", 0.9, "local", [0.0, 1.0, 0.0])]
+        merged = merge_by_space([first, second])
+        self.assertEqual({h["text"] for h in merged[:2]}, {"a", "c"})
+        self.assertAlmostEqual(merged[0]["score"], merged[1]["score"])
+
+    def test_one_space_is_merged_by_score(self):
+        merged = merge_by_space([[hit("a", 0.5, "openai", None)], [hit("b", 0.7, "openai", None)]])
+        self.assertEqual([(h["text"], h["score"]) for h in merged], [("b", 0.7), ("a", 0.5)])
+
+    def test_mmr_compares_vectors_within_a_space_only(self):
+        hits = [
+            hit("a", 1.0, "openai", [1.0, 0.0]),
+            hit("a-again", 0.9, "openai", [1.0, 0.0]),
+            hit("c", 0.8, "local", [1.0, 0.0, 0.0]),
+        ]
+        selected = mmr_select(hits, 2, lambda_mult=0.5)
+        self.assertEqual([h["text"] for h in selected], ["a", "c"])
+
+
+class RankFusionTest(unittest.TestCase):
+    def test_chunk_ranked_by_both_lists_comes_first(self):
+        vector = [hit("a", 0.9, "openai", [1.0]), hit("b", 0.8, "openai", [0.5])]
+        lexical = [hit("b", 12.0, None, None), hit("c", 7.0, None, None)]
+        fused = reciprocal_rank_fusion(vector, lexical, k=60)
+        self.assertEqual([h["text"] for h in fused], ["b", "a", "c"])
+        self.assertAlmostEqual(fused[0]["score"], 1 / 62 + 1 / 61)
+        # The vector copy is kept, so MMR can still compare it
+        self.assertEqual(fused[0]["embedding"], [0.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from app.services.rule_engine import RuleRegistry, _heading_pattern
+
+WRIT = """draft_type: Writ Petition
+aliases: [writ]
+legal_basis: [Article 226]
+required_sections:
+  - GROUNDS
+  - [RELIEFS CLAIMED, PRAYER]
+"""
+
+DRAFT = """IN THE HIGH COURT OF KARNATAKA
+
+1. GROUNDS
+
+A. The order is arbitrary.
+
+II) Prayer
+
+It is therefore prayed that this Court quash the order.
+"""
+
+
+class HeadingPatternTest(unittest.TestCase):
+    def test_numbering_forms(self):
+        pattern = _heading_pattern(("PRAYER", "RELIEFS CLAIMED"))
+        for line in ("PRAYER", "  prayer", "1. PRAYER", "12) Prayer", "IV. PRAYER", "XII) Reliefs  Claimed",
+                     "A. PRAYER", "b) prayer", "(3) PRAYER", "(c) Prayer", "2.PRAYER"):
+            with self.subTest(line=line):
+                self.assertTrue(pattern.match(line))
+
+    def test_words_are_not_numbering(self):
+        pattern = _heading_pattern(("FACTS", "PRAYER"))
+        for line in ("Re Facts", "Re. Facts", "To) Prayer", "ab) prayer", "iv. Prayer", "ABCD. FACTS",
+                     "1234. PRAYER", "The facts", "PRAYERS", "(1 PRAYER"):
+            with self.subTest(line=line):
+                self.assertFalse(pattern.match(line))
+
+
+class RuleRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.writes = 0
+        self.rules_dir = os.path.join(self.tmp, "rules")
+        self.samples_dir = os.path.join(self.tmp, "samples")
+        os.makedirs(self.rules_dir)
+        os.makedirs(self.samples_dir)
+        self._write(self.rules_dir, "writ_petition.yaml", WRIT)
+        self._write(self.samples_dir, "civil_suit_sample.txt", "IN THE COURT OF THE CIVIL JUDGE")
+
+    def _write(self, directory, name, text):
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        # A later mtime on every write, so a rewrite within the clock resolution is still seen
+        self.writes += 1
+        stamp = time.time() + self.writes
+        os.utime(path, (stamp, stamp))
+
+    def _registry(self, reload_seconds=0):
+        return RuleRegistry(self.rules_dir, self.samples_dir, excerpt_chars=10, reload_seconds=reload_seconds).load()
+
+    def test_lookup_by_key_alias_and_word(self):
+        registry = self._registry()
+        self.assertEqual(sorted(registry.types), ["civil_suit", "writ_petition"])
+        for name in ("Writ Petition", "writ-petition", "WRIT", "Writ (Article 226)"):
+            self.assertEqual(registry.resolve(name), "writ_petition")
+        self.assertEqual(registry.resolve("Civil Suit for recovery"), "civil_suit")
+        self.assertIsNone(registry.resolve("Bail Application"))
+        self.assertEqual(registry.required_sections("writ"), ["GROUNDS", "RELIEFS CLAIMED"])
+        self.assertEqual(registry.style_excerpt("civil suit"), "IN THE COU")
+
+    def test_validate(self):
+        registry = self._registry()
+        self.assertEqual(registry.validate("writ", DRAFT),
+                         {"draft_type": "writ_petition", "valid": True, "missing_sections": []})
+        missing = registry.validate("writ", DRAFT.replace("II) Prayer", "Re. Prayer"))
+        self.assertEqual(missing["missing_sections"], ["RELIEFS CLAIMED"])
+        self.assertFalse(missing["valid"])
+        # A heading inside a long line does not count
+        long_line = "The petitioner raises the following GROUNDS " + "in support of the petition " * 3
+        self.assertEqual(registry.validate("writ", long_line)["missing_sections"], ["GROUNDS", "RELIEFS CLAIMED"])
+        # Unknown types and types without rules pass
+        self.assertTrue(registry.validate("bail application", "")["valid"])
+        self.assertTrue(registry.validate("civil suit", "")["valid"])
+
+    def test_invalid_rule_file_is_skipped(self):
+        self._write(self.rules_dir, "review_petition.yaml", "required_sections: GROUNDS\n")
+        self._write(self.rules_dir, "broken.yml", "required_sections: [GROUNDS\n")
+        self._write(self.rules_dir, "list.yaml", "- GROUNDS\n")
+        with self.assertLogs("app.services.rule_engine", "ERROR"):
+            registry = self._registry()
+        self.assertEqual(sorted(registry.types), ["civil_suit", "writ_petition"])
+        self.assertEqual(len(registry.errors), 3)
+        self.assertTrue(any("required_sections must be a list" in e for e in registry.errors))
+
+    def test_changed_files_are_reloaded(self):
+        registry = self._registry(reload_seconds=0.01)
+        self._write(self.rules_dir, "writ_petition.yaml", WRIT.replace("  - GROUNDS\n", "  - GROUNDS\n  - VERIFICATION\n"))
+        self._write(self.rules_dir, "curative_petition.yaml", "required_sections: [GROUNDS]\n")
+        os.remove(os.path.join(self.samples_dir, "civil_suit_sample.txt"))
+        time.sleep(0.02)
+        self.assertEqual(registry.required_sections("writ"), ["GROUNDS", "VERIFICATION", "RELIEFS CLAIMED"])
+        self.assertEqual(sorted(registry.types), ["curative_petition", "writ_petition"])
+        self.assertIsNone(registry.resolve("civil suit"))
+        self.assertEqual(registry.validate("curative", DRAFT)["missing_sections"], [])
+
+    def test_reload_waits_for_the_interval(self):
+        registry = self._registry(reload_seconds=3600)
+        self._write(self.rules_dir, "curative_petition.yaml", "required_sections: [GROUNDS]\n")
+        self.assertIsNone(registry.resolve("curative"))
+        disabled = self._registry(reload_seconds=0)
+        self._write(self.rules_dir, "bail_application.yaml", "required_sections: [PRAYER]\n")
+        self.assertIsNone(disabled.resolve("bail"))
+        self.assertEqual(disabled.load().resolve("bail"), "bail_application")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.services import rag_service as rag  # noqa: E402
+from app.services.bulk_ingest import draft_type_for  # noqa: E402
+from benchmarks.common import HashingEmbeddings  # noqa: E402
+
+WRIT = "The petitioner invokes Article 226 against the arbitrary cancellation of the licence."
+SUIT = "The plaintiff claims recovery of money lent under a promissory note."
+
+
+class ShardingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.env = {
+            "KB_STORE_PATH": os.path.join(self.tmp, "kb"),
+            "TEMP_KB_PATH": os.path.join(self.tmp, "temp"),
+        }
+        self.saved = {key: os.environ.get(key) for key in self.env}
+        os.environ.update(self.env)
+        sharding = mock.patch.object(rag, "KB_SHARDING", True)
+        sharding.start()
+        self.addCleanup(sharding.stop)
+        self.svc = self._service()
+
+    def tearDown(self):
+        for key, value in self.saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _service(self):
+        svc = rag.RAGService()
+        svc.embeddings = HashingEmbeddings()
+        svc.get_permanent_store()
+        return svc
+
+    def _sources(self, svc, query, **kwargs):
+        return [hit["source"] for hit in svc.retrieve_context(query, top_k=5, **kwargs)]
+
+    def test_shard_name_normalizes_spellings(self):
+        names = {rag.shard_name(v) for v in ("writ petition", "writ_petition", "Writ Petition", " WRIT-PETITION ")}
+        self.assertEqual(names, {"permanent_kb__writ_petition"})
+        self.assertEqual(rag.shard_name(None), "permanent_kb")
+        self.assertEqual(rag.shard_name("writ petition", "High Court of Karnataka"),
+                         "permanent_kb__writ_petition__high_court_of_karnataka")
+        self.assertLessEqual(len(rag.shard_name("writ petition", "x" * 80)), 63)
+
+    def test_corpus_folders_name_the_normalized_draft_type(self):
+        for folder in ("writ_petition", "Writ Petition", "writ-petition"):
+            self.assertEqual(draft_type_for(os.path.join("corpus", folder, "a.txt"), "corpus"), "writ_petition")
+        self.assertIsNone(draft_type_for(os.path.join("corpus", "a.txt"), "corpus"))
+
+    def test_stored_with_spaces_queried_with_underscore(self):
+        self.svc.ingest_documents([
+            {"source": "writ.txt", "text": WRIT, "draft_type": "writ petition"},
+            {"source": "suit.txt", "text": SUIT, "draft_type": "civil suit"},
+        ], permanent=True)
+        self.assertIn("permanent_kb__writ_petition", self.svc.shard_stores)
+        self.assertEqual(self._sources(self.svc, "Article 226 licence", draft_type="writ_petition"), ["writ.txt"])
+        self.assertEqual(self._sources(self.svc, "Article 226 licence", draft_type="civil suit"), ["suit.txt"])
+
+    def test_stored_with_underscore_queried_with_spaces(self):
+        self.svc.ingest_documents([{"source": "writ.txt", "text": WRIT, "draft_type": "writ_petition"}], permanent=True)
+        self.assertEqual(self._sources(self.svc, "Article 226 licence", draft_type="Writ Petition"), ["writ.txt"])
+        hits = self.svc.get_lexical_index().search("Article 226", 5, "writ petition")
+        self.assertEqual([hit["source"] for hit in hits], ["writ.txt"])
+
+    def test_spellings_match_without_sharding(self):
+        with mock.patch.object(rag, "KB_SHARDING", False):
+            self.svc.ingest_documents([
+                {"source": "writ.txt", "text": WRIT, "draft_type": "writ petition"},
+                {"source": "suit.txt", "text": SUIT, "draft_type": "civil_suit"},
+            ], permanent=True)
+            self.assertEqual(self.svc.shard_stores, {})
+            self.assertEqual(self._sources(self.svc, "Article 226 licence", draft_type="writ_petition"), ["writ.txt"])
+            self.assertEqual(self._sources(self.svc, "Article 226 licence", draft_type="Civil Suit"), ["suit.txt"])
+
+    def test_unfiltered_search_fans_out_to_every_shard(self):
+        self.svc.ingest_documents([
+            {"source": "writ.txt", "text": WRIT, "draft_type": "writ petition"},
+            {"source": "suit.txt", "text": SUIT, "draft_type": "civil suit"},
+        ], permanent=True)
+        self.assertEqual(set(self._sources(self.svc, "petitioner plaintiff")), {"writ.txt", "suit.txt"})
+
+    def test_jurisdiction_narrows_to_its_shard(self):
+        self.svc.ingest_documents([
+            {"source": "ka.txt", "text": WRIT, "draft_type": "writ petition", "jurisdiction": "Karnataka"},
+            {"source": "tn.txt", "text": WRIT + " Madras.", "draft_type": "writ petition", "jurisdiction": "Tamil Nadu"},
+        ], permanent=True)
+        self.assertEqual(
+            self._sources(self.svc, "Article 226", draft_type="writ_petition", jurisdiction="karnataka"), ["ka.txt"]
+        )
+        # No shard for this jurisdiction: every shard of the draft type answers
+        self.assertEqual(
+            set(self._sources(self.svc, "Article 226", draft_type="writ_petition", jurisdiction="Kerala")),
+            {"ka.txt", "tn.txt"},
+        )
+
+    def test_chunks_stored_before_sharding_are_found_and_moved(self):
+        legacy = self.svc.get_permanent_store()._collection
+        legacy.upsert(
+            ids=["legacy"], embeddings=[HashingEmbeddings().embed_query(WRIT)], documents=[WRIT],
+            metadatas=[{"source": "writ.txt", "draft_type": "writ petition", "doc_id": rag.document_id("writ.txt")}],
+        )
+        self.assertEqual(self._sources(self.svc, "Article 226", draft_type="writ_petition"), ["writ.txt"])
+
+        self.svc.ingest_documents([{"source": "writ.txt", "text": WRIT, "draft_type": "writ petition"}], permanent=True)
+        self.assertEqual(legacy.count(), 0)
+        self.assertEqual(self.svc.permanent_count(), 1)
+        self.assertEqual(self._sources(self.svc, "Article 226", draft_type="writ_petition"), ["writ.txt"])
+
+    def test_failed_vector_write_leaves_bm25_untouched(self):
+        store = self.svc.get_shard_store(rag.shard_name("writ petition"))
+        with mock.patch.object(store._collection, "upsert", side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                self.svc.ingest_documents([{"source": "writ.txt", "text": WRIT, "draft_type": "writ petition"}], permanent=True)
+        self.assertEqual(self.svc.get_lexical_index().search("Article 226", 5), [])
+
+    def test_other_process_shards_are_discovered(self):
+        self.svc.ingest_documents([{"source": "writ.txt", "text": WRIT, "draft_type": "writ petition"}], permanent=True)
+        other = self._service()
+        other.refresh_shards(force=True)
+        self.assertEqual(self._sources(other, "Article 226", draft_type="writ_petition"), ["writ.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
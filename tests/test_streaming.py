@@ -0,0 +1,92 @@
+import os
+import unittest
+from io import BytesIO
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from docx import Document  # noqa: E402
+
+from app.services.draft_generator import StreamCleaner, clean_draft_text  # noqa: E402
+from utils.doc_exporter import DocxStreamBuilder, render_docx  # noqa: E402
+
+# A completion as the model streams it: escaped newlines and Markdown markers
+RAW = (
+    "\\n**IN THE HIGH COURT OF KARNATAKA**\\n\\n"
+    "**GROUNDS**\\n\\n"
+    "A. The order is *arbitrary* and violates `Article 14`.\\n"
+    "B. No notice was issued.\\n\\n\\n"
+    "**PRAYER**\\n"
+    "It is therefore prayed that this Court quash the order.\\n\\n"
+)
+
+
+def every_split(text):
+    """The text as two SSE deltas, cut at every position"""
+    for i in range(len(text) + 1):
+        yield i, [text[:i], text[i:]]
+
+
+def stream_clean(deltas):
+    cleaner = StreamCleaner()
+    return "".join(cleaner.feed(d) for d in deltas) + cleaner.flush()
+
+
+def body_xml(doc):
+    return doc.element.body.xml
+
+
+class StreamCleanerTest(unittest.TestCase):
+    def test_split_markers_match_the_whole_text(self):
+        expected = clean_draft_text(RAW)
+        for i, deltas in every_split(RAW):
+            with self.subTest(split=i, around=RAW[max(i - 3, 0):i + 3]):
+                self.assertEqual(stream_clean(deltas), expected)
+
+    def test_escaped_newline_split_after_the_backslash(self):
+        self.assertEqual(stream_clean(["**GROUNDS**\\", "nA. The order"]), "GROUNDS\nA. The order")
+        self.assertEqual(stream_clean(["GROUNDS\\", "", "\\", "n"]), "GROUNDS\\\n")
+        # A trailing backslash with nothing after it is still emitted
+        self.assertEqual(stream_clean(["C:\\"]), "C:\\")
+
+    def test_one_character_deltas(self):
+        self.assertEqual(stream_clean(list(RAW)), clean_draft_text(RAW))
+
+
+class DocxStreamBuilderTest(unittest.TestCase):
+    def setUp(self):
+        self.text = clean_draft_text(RAW)
+        self.expected = body_xml(Document(BytesIO(render_docx(self.text))))
+
+    def _build(self, deltas):
+        builder = DocxStreamBuilder()
+        for d in deltas:
+            builder.feed(d)
+        return builder.finish()
+
+    def test_heading_split_across_deltas(self):
+        for i, deltas in every_split(self.text):
+            with self.subTest(split=i, around=self.text[max(i - 3, 0):i + 3]):
+                self.assertEqual(body_xml(self._build(deltas)), self.expected)
+
+    def test_paragraphs_and_blank_lines(self):
+        doc = self._build(["\n**GROU", "NDS\n\nA. The", " order.\n\n\n", "PRAYER\n\n"])
+        self.assertEqual([p.text for p in doc.paragraphs], ["**GROUNDS", "", "A. The order.", "", "", "PRAYER"])
+
+    def test_cleaned_stream_builds_the_rendered_document(self):
+        # The cleaner output goes straight into the builder, as in stream_petition
+        for i, deltas in every_split(RAW):
+            with self.subTest(split=i):
+                cleaner = StreamCleaner()
+                builder = DocxStreamBuilder()
+                for d in deltas:
+                    builder.feed(cleaner.feed(d))
+                builder.feed(cleaner.flush())
+                self.assertEqual(body_xml(builder.finish()), self.expected)
+
+    def test_empty_stream(self):
+        doc = self._build(["", "\n\n"])
+        self.assertEqual([p.text for p in doc.paragraphs], [""])
+
+
+if __name__ == "__main__":
+    unittest.main()
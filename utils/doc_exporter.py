@@ -1,10 +1,19 @@
 from docx import Document
 from docx.shared import Inches, Pt
 from docx.oxml.ns import qn
+from io import BytesIO
+import copy
 import os
+import threading
+from app.services.metrics import stage
 
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
 
-def export_to_docx(text: str, filename: str = "petition.docx") -> str:
+_template = None
+_template_lock = threading.Lock()
+
+
+def _build_template():
     doc = Document()
 
     # Set page margins (1 inch all around)
@@ -21,17 +30,115 @@ def export_to_docx(text: str, filename: str = "petition.docx") -> str:
     font.name = "Times New Roman"
     font.size = Pt(12)
 
-    # Apply formatting to each paragraph
-    for para in text.strip().split("\n"):
-        if para.strip() == "":
-            doc.add_paragraph()
-        else:
-            p = doc.add_paragraph(para.strip())
-            p.paragraph_format.first_line_indent = Inches(0.25)
-            p.paragraph_format.space_after = Pt(8)
+    # Paragraph properties shared by every body paragraph, copied per line
+    # instead of setting the indent and spacing through python-docx each time
+    p = doc.add_paragraph()
+    p.paragraph_format.first_line_indent = Inches(0.25)
+    p.paragraph_format.space_after = Pt(8)
+    body_ppr = p._p.pPr
+    p._p.getparent().remove(p._p)
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue(), body_ppr
+
+
+def _new_document():
+    """Open a copy of the pre-built template (margins, style) and its body paragraph properties.
+
+    The template is configured and serialized once; each document is loaded
+    from those in-memory bytes. (Deep-copying a Document object is not an
+    option: its XML and its package part would be copied separately.)
+    """
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = _build_template()
+    template_bytes, body_ppr = _template
+    return Document(BytesIO(template_bytes)), body_ppr
+
+
+def _append_text(paragraph, text: str):
+    # python-docx's run.text setter walks the string one character at a time
+    # to translate tabs and breaks; plain text can go straight into <w:t>
+    if "\t" in text or "\n" in text or "\r" in text:
+        paragraph.add_run(text)
+    else:
+        paragraph._p.add_r().add_t(text)
+
+
+class DocxStreamBuilder:
+    """Build the petition DOCX paragraph by paragraph as text arrives.
+
+    Produces the same document as export_to_docx on the concatenated text:
+    leading/trailing blank lines are dropped and interior blank lines become
+    empty paragraphs.
+    """
+
+    def __init__(self):
+        self.doc, self._body_ppr = _new_document()
+        self._pending = ""
+        self._blank_lines = 0
+        self._started = False
+
+    def feed(self, text: str):
+        """Append streamed text; every completed line becomes a paragraph"""
+        if not text:
+            return
+        *lines, self._pending = (self._pending + text).split("\n")
+        for line in lines:
+            self._add_line(line)
+
+    def _add_line(self, line: str):
+        if line.strip() == "":
+            # Defer blank lines until we know they are not trailing
+            if self._started:
+                self._blank_lines += 1
+            return
+        for _ in range(self._blank_lines):
+            self.doc.add_paragraph()
+        self._blank_lines = 0
+        self._started = True
+
+        # Apply formatting to each paragraph
+        p = self.doc.add_paragraph()
+        p._p.insert(0, copy.deepcopy(self._body_ppr))
+        _append_text(p, line.strip())
+
+    def finish(self) -> Document:
+        """Flush the last partial line and return the document"""
+        if self._pending:
+            self._add_line(self._pending)
+            self._pending = ""
+        if not self._started and not self.doc.paragraphs:
+            self.doc.add_paragraph()
+        return self.doc
+
+    def to_bytes(self) -> bytes:
+        with stage("docx_save"):
+            buffer = BytesIO()
+            self.finish().save(buffer)
+            return buffer.getvalue()
+
+    def save(self, filename: str = "petition.docx") -> str:
+        os.makedirs("temp", exist_ok=True)
+        output_path = os.path.join("temp", filename)
+        self.finish().save(output_path)
+        return output_path
+
+
+def export_to_docx(text: str, filename: str = "petition.docx") -> str:
+    builder = DocxStreamBuilder()
+    builder.feed(text)
 
     # Save document
-    os.makedirs("temp", exist_ok=True)
-    output_path = os.path.join("temp", filename)
-    doc.save(output_path)
-    return output_path
+    return builder.save(filename)
+
+
+def render_docx(text: str) -> bytes:
+    """Render a draft to DOCX bytes in memory"""
+    with stage("render_docx"):
+        builder = DocxStreamBuilder()
+        builder.feed(text)
+        return builder.to_bytes()
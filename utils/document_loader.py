@@ -1,15 +1,175 @@
-from io import BytesIO
-from pdfminer.high_level import extract_text
+from io import BytesIO, StringIO
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
 from docx import Document
+import asyncio
+import hashlib
+import mmap
+import os
+import tempfile
+import time
 import PyPDF2
 from fastapi import UploadFile
-from typing import Union
+from typing import AsyncIterator, BinaryIO, Iterator, List, Optional, Union
+from app.services.concurrency import PARSE_WORKERS, get_parse_pool, run_in_io_pool, run_in_parse_pool
+from app.services.metrics import observe_stage, stage
+from app.services.text_cache import get_text_cache
 
-def load_pdf(file_bytes: bytes) -> str:
-    """Load PDF using pdfminer for better text extraction"""
+# Uploads above this size are rejected before parsing
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "100"))
+# PDFs with more pages than this are rejected
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "2000"))
+# Pages per parsing task sent to the process pool
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+# Where uploads are spooled so worker processes can map them
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+SPOOL_CHUNK_BYTES = 1024 * 1024
+# Formats worth caching; plain text is cheaper to decode than to look up
+CACHED_EXTENSIONS = ("pdf", "docx", "doc")
+
+
+class DocumentTooLarge(ValueError):
+    """Raised when a document exceeds MAX_UPLOAD_MB or MAX_PDF_PAGES"""
+
+
+def _check_size(size: int):
+    if size > MAX_UPLOAD_MB * 1024 * 1024:
+        raise DocumentTooLarge(f"file exceeds the {MAX_UPLOAD_MB:g} MB upload limit")
+
+
+def _check_pages(pages: int):
+    if pages > MAX_PDF_PAGES:
+        raise DocumentTooLarge(f"PDF has {pages} pages; the limit is {MAX_PDF_PAGES}")
+
+
+def count_pdf_pages(fp: BinaryIO) -> int:
+    """Page count from the PDF's page tree, without parsing page content"""
+    try:
+        return len(PyPDF2.PdfReader(fp).pages)
+    except Exception:
+        fp.seek(0)
+        return sum(1 for _ in PDFPage.create_pages(PDFDocument(PDFParser(fp))))
+
+
+def _pdfminer_pages(fp: BinaryIO, start: int, stop: int) -> List[Optional[str]]:
+    """pdfminer text of pages [start, stop); None where a page fails"""
+    texts = [None] * (stop - start)
+    try:
+        document = PDFDocument(PDFParser(fp))
+        resources = PDFResourceManager(caching=True)
+        laparams = LAParams()
+        for pageno, page in enumerate(PDFPage.create_pages(document)):
+            if pageno >= stop:
+                break
+            if pageno < start:
+                continue
+            out = StringIO()
+            device = TextConverter(resources, out, laparams=laparams)
+            try:
+                PDFPageInterpreter(resources, device).process_page(page)
+                texts[pageno - start] = out.getvalue()
+            except Exception:
+                pass
+            finally:
+                device.close()
+    except Exception:
+        # Unreadable structure: every page falls back
+        pass
+    return texts
+
+
+def extract_pdf_pages(fp: BinaryIO, start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop) using pdfminer, falling back to PyPDF2 page by page"""
+    texts = _pdfminer_pages(fp, start, stop)
+    reader = None
+    for i, text in enumerate(texts):
+        if text is not None:
+            continue
+        if reader is None:
+            fp.seek(0)
+            reader = PyPDF2.PdfReader(fp)
+        try:
+            text = reader.pages[start + i].extract_text() or ""
+        except Exception:
+            text = ""
+        texts[i] = text + "\n" if text else ""
+    return texts
+
+
+def extract_pdf_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Memory-map a spooled PDF and extract a page range (runs in the process pool)"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return extract_pdf_pages(mm, start, stop)
+
+
+def _page_ranges(pages: int) -> List[tuple]:
+    step = max(1, PDF_PAGES_PER_TASK)
+    return [(s, min(s + step, pages)) for s in range(0, pages, step)]
+
+
+def _count_spooled_pages(path: str) -> int:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return count_pdf_pages(mm)
+
+
+def iter_pdf_pages(path: str, executor=None) -> Iterator[str]:
+    """Yield page texts of a PDF on disk in order, parsing ranges in executor if given"""
+    pages = _count_spooled_pages(path)
+    _check_pages(pages)
+    ranges = _page_ranges(pages)
+    if executor is None:
+        for start, stop in ranges:
+            yield from extract_pdf_page_range(path, start, stop)
+        return
+    results = executor.map(
+        extract_pdf_page_range, [path] * len(ranges), [r[0] for r in ranges], [r[1] for r in ranges]
+    )
+    for texts in results:
+        yield from texts
+
+
+async def aiter_pdf_pages(path: str) -> AsyncIterator[str]:
+    """Yield page texts of a PDF on disk in order while later pages are still parsing.
+
+    Page ranges run in the shared process pool, at most two per worker in
+    flight, so memory stays bounded for very long documents.
+    """
+    pages = await run_in_io_pool(_count_spooled_pages, path)
+    _check_pages(pages)
+    pool = get_parse_pool()
+    loop = asyncio.get_running_loop()
+    window = max(2, 2 * PARSE_WORKERS)
+    ranges = iter(_page_ranges(pages))
+    in_flight = []
+    try:
+        for start, stop in ranges:
+            in_flight.append(loop.run_in_executor(pool, extract_pdf_page_range, path, start, stop))
+            if len(in_flight) >= window:
+                for text in await in_flight.pop(0):
+                    yield text
+        while in_flight:
+            for text in await in_flight.pop(0):
+                yield text
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def load_pdf_pages(file_bytes: bytes) -> List[str]:
+    """Page texts of a PDF held in memory"""
     with BytesIO(file_bytes) as f:
-        text = extract_text(f)
-    return text
+        pages = count_pdf_pages(f)
+        _check_pages(pages)
+        f.seek(0)
+        return extract_pdf_pages(f, 0, pages)
+
+def load_pdf(file_bytes: bytes) -> str:
+    """Load PDF using pdfminer for better text extraction (PyPDF2 for pages it cannot read)"""
+    return "".join(load_pdf_pages(file_bytes))
 
 def load_pdf_pypdf2(file_bytes: bytes) -> str:
     """Load PDF using PyPDF2 as fallback"""
@@ -31,6 +191,22 @@ def load_txt(file_bytes: bytes) -> str:
     """Load text files"""
     return file_bytes.decode("utf-8", errors="replace")
 
+def parse_bytes(ext: str, raw: bytes) -> str:
+    """Parse raw file bytes by extension (module-level so it can run in a process pool)"""
+    if ext in ['pdf']:
+        return load_pdf(raw)
+    elif ext in ['docx', 'doc']:
+        return load_docx(raw)
+    elif ext in ['txt']:
+        return load_txt(raw)
+    else:
+        return raw.decode('utf-8', errors='replace')
+
+def parse_path(ext: str, path: str) -> str:
+    """Parse a file on disk by extension (module-level so it can run in a process pool)"""
+    with open(path, "rb") as f:
+        return parse_bytes(ext, f.read())
+
 def load_file(file: Union[UploadFile, any]) -> str:
     """Load file content - handles both UploadFile and file-like objects"""
     if hasattr(file, 'filename') and hasattr(file, 'file'):
@@ -41,34 +217,103 @@ def load_file(file: Union[UploadFile, any]) -> str:
         # File-like object
         ext = getattr(file, 'name', '').split('.')[-1].lower()
         raw = file.read()
-    
-    if ext in ['pdf']:
-        try:
-            return load_pdf(raw)
-        except Exception:
-            # Fallback to PyPDF2
-            return load_pdf_pypdf2(raw)
-    elif ext in ['docx', 'doc']:
-        return load_docx(raw)
-    elif ext in ['txt']:
-        return load_txt(raw)
-    else:
-        return raw.decode('utf-8', errors='replace')
 
-async def load_file_async(file: UploadFile) -> str:
-    """Async version of load_file for UploadFile objects"""
+    _check_size(len(raw))
+    cache = get_text_cache() if ext in CACHED_EXTENSIONS else None
+    if cache is None:
+        return parse_bytes(ext, raw)
+
+    digest = hashlib.sha256(raw).hexdigest()
+    pages = cache.get_pages(digest, ext)
+    if pages is None:
+        start = time.perf_counter()
+        pages = load_pdf_pages(raw) if ext == 'pdf' else [parse_bytes(ext, raw)]
+        cache.put_pages(digest, ext, pages, time.perf_counter() - start)
+    return "".join(pages)
+
+async def spool_upload(file: UploadFile, directory: Optional[str] = None) -> tuple:
+    """Copy an upload to a temporary file in chunks, enforcing MAX_UPLOAD_MB.
+
+    Returns (path, sha256 of the content); the caller owns the path and must
+    remove it. ``directory`` defaults to UPLOAD_SPOOL_DIR.
+    """
     ext = file.filename.split('.')[-1].lower()
-    raw = await file.read()
-    
+    spool = tempfile.NamedTemporaryFile(suffix=f".{ext}", dir=directory or UPLOAD_SPOOL_DIR, delete=False)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await file.read(SPOOL_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            _check_size(size)
+            digest.update(chunk)
+            await run_in_io_pool(spool.write, chunk)
+        spool.close()
+        return spool.name, digest.hexdigest()
+    except BaseException:
+        spool.close()
+        os.unlink(spool.name)
+        raise
+
+async def aiter_path_pages(path: str, ext: str, digest: str) -> AsyncIterator[str]:
+    """Yield the text of a spooled file page by page (non-PDF files as a single page).
+
+    PDF pages are extracted in parallel and yielded in order as soon as they
+    are ready. Text already extracted from identical bytes (same sha256
+    ``digest``) comes from the text cache.
+    """
+    if ext in ['txt']:
+        # Decoding is cheap; not worth the pickling round trip
+        with stage("parse_txt"):
+            text = await run_in_io_pool(parse_path, ext, path)
+        yield text
+        return
+
+    cache = get_text_cache() if ext in CACHED_EXTENSIONS else None
+    if cache is not None:
+        pages = await run_in_io_pool(cache.get_pages, digest, ext)
+        if pages is not None:
+            for page in pages:
+                yield page
+            return
+
+    # Parse time excludes the time the consumer spends between pages
+    pages, parse_seconds = [], 0.0
+    resumed = time.perf_counter()
     if ext in ['pdf']:
-        try:
-            return load_pdf(raw)
-        except Exception:
-            # Fallback to PyPDF2
-            return load_pdf_pypdf2(raw)
-    elif ext in ['docx', 'doc']:
-        return load_docx(raw)
-    elif ext in ['txt']:
-        return load_txt(raw)
+        async for page in aiter_pdf_pages(path):
+            parse_seconds += time.perf_counter() - resumed
+            pages.append(page)
+            yield page
+            resumed = time.perf_counter()
     else:
-        return raw.decode('utf-8', errors='replace')
\ No newline at end of file
+        pages.append(await run_in_parse_pool(parse_path, ext, path))
+        parse_seconds += time.perf_counter() - resumed
+        yield pages[0]
+    observe_stage(f"parse_{ext}", parse_seconds)
+    if cache is not None:
+        await run_in_io_pool(cache.put_pages, digest, ext, pages, parse_seconds)
+
+async def aiter_upload_pages(file: UploadFile) -> AsyncIterator[str]:
+    """Yield an upload's text page by page (non-PDF files as a single page).
+
+    The upload is spooled to disk rather than held in memory and parsed with
+    aiter_path_pages.
+    """
+    ext = file.filename.split('.')[-1].lower()
+    path, digest = await spool_upload(file)
+    try:
+        async for page in aiter_path_pages(path, ext, digest):
+            yield page
+    finally:
+        os.unlink(path)
+
+async def load_file_async(file: UploadFile) -> str:
+    """Async version of load_file for UploadFile objects.
+
+    Parsing is CPU-bound, so it runs in the shared process pool instead of
+    blocking the event loop.
+    """
+    return "".join([page async for page in aiter_upload_pages(file)])
@@ -1,31 +1,18 @@
 import os
-import pickle
-from openai import OpenAI
 from dotenv import load_dotenv
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-import numpy as np
-from tqdm import tqdm
 from typing import List
 from pathlib import Path
 
-# FAISS
-import faiss
-
-EMB_MODEL = "text-embedding-3-small"  # or any available embedding model
-INDEX_PATH = "temp/faiss_index.bin"
-DOC_STORE_PATH = "temp/doc_store.pkl"
 CHUNK_SIZE = 800
 CHUNK_OVERLAP = 100
 
 
 # Simplified RAG wrapper that uses the consolidated RAG service
-from app.services.rag_service import RAGService, ingest_documents, retrieve_context
-
-# Create a global RAG service instance for backward compatibility
-rag_service = RAGService()
+from app.services.legal_chunker import chunk_text as legal_chunk_text
+from app.services.rag_service import RAGService, ingest_documents, rag_service, retrieve_context
 
 class RAGIndex:
     """Wrapper class for backward compatibility"""
@@ -54,15 +41,13 @@ class RAGIndex:
 # Convenience functions for backward compatibility
 def get_embedding(text: str):
     """Get embedding using consolidated service"""
-    return rag_service.embeddings.embed_query(text)
+    return rag_service.get_embeddings().embed_query(text)
+
+def chunk_text(text: str, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Chunk text - kept for backward compatibility.
 
-def chunk_text(text: str, size=800, overlap=100):
-    """Chunk text - kept for backward compatibility"""
-    tokens = text.split()
-    chunks = []
-    i = 0
-    while i < len(tokens):
-        chunk = tokens[i : i + size]
-        chunks.append(" ".join(chunk))
-        i += size - overlap
-    return chunks
+    size and overlap are in words (about 6 characters each). As in the legal
+    chunker, overlap is repeated only where a sentence longer than size has
+    to be cut.
+    """
+    return legal_chunk_text(text, max_chars=size * 6, overlap=overlap * 6)
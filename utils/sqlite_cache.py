@@ -0,0 +1,171 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+# SQLite's default limit on host parameters per statement is 999
+_MAX_PARAMS = 500
+# Read times are written back in batches rather than on every hit, so
+# lookups from several processes do not queue on SQLite's single writer
+ACCESS_FLUSH_SECONDS = 30.0
+ACCESS_FLUSH_ENTRIES = 1000
+
+
+class SQLiteLRUCache:
+    """Persistent key -> blob cache with size-based LRU eviction.
+
+    Safe to share between threads and between processes (WAL mode). Once the
+    stored bytes exceed max_bytes, the least recently read entries are
+    evicted until the cache is back under 90% of the limit. A hit only
+    records its read time in memory; pending times are written with the
+    next insert, or every ACCESS_FLUSH_SECONDS on a best-effort basis.
+    """
+
+    def __init__(self, path: str, max_bytes: int, table: str = "cache"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> last read time not yet written
+        self._touched: Dict[str, float] = {}
+        self._flushed_at = time.monotonic()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_access ON {table}(last_access)")
+        self._approx_bytes = self._total_bytes()
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Look up several keys at once; returns only the keys that were found"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _MAX_PARAMS):
+                batch = keys[i:i + _MAX_PARAMS]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({marks})", batch
+                ).fetchall()
+                found.update(rows)
+                for key, _ in rows:
+                    self._touched[key] = now
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            due = time.monotonic() - self._flushed_at >= ACCESS_FLUSH_SECONDS
+            if due or len(self._touched) >= ACCESS_FLUSH_ENTRIES:
+                self._flush_access(wait=False)
+        return found
+
+    def _flush_access(self, wait: bool = True):
+        """Write pending read times (lock held). Without wait, give up at once
+        if another process is writing and keep them for the next try."""
+        if not self._touched:
+            return
+        rows = [(t, k) for k, t in self._touched.items()]
+        if not wait:
+            self._conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET last_access = MAX(last_access, ?) WHERE key = ?", rows
+                )
+        except sqlite3.OperationalError:
+            if wait:
+                raise
+            return
+        finally:
+            if not wait:
+                self._conn.execute("PRAGMA busy_timeout = 30000")
+        self._touched.clear()
+        self._flushed_at = time.monotonic()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items: Dict[str, bytes]):
+        """Insert or replace several entries, evicting old ones if over budget"""
+        if not items:
+            return
+        now = time.time()
+        rows = [(k, sqlite3.Binary(v), len(v), now) for k, v in items.items()]
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, size, last_access) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                # Already writing, so pending read times go along
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET last_access = MAX(last_access, ?) WHERE key = ?",
+                    [(t, k) for k, t in self._touched.items() if k not in items],
+                )
+            self._touched.clear()
+            self._flushed_at = time.monotonic()
+            self._approx_bytes += sum(r[2] for r in rows)
+            if self._approx_bytes > self.max_bytes:
+                self._evict()
+
+    def set(self, key: str, value: bytes):
+        self.set_many({key: value})
+
+    def _evict(self):
+        # Other processes may have written too, so start from the real total
+        total = self._total_bytes()
+        target = int(self.max_bytes * 0.9)
+        if total > self.max_bytes:
+            victims = []
+            cursor = self._conn.execute(
+                f"SELECT key, size FROM {self.table} ORDER BY last_access"
+            )
+            for key, size in cursor:
+                if total <= target:
+                    break
+                victims.append(key)
+                total -= size
+            cursor.close()
+            with self._conn:
+                self._conn.execute("BEGIN")
+                for i in range(0, len(victims), _MAX_PARAMS):
+                    batch = victims[i:i + _MAX_PARAMS]
+                    self._conn.execute(
+                        f"DELETE FROM {self.table} WHERE key IN ({','.join('?' * len(batch))})",
+                        batch,
+                    )
+        self._approx_bytes = total
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._touched.clear()
+            self._approx_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }